@@ -0,0 +1,189 @@
+"""
+Benchmarks de la biblioteca sin pantalla (no importa Kivy).
+
+Genera árboles de música sintéticos (carpetas anidadas, extensiones
+mezcladas y archivos que no son música) y mide:
+
+- walk_music_files (os.walk, sin índice)
+- find_music_files con el índice vacío (primer escaneo) y ya caliente
+- la clave de orden (song_sort_key) sobre la lista desordenada
+- la construcción de la lista de SongListScreen.on_pre_enter
+  (TrackTable.add_many + filas compartidas del RecycleView)
+- extract_metadata sobre una muestra de archivos
+
+Los resultados se imprimen y se guardan en JSON para seguir regresiones.
+
+Uso: python benchmarks/bench_library.py [--sizes 1000,10000,100000]
+         [--repeat 3] [--metadata-sample 500] [--output bench_library.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_manager import find_music_files, walk_music_files  # noqa: E402
+from utils.library_index import LibraryIndex, VALID_EXTENSIONS, song_sort_key  # noqa: E402
+from utils.metadata import extract_metadata  # noqa: E402
+from utils.track_table import TrackTable  # noqa: E402
+
+# Otros archivos típicos de una carpeta de música
+OTHER_EXTENSIONS = ('.jpg', '.txt', '.nfo')
+
+# Unas pocas tramas MPEG-1 Layer III (128 kbps, 44.1 kHz) en silencio:
+# suficiente para que mutagen lea el archivo como MP3 con duración
+_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+_MP3_DATA = _MP3_FRAME * 8
+
+
+def generate_tree(root, count, seed=1):
+    """
+    Crear `count` archivos de música bajo `root` en carpetas
+    artista/álbum[/disco], más ~10 % de archivos que no son música.
+    """
+    rng = random.Random(seed)
+    created = 0
+    album_index = 0
+    while created < count:
+        artist = f"Artista {album_index // 8:04d}"
+        album = f"Album {album_index:05d}"
+        parts = [root, artist, album]
+        if rng.random() < 0.2:
+            parts.append(f"CD{rng.randint(1, 2)}")
+        directory = os.path.join(*parts)
+        os.makedirs(directory, exist_ok=True)
+
+        for track in range(min(12, count - created)):
+            ext = rng.choice(VALID_EXTENSIONS)
+            name = f"{track + 1:02d} - Cancion {rng.randrange(10 ** 6):06d}{ext}"
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(_MP3_DATA if ext == '.mp3' else b'\x00' * 64)
+            created += 1
+        if rng.random() < 0.8:
+            extra = rng.choice(OTHER_EXTENSIONS)
+            with open(os.path.join(directory, f"cover{extra}"), 'wb') as f:
+                f.write(b'\x00' * 64)
+        album_index += 1
+
+
+def best_of(repeat, func):
+    """Mejor tiempo (ms) de `repeat` ejecuciones y el último resultado."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def mutagen_available():
+    try:
+        import mutagen  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def bench_size(size, repeat, metadata_sample, workdir):
+    root = os.path.join(workdir, f"music_{size}")
+    start = time.perf_counter()
+    generate_tree(root, size)
+    generate_ms = (time.perf_counter() - start) * 1000
+
+    timings = {}
+    timings['walk_music_files'], walked = best_of(repeat, lambda: walk_music_files(root))
+
+    # Índice propio del benchmark (no el de la carpeta de datos de la app)
+    index = LibraryIndex(os.path.join(workdir, f"index_{size}.db"))
+    LibraryIndex._default = index
+    timings['find_music_files_cold'], _ = best_of(1, lambda: find_music_files(root))
+    timings['find_music_files_warm'], paths = best_of(repeat, lambda: find_music_files(root))
+    index.close()
+    LibraryIndex._default = None
+
+    shuffled = list(paths)
+    random.Random(2).shuffle(shuffled)
+    timings['sort_key'], _ = best_of(repeat, lambda: sorted(shuffled, key=song_sort_key))
+
+    def list_build():
+        # Lo que hace SongListScreen: IDs compactos y una fila compartida por entrada
+        songs = TrackTable().add_many(paths)
+        shared_row = {}
+        data = [shared_row] * len(songs)
+        return songs, data
+
+    timings['list_build'], _ = best_of(repeat, list_build)
+
+    metadata = None
+    if mutagen_available():
+        sample = [p for p in paths if p.endswith('.mp3')][:metadata_sample]
+        if sample:
+            ms, _ = best_of(1, lambda: [extract_metadata(p) for p in sample])
+            metadata = {'files': len(sample), 'total_ms': ms, 'per_file_ms': ms / len(sample)}
+
+    return {
+        'size': size,
+        'music_files': len(paths),
+        'walked_files': len(walked),
+        'generate_ms': generate_ms,
+        'timings_ms': timings,
+        'metadata': metadata if metadata is not None else 'skipped (mutagen no instalado)',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help="tamaños de biblioteca separados por comas")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="repeticiones por medida (se guarda la mejor)")
+    parser.add_argument('--metadata-sample', type=int, default=500,
+                        help="archivos MP3 para medir extract_metadata")
+    parser.add_argument('--output', default='bench_library.json',
+                        help="archivo JSON de resultados ('-' = solo stdout)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    workdir = tempfile.mkdtemp(prefix="bench_library_")
+    results = []
+    try:
+        for size in sizes:
+            result = bench_size(size, args.repeat, args.metadata_sample, workdir)
+            results.append(result)
+            print(f"\n📊 {size} archivos ({result['music_files']} pistas)")
+            for name, ms in result['timings_ms'].items():
+                print(f"  {name:24s} {ms:10.1f} ms")
+            metadata = result['metadata']
+            if isinstance(metadata, dict):
+                print(f"  {'extract_metadata':24s} {metadata['per_file_ms']:10.3f} ms/archivo")
+            else:
+                print(f"  {'extract_metadata':24s} {metadata}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'library',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output == '-':
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
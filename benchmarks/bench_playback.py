@@ -0,0 +1,314 @@
+"""
+Latencia de los controles de reproducción sin pantalla.
+
+Ejecuta PlaybackController (la lógica de PlayerScreen) con un scheduler
+propio en lugar del Clock de Kivy y mide, sobre una cola grande:
+
+- construcción de la cola (primer load_song)
+- latencia de cambio de pista (load_song a pistas al azar)
+- ráfagas de saltos (next_song/prev_song seguidos, con shuffle) y
+  reproductores que quedan abiertos después
+- wakeups por segundo del scheduler reproduciendo y en pausa
+- transiciones entre pistas cortas (cuántas usan la precarga) y el
+  silencio real entre ellas según el reloj del backend falso
+
+Con --backend fake (por defecto) no hay audio: el tiempo es simulado y
+las medidas son el coste propio de la app. Con --backend ffpyplayer y
+--files CARPETA se usan archivos reales en tiempo real (la cola repite
+esos archivos hasta --queue-size).
+
+Uso: python benchmarks/bench_playback.py [--queue-size 100000]
+         [--backend fake|ffpyplayer] [--files CARPETA] [--output bench_playback.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_manager import walk_music_files  # noqa: E402
+from utils.playback import PlaybackController  # noqa: E402
+from utils.player_backend import FakeBackend, FFPyPlayerBackend  # noqa: E402
+from utils.track_table import TrackTable  # noqa: E402
+
+
+class _ScheduledEvent:
+    def __init__(self, callback, interval, next_time):
+        self.callback = callback
+        self.interval = interval
+        self.next_time = next_time
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class BenchScheduler:
+    """
+    schedule_interval/schedule_once compatibles con kivy.clock.Clock. En modo simulado el
+    tiempo solo avanza en run(); en tiempo real run() duerme entre eventos.
+    Cuenta cada callback ejecutado como un wakeup.
+    """
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self._start = time.perf_counter()
+        self._now = 0.0
+        self._events = []
+        self.wakeups = 0
+
+    def clock(self):
+        if self.realtime:
+            return time.perf_counter() - self._start
+        return self._now
+
+    def schedule_interval(self, callback, interval):
+        event = _ScheduledEvent(callback, interval, self.clock() + interval)
+        self._events.append(event)
+        return event
+
+    def schedule_once(self, callback, timeout=0):
+        event = _ScheduledEvent(callback, None, self.clock() + timeout)
+        self._events.append(event)
+        return event
+
+    def _wait_until(self, moment):
+        if self.realtime:
+            delay = moment - self.clock()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            self._now = max(self._now, moment)
+
+    def run(self, seconds):
+        end = self.clock() + seconds
+        while True:
+            self._events = [e for e in self._events if not e.cancelled]
+            if not self._events:
+                self._wait_until(end)
+                return
+            event = min(self._events, key=lambda e: e.next_time)
+            if event.next_time > end:
+                self._wait_until(end)
+                return
+            self._wait_until(event.next_time)
+            if event.interval is None:
+                event.cancelled = True
+            else:
+                event.next_time += event.interval
+            self.wakeups += 1
+            event.callback(event.interval or 0)
+
+
+class BenchListener:
+    """Cuenta pistas arrancadas para las medidas de transición."""
+
+    def __init__(self):
+        self.tracks_started = 0
+
+    def on_track_started(self, track_id, path):
+        self.tracks_started += 1
+
+
+def synthetic_paths(count):
+    root = "/storage/emulated/0/Music"
+    return [
+        f"{root}/Artista {i // 120:04d}/Album {i // 12:05d}/{i % 12 + 1:02d} - Cancion {i:06d}.mp3"
+        for i in range(count)
+    ]
+
+
+def latency_stats(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        'count': len(ordered),
+        'p50_ms': statistics.median(ordered),
+        'p95_ms': ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1],
+        'max_ms': ordered[-1],
+        'total_ms': sum(ordered),
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def make_controller(args, scheduler, listener, tracks, durations=None):
+    if args.backend == 'ffpyplayer':
+        backend = FFPyPlayerBackend()
+        clock = time.perf_counter
+    else:
+        backend = FakeBackend(
+            clock=scheduler.clock,
+            duration_for=(lambda path: durations) if durations else None
+        )
+        clock = scheduler.clock
+    controller = PlaybackController(backend, scheduler, tracks, listener=listener, clock=clock)
+    return controller, backend
+
+
+def transition_gaps(backend):
+    """
+    Silencio entre pistas consecutivas (ms) con el reloj del backend falso:
+    cuándo empezó a sonar cada una menos cuándo la anterior llegó al final.
+    """
+    played = [p for p in backend.players if p.started_at is not None]
+    return [
+        (current.started_at - previous.ended_at) * 1000
+        for previous, current in zip(played, played[1:])
+        if previous.ended_at is not None
+    ]
+
+
+def build_queue(args):
+    tracks = TrackTable()
+    if args.backend == 'ffpyplayer':
+        files = walk_music_files(args.files)
+        if not files:
+            sys.exit(f"No hay archivos de audio en {args.files}")
+        ids = tracks.add_many(files)
+        songs = array('I', (ids[i % len(ids)] for i in range(args.queue_size)))
+    else:
+        songs = tracks.add_many(synthetic_paths(args.queue_size))
+    return tracks, songs
+
+
+def bench(args):
+    realtime = args.backend == 'ffpyplayer'
+    rng = random.Random(1)
+    tracks, songs = build_queue(args)
+    results = {}
+
+    # 1) Primera carga (construye la cola) y cambios de pista al azar
+    scheduler = BenchScheduler(realtime)
+    controller, backend = make_controller(args, scheduler, BenchListener(), tracks)
+    results['queue_build_ms'] = timed(controller.load_song, songs[0], songs)
+    samples = [
+        timed(controller.load_song, songs[rng.randrange(len(songs))], songs)
+        for _ in range(args.switches)
+    ]
+    results['track_switch'] = latency_stats(samples)
+
+    # 2) Ráfaga de saltos con shuffle
+    controller.set_modes(shuffle=True)
+    forward = [timed(controller.next_song) for _ in range(args.skips)]
+    backward = [timed(controller.prev_song) for _ in range(args.skips)]
+    results['skip_storm'] = {
+        'next': latency_stats(forward),
+        'prev': latency_stats(backward),
+    }
+    if isinstance(backend, FakeBackend):
+        results['skip_storm']['open_players_after'] = backend.open_players
+
+    # 3) Wakeups por segundo reproduciendo y en pausa
+    controller.set_modes(shuffle=False)
+    wakeup_seconds = args.wakeup_seconds
+    start_wakeups = scheduler.wakeups
+    scheduler.run(wakeup_seconds)
+    playing = (scheduler.wakeups - start_wakeups) / wakeup_seconds
+
+    controller.play_pause()
+    start_wakeups = scheduler.wakeups
+    scheduler.run(wakeup_seconds)
+    paused = (scheduler.wakeups - start_wakeups) / wakeup_seconds
+    controller.play_pause()
+    results['wakeups_per_second'] = {'playing': playing, 'paused': paused}
+    controller.stop()
+
+    # 4) Transiciones entre pistas cortas (solo backend falso: tiempo simulado).
+    # Duraciones que no son múltiplo del tick, donde se notaría un fin tardío
+    if not realtime:
+        results['transitions'] = {}
+        for duration in args.transition_durations:
+            scheduler = BenchScheduler()
+            listener = BenchListener()
+            controller, backend = make_controller(args, scheduler, listener, tracks, durations=duration)
+            controller.load_song(songs[0], songs)
+            scheduler.run(args.transition_tracks * duration + 1.0)
+            gaps = transition_gaps(backend)
+            results['transitions'][f'{duration:g}s'] = {
+                'tracks_started': listener.tracks_started,
+                'players_opened': backend.opened_count,
+                'open_players_after': backend.open_players,
+                'gap_max_ms': max(gaps) if gaps else None,
+                'gap_mean_ms': statistics.fmean(gaps) if gaps else None,
+                'reported_gap_ms': controller.last_transition_gap * 1000,
+            }
+            controller.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--backend', choices=('fake', 'ffpyplayer'), default='fake')
+    parser.add_argument('--files', help="carpeta con audio real (backend ffpyplayer)")
+    parser.add_argument('--queue-size', type=int, default=100_000)
+    parser.add_argument('--switches', type=int, default=None,
+                        help="cambios de pista al azar (1000 fake / 20 ffpyplayer)")
+    parser.add_argument('--skips', type=int, default=None,
+                        help="saltos por ráfaga (10000 fake / 50 ffpyplayer)")
+    parser.add_argument('--wakeup-seconds', type=float, default=None,
+                        help="segundos medidos por estado (60 fake / 5 ffpyplayer)")
+    parser.add_argument('--transition-tracks', type=int, default=20)
+    parser.add_argument('--transition-durations', type=float, nargs='+', default=[3.0, 3.1, 3.2],
+                        help="duraciones (s) de las pistas en la prueba de transiciones")
+    parser.add_argument('--output', default='bench_playback.json',
+                        help="archivo JSON de resultados ('-' = solo stdout)")
+    args = parser.parse_args()
+
+    real = args.backend == 'ffpyplayer'
+    if real and not args.files:
+        parser.error("--backend ffpyplayer necesita --files CARPETA")
+    if args.switches is None:
+        args.switches = 20 if real else 1000
+    if args.skips is None:
+        args.skips = 50 if real else 10_000
+    if args.wakeup_seconds is None:
+        args.wakeup_seconds = 5.0 if real else 60.0
+
+    results = bench(args)
+
+    print(f"\n🎵 Backend: {args.backend} · cola de {args.queue_size} pistas")
+    print(f"  {'construcción de la cola':28s} {results['queue_build_ms']:10.1f} ms")
+    for name, stats in (('cambio de pista', results['track_switch']),
+                        ('ráfaga next_song', results['skip_storm']['next']),
+                        ('ráfaga prev_song', results['skip_storm']['prev'])):
+        print(f"  {name:28s} p50 {stats['p50_ms']:8.3f} ms · p95 {stats['p95_ms']:8.3f} ms"
+              f" · máx {stats['max_ms']:8.3f} ms")
+    wakeups = results['wakeups_per_second']
+    print(f"  {'wakeups/s (reproduciendo)':28s} {wakeups['playing']:10.2f}")
+    print(f"  {'wakeups/s (en pausa)':28s} {wakeups['paused']:10.2f}")
+    for duration, transitions in results.get('transitions', {}).items():
+        gap = transitions['gap_max_ms']
+        gap_text = f"hueco máx {gap:.2f} ms" if gap is not None else "sin transiciones"
+        print(f"  {'transiciones ' + duration:28s} {transitions['tracks_started']} pistas · "
+              f"{transitions['players_opened']} reproductores · {gap_text}")
+
+    report = {
+        'benchmark': 'playback',
+        'backend': args.backend,
+        'queue_size': args.queue_size,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output == '-':
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
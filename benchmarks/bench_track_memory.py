@@ -0,0 +1,68 @@
+"""
+Memoria de la biblioteca: lista de rutas + filas con textos (antes)
+frente a TrackTable + array de IDs + una fila vacía compartida (ahora).
+
+Uso: python benchmarks/bench_track_memory.py [num_pistas]
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.track_table import TrackTable  # noqa: E402
+
+
+def synthetic_paths(count, seed=1):
+    """Rutas parecidas a una biblioteca real: artista/álbum/pista."""
+    rng = random.Random(seed)
+    root = "/storage/emulated/0/Music"
+    paths = []
+    for i in range(count):
+        artist = f"Artista {i // 120:04d}"
+        album = f"Album {i // 12:05d}"
+        title = f"{i % 12 + 1:02d} - Cancion {rng.randrange(10 ** 6):06d}"
+        paths.append(f"{root}/{artist}/{album}/{title}.mp3")
+    return paths
+
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    source = synthetic_paths(count)
+
+    def legacy():
+        # Copia para que las cadenas se cuenten dentro de la medición
+        songs = [p.encode().decode() for p in source]
+        data = [
+            {'text': os.path.basename(s), 'song_path': s, 'callback': None}
+            for s in songs
+        ]
+        return songs, data
+
+    def compact():
+        table = TrackTable()
+        songs = table.add_many(p.encode().decode() for p in source)
+        shared_row = {}
+        data = [shared_row] * len(songs)
+        return table, songs, data
+
+    before = measure(legacy)
+    after = measure(compact)
+    print(f"Pistas:           {count}")
+    print(f"Rutas + filas:    {before / 1e6:8.1f} MB")
+    print(f"TrackTable + IDs: {after / 1e6:8.1f} MB")
+    print(f"Ahorro:           {(1 - after / before) * 100:8.1f} %")
+
+
+if __name__ == '__main__':
+    main()
@@ -40,7 +40,7 @@ version = 1.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3, kivy, kivymd, plyer, ffpyplayer, pillow, requests, mutagen, yt-dlp
+requirements = python3, kivy, kivymd, plyer, ffpyplayer, pillow, numpy, requests, mutagen, yt-dlp
 
 #permisos
 android.permissions = READ_EXTERNAL_STORAGE, WRITE_EXTERNAL_STORAGE, INTERNET, MANAGE_EXTERNAL_STORAGE
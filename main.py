@@ -1,18 +1,32 @@
+import time
+
+# Referencia para medir el arranque en frío (antes de importar Kivy)
+_START_TIME = time.perf_counter()
+
+# Perfilado opcional (MUSICAPP_PROFILE=1): activarlo antes de importar Kivy
+from utils.instrumentation import Profiler, get_logger, metrics  # noqa: E402
+Profiler.start_from_env()
+
 from kivy.lang import Builder
 from kivymd.app import MDApp
 from kivy.clock import Clock
-from kivy.uix.screenmanager import ScreenManager
+from kivy.core.window import Window
 from kivy.utils import platform
 from screens.song_list_screen import SongListScreen
-from screens.player_screen import PlayerScreen
-from screens.settings_screen import SettingsScreen
-from screens.downloader_screen import DownloaderScreen
-from utils.file_manager import find_music_files
+from utils.lazy_screen_manager import LazyScreenManager
+from utils.file_manager import cached_music_files
 from utils.config_manager import ConfigManager
 from utils.config_permissions import get_permissions
 import os
 
+log = get_logger('app')
+
+
 class MainApp(MDApp):
+    # Tiempos de arranque (segundos desde que se cargó main.py)
+    build_time = None
+    startup_time = None
+
     def build(self):
         #solicitar permisos en Android
         if platform == "android":
@@ -25,30 +39,59 @@ class MainApp(MDApp):
         
         Builder.load_file("musicapp.kv")
 
-        sm = ScreenManager()
+        # Solo la lista se crea al arrancar; el resto de pantallas (y sus
+        # módulos: ffpyplayer, yt-dlp, plyer...) al navegar a ellas
+        sm = LazyScreenManager()
+        sm.register_lazy('player', 'screens.player_screen', 'PlayerScreen')
+        sm.register_lazy('settings', 'screens.settings_screen', 'SettingsScreen')
+        sm.register_lazy('downloader', 'screens.downloader_screen', 'DownloaderScreen')
+        sm.register_lazy('duplicates', 'screens.duplicates_screen', 'DuplicatesScreen')
+        sm.register_lazy('playlists', 'screens.playlists_screen', 'PlaylistsScreen')
 
-        # Usar la carpeta configurada o la por defecto
+        # Arrancar con la instantánea del índice guardado; el escaneo
+        # empieza después del primer frame
         music_path = ConfigManager.get_music_folder()
-        songs = find_music_files(music_path)
+        songs = cached_music_files(music_path) or []
 
         song_list_screen = SongListScreen(name='list')
-        song_list_screen.songs = songs
-        player_screen = PlayerScreen(name='player')
-        settings_screen = SettingsScreen(name='settings')
-        downloader_screen = DownloaderScreen(name='downloader')
-
+        song_list_screen.load_paths(songs)
         sm.add_widget(song_list_screen)
-        sm.add_widget(player_screen)
-        sm.add_widget(settings_screen)
-        sm.add_widget(downloader_screen)
-        
         sm.current = 'list'
+
+        self.build_time = time.perf_counter() - _START_TIME
+        Window.bind(on_flip=self._on_first_frame)
         return sm
 
+    def _on_first_frame(self, *args):
+        """Primer frame en pantalla: medir el arranque y escanear."""
+        Window.unbind(on_flip=self._on_first_frame)
+        self.startup_time = time.perf_counter() - _START_TIME
+        metrics.record('startup.build', self.build_time)
+        metrics.record('startup.first_frame', self.startup_time)
+        log.info("Arranque en frío: %.0f ms (build: %.0f ms)",
+                 self.startup_time * 1000, self.build_time * 1000)
+
+        song_list_screen = self.root.get_screen('list')
+        Clock.schedule_once(lambda dt: song_list_screen.start_scan(ConfigManager.get_music_folder()), 0)
+
     def on_start(self):
         # ✅ Pedir permisos aquí, no en build()
         if platform == "android":
             Clock.schedule_once(lambda dt: get_permissions(), 1)
 
+    def on_pause(self):
+        # Android puede cerrar la app en segundo plano: guardar ya la configuración
+        ConfigManager.flush()
+        return True
+
+    def on_stop(self):
+        ConfigManager.flush()
+        # Parar los procesos de descarga que sigan vivos
+        if self.root.is_loaded('downloader'):
+            self.root.get_screen('downloader').downloads.shutdown()
+        metrics.log_summary()
+        if Profiler.enabled():
+            Profiler.dump()
+
 if __name__ == '__main__':
-    MainApp().run()
\ No newline at end of file
+    MainApp().run()
@@ -1,28 +1,97 @@
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton
-from kivy.properties import StringProperty, BooleanProperty
+from kivymd.uix.card import MDCard
+from kivy.properties import StringProperty, BooleanProperty, NumericProperty
+from kivy.clock import Clock
 from utils.config_manager import ConfigManager
+from utils.download_archive import DownloadArchive
+from utils.download_queue import (
+    DownloadQueue, STATE_LABELS, QUEUED, DOWNLOADING, POSTPROCESSING, DONE, FAILED, SKIPPED,
+    is_youtube_url,
+)
+from utils.file_manager import find_music_files
+from utils.instrumentation import get_logger
 import os
+import re
 import threading
 
+log = get_logger('downloads')
+
+
+class DownloadItemRow(MDCard):
+    """Fila de la lista de descargas: título/URL, estado y botón de reintento."""
+    item_id = NumericProperty(0)
+    text = StringProperty("")
+    status_text = StringProperty("")
+    progress = NumericProperty(-1)   # 0..100, -1 = sin barra
+    failed = BooleanProperty(False)
+    
+    # Lo fija DownloaderScreen
+    retry_callback = None
+    
+    def retry(self):
+        if DownloadItemRow.retry_callback:
+            DownloadItemRow.retry_callback(self.item_id)
+
+
+def format_bytes(size):
+    """Tamaño legible: 1536 -> '1.5 KB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
 class DownloaderScreen(MDScreen):
     url_input = StringProperty("")
     download_status = StringProperty("Esperando URL...")
     is_downloading = BooleanProperty(False)
     
+    # Formato de descarga ('best' = conservar el original, sin recodificar)
+    download_codec = StringProperty("best")
+    download_quality = StringProperty("192")
+    
+    # Los hilos de descarga solo marcan cambios; un único evento del Clock
+    # vuelca el estado a la UI a ritmo fijo (y se cancela sin descargas).
+    REFRESH_INTERVAL = 0.25
+    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.dialog = None
+        self._refresh_event = None
+        self._dirty = False
+        self._finished_paths = []     # Rutas finales de descargas terminadas
+        self._needs_rescan = False    # Alguna terminó sin ruta conocida
+        
+        # Cola con un pool acotado de trabajadores (tamaño en la configuración).
+        # El archivo de descargas evita volver a bajar lo que ya tenemos.
+        self.archive = DownloadArchive.get_default()
+        self.download_codec, self.download_quality = ConfigManager.get_download_format()
+        self.downloads = DownloadQueue(
+            ConfigManager.get_music_folder,
+            self._on_item_updated,
+            workers=ConfigManager.get_download_workers(),
+            archive=self.archive,
+            format_getter=lambda: (self.download_codec, self.download_quality)
+        )
+        DownloadItemRow.retry_callback = self.retry_item
     
-    def start_download(self, url):
-        """Iniciar la descarga de YouTube."""
-        if not url or not url.strip():
+    def start_download(self, text):
+        """Encolar una o varias URLs de YouTube (una por línea o separadas por espacios)."""
+        urls = [u for u in re.split(r'\s+', text or "") if u]
+        if not urls:
             self.show_dialog("Error", "Por favor ingresa una URL válida")
             return
         
-        if not ("youtube.com" in url or "youtu.be" in url):
-            self.show_dialog("Error", "Por favor ingresa una URL de YouTube válida")
+        invalid = [u for u in urls if not is_youtube_url(u)]
+        if invalid:
+            self.show_dialog("Error", "Por favor ingresa URLs de YouTube válidas:\n" + "\n".join(invalid[:5]))
             return
         
         # Verificar que existe la carpeta de música
@@ -31,108 +100,145 @@ class DownloaderScreen(MDScreen):
             self.show_dialog("Error", f"La carpeta de música no existe:\n{music_folder}\n\nConfigúrala en Ajustes")
             return
         
-        self.is_downloading = True
-        self.download_status = "Descargando..."
+        self.downloads.set_workers(ConfigManager.get_download_workers())
+        self.downloads.add(urls)
+        self.url_input = ""  # Limpiar el campo
+        self._refresh_items()
+        self._start_refreshing()
+    
+    def change_codec(self, codec):
+        """Cambiar el códec de las próximas descargas."""
+        self.download_codec = codec
+        ConfigManager.set_download_format(codec=codec)
+    
+    def change_quality(self, quality):
+        """Cambiar la calidad (kbps) de las descargas en MP3."""
+        self.download_quality = quality
+        ConfigManager.set_download_format(quality=quality)
+    
+    def retry_item(self, item_id):
+        """Reintentar una descarga fallida."""
+        for item in self.downloads.items:
+            if item.id == item_id:
+                self.downloads.retry(item)
+                self._start_refreshing()
+                break
+    
+    def clear_finished(self):
+        """Quitar de la lista las descargas terminadas."""
+        self.downloads.clear_finished()
+        self._refresh_items()
+    
+    def rebuild_archive(self):
+        """Reconstruir el archivo de descargas desde la carpeta de música."""
+        music_folder = ConfigManager.get_music_folder()
+        self.download_status = "Reconstruyendo archivo de descargas..."
         
-        # Ejecutar descarga en un thread separado para no bloquear la UI
-        thread = threading.Thread(target=self._download_thread, args=(url, music_folder))
+        def worker():
+            count = self.archive.rebuild(find_music_files(music_folder))
+            Clock.schedule_once(
+                lambda dt: setattr(self, 'download_status', f"📚 Archivo reconstruido: {count} vídeos"), 0
+            )
+        
+        thread = threading.Thread(target=worker)
         thread.daemon = True
         thread.start()
     
-    def _download_thread(self, url, output_folder):
-        """Thread que realiza la descarga usando yt-dlp."""
-        import sys
-        import io
-        from kivy.clock import Clock
-
-        try:
-            import yt_dlp
-
-            # Guardar stdout/stderr originales
-            old_stdout, old_stderr = sys.stdout, sys.stderr
-
-            # Crear buffers para que yt-dlp no intente escribir en la consola Kivy
-            sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
-
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
-                'quiet': True,           # 👈 silencio total
-                'no_warnings': True,     # 👈 sin advertencias
-            }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                title = info.get('title', 'Desconocido')
-
-                Clock.schedule_once(
-                    lambda dt: self._download_complete(True, f"✅ Descargado: {title}"),
-                    0
-                )
-
-        except ImportError:
-            Clock.schedule_once(
-                lambda dt: self._download_complete(
-                    False,
-                    "❌ yt-dlp no está instalado.\nInstálalo con: pip install yt-dlp"
-                ),
-                0
-            )
-
-        except Exception as e:
-            error_msg = str(e)
-            if "ffmpeg" in error_msg.lower():
-                error_msg = "❌ FFmpeg no está instalado.\nDescárgalo de: https://ffmpeg.org/download.html"
+    def _on_item_updated(self, item):
+        """Llamado desde los hilos de descarga: solo marcar (sin tocar el Clock)."""
+        if item.state == DONE and not item.title.startswith("Playlist:"):
+            if item.filepath:
+                self._finished_paths.append(item.filepath)
             else:
-                error_msg = f"❌ Error: {error_msg}"
-
-            Clock.schedule_once(lambda dt: self._download_complete(False, error_msg), 0)
-
-        finally:
-            # Restaurar stdout/stderr originales para no afectar Kivy
-            sys.stdout, sys.stderr = old_stdout, old_stderr
-    
-    def _download_complete(self, success, message):
-        """ Callback cuando termina la descarga. """
-        self.is_downloading = False
-        self.download_status = message
+                self._needs_rescan = True
+        elif item.state == FAILED and item.error:
+            log.warning("Descarga fallida (%s): %s", item.url, item.error)
+        self._dirty = True
+    
+    def _start_refreshing(self):
+        if self._refresh_event is None:
+            self._refresh_event = Clock.schedule_interval(self._on_refresh_tick, self.REFRESH_INTERVAL)
+    
+    def _stop_refreshing(self):
+        if self._refresh_event is not None:
+            self._refresh_event.cancel()
+            self._refresh_event = None
+    
+    def _on_refresh_tick(self, dt):
+        """Evento único: volcar los cambios acumulados desde el último tick."""
+        if self._finished_paths or self._needs_rescan:
+            # Todas las descargas terminadas desde el último tick de una vez
+            paths, self._finished_paths = self._finished_paths, []
+            rescan, self._needs_rescan = self._needs_rescan, False
+            self.reload_song_list(paths, rescan)
         
-        if success:
-            # Recargar la lista de canciones automáticamente
-            self.reload_song_list()
-            
-            self.show_dialog("Éxito", message + "\n\nLa canción ya está disponible en tu lista.")
-            self.url_input = ""  # Limpiar el campo
+        if self._dirty:
+            self._refresh_items()
+        
+        if not self.is_downloading and not self._dirty:
+            self._stop_refreshing()
+    
+    def _status_text(self, item):
+        """Texto de estado de una fila: porcentaje, velocidad y ETA al descargar."""
+        if item.state == FAILED and item.error:
+            return item.error.replace("\n", " ")
+        if item.state != DOWNLOADING or not item.downloaded_bytes:
+            return STATE_LABELS[item.state]
+        
+        parts = [STATE_LABELS[item.state]]
+        if item.progress is not None:
+            parts.append(f"{item.progress * 100:.0f}% de {format_bytes(item.total_bytes)}")
         else:
-            self.show_dialog("Error", message)
-            print(message)
+            parts.append(format_bytes(item.downloaded_bytes))
+        if item.speed:
+            parts.append(f"{format_bytes(item.speed)}/s")
+        if item.eta is not None:
+            parts.append(f"ETA {format_eta(item.eta)}")
+        return " · ".join(parts)
     
-    def reload_song_list(self):
-        """Recargar la lista de canciones después de descargar."""
+    def _refresh_items(self):
+        """Volcar el estado de la cola en la lista y el resumen."""
+        self._dirty = False
+        rows = []
+        for item in list(self.downloads.items):
+            progress = item.progress
+            rows.append({
+                'item_id': item.id,
+                'text': item.label,
+                'status_text': self._status_text(item),
+                'progress': progress * 100 if item.state == DOWNLOADING and progress is not None else -1,
+                'failed': item.state == FAILED,
+            })
+        if 'download_list' in self.ids:
+            self.ids.download_list.data = rows
+        
+        counts = self.downloads.counts()
+        active = counts[DOWNLOADING] + counts[POSTPROCESSING]
+        self.is_downloading = bool(active or counts[QUEUED])
+        if not rows:
+            self.download_status = "Esperando URL..."
+        else:
+            self.download_status = (
+                f"{counts[QUEUED]} en cola · {active} descargando · "
+                f"{counts[DONE]} listas · {counts[SKIPPED]} ya descargadas · "
+                f"{counts[FAILED]} con error"
+            )
+    
+    def reload_song_list(self, paths=(), rescan=False):
+        """Añadir a la lista las canciones descargadas."""
         try:
-            from utils.file_manager import find_music_files
-            from utils.config_manager import ConfigManager
-            
-            music_folder = ConfigManager.get_music_folder()
-            songs = find_music_files(music_folder)
-            
-            # Actualizar la lista en SongListScreen
             song_list_screen = self.manager.get_screen('list')
-            song_list_screen.songs = songs
             
-            # Si está en esa pantalla, refrescar la vista
-            if hasattr(song_list_screen, 'on_pre_enter'):
-                song_list_screen.on_pre_enter()
+            # Inserción ordenada de las rutas finales, sin recorrer la carpeta
+            if paths:
+                song_list_screen.add_tracks(paths)
             
-            print(f"✅ Lista actualizada: {len(songs)} canciones encontradas")
+            # Sin ruta final (yt-dlp no la reportó): re-escaneo incremental
+            if rescan:
+                song_list_screen.start_scan(ConfigManager.get_music_folder())
             
         except Exception as e:
-            print(f"Error al recargar canciones: {e}")
+            log.error("Error al recargar canciones: %s", e)
     
     def show_dialog(self, title, text):
         """Mostrar un diálogo simple."""
@@ -153,4 +259,4 @@ class DownloaderScreen(MDScreen):
     
     def go_back(self):
         """Volver a la lista de canciones."""
-        self.manager.current = 'list'
\ No newline at end of file
+        self.manager.current = 'list'
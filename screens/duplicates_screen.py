@@ -0,0 +1,225 @@
+from kivymd.uix.screen import MDScreen
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.button import MDFlatButton
+from kivymd.uix.card import MDCard
+from kivy.properties import StringProperty, BooleanProperty, NumericProperty
+from kivy.clock import Clock
+from utils.fingerprint import FingerprintIndex
+from utils.instrumentation import get_logger
+import os
+import threading
+
+log = get_logger('duplicates')
+
+
+class DuplicateRow(MDCard):
+    """Fila de un archivo duplicado: casilla 'conservar' y datos del archivo."""
+    index = NumericProperty(0)
+    text = StringProperty("")
+    secondary_text = StringProperty("")
+    keep = BooleanProperty(True)
+    group = NumericProperty(0)
+
+    # Lo fija DuplicatesScreen
+    keep_callback = None
+
+    def set_keep(self, active):
+        if DuplicateRow.keep_callback:
+            DuplicateRow.keep_callback(self.index, active)
+
+
+def format_duration(seconds):
+    if not seconds:
+        return "?"
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class DuplicatesScreen(MDScreen):
+    status = StringProperty("")
+    is_running = BooleanProperty(False)
+    progress = NumericProperty(0)
+    has_results = BooleanProperty(False)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.dialog = None
+        self.index = FingerprintIndex.get_default()
+        self._cancel = None
+        self._analyzed = False
+        DuplicateRow.keep_callback = self._on_keep_changed
+
+    def on_enter(self):
+        """La primera vez se busca sola; luego solo con el botón."""
+        if not self._analyzed and not self.is_running:
+            self.start_analysis()
+
+    # --------------------------------------------------------------------------
+    ## BÚSQUEDA EN SEGUNDO PLANO
+    # --------------------------------------------------------------------------
+
+    def start_analysis(self):
+        """Calcular las huellas que falten y agrupar los duplicados."""
+        if self.is_running:
+            return
+        if not self.index.available():
+            self.status = "Se necesitan ffmpeg y NumPy para buscar duplicados"
+            return
+
+        song_list_screen = self.manager.get_screen('list')
+        tracks = song_list_screen.tracks
+        paths = [tracks.path(track_id) for track_id in song_list_screen.songs]
+
+        self._analyzed = True
+        self.is_running = True
+        self.progress = 0
+        self.status = f"Analizando {len(paths)} canciones..."
+        self._cancel = threading.Event()
+        cancel = self._cancel
+
+        def on_progress(done, total):
+            Clock.schedule_once(lambda dt: self._on_progress(done, total), 0)
+
+        def worker():
+            try:
+                groups = self.index.find_duplicates(paths, on_progress, cancel)
+            except Exception as e:
+                log.error("Error buscando duplicados: %s", e)
+                groups = None
+            Clock.schedule_once(lambda dt: self._on_done(groups, cancel), 0)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def cancel_analysis(self):
+        if self._cancel is not None:
+            self._cancel.set()
+
+    def _on_progress(self, done, total):
+        self.progress = done * 100 / total if total else 100
+        self.status = f"Huellas calculadas: {done} / {total}"
+
+    def _on_done(self, groups, cancel):
+        if cancel is not self._cancel:
+            return
+        self.is_running = False
+        self._cancel = None
+        if groups is None:
+            self.status = "Búsqueda cancelada" if cancel.is_set() else "No se pudo completar la búsqueda"
+            return
+        self._show_groups(groups)
+
+    # --------------------------------------------------------------------------
+    ## RESULTADOS
+    # --------------------------------------------------------------------------
+
+    def _show_groups(self, groups):
+        """Una fila por archivo; se propone conservar el primero de cada grupo."""
+        rows = []
+        for number, group in enumerate(groups, 1):
+            for position, (path, size, duration, _fp) in enumerate(group):
+                rows.append({
+                    'index': len(rows),
+                    'path': path,
+                    'size': size,
+                    'duration': duration,
+                    'group': number,
+                    'keep': position == 0,
+                    'text': os.path.basename(path),
+                    'secondary_text': f"Grupo {number} · {size / 1e6:.1f} MB · "
+                                      f"{format_duration(duration)} · {os.path.dirname(path)}",
+                })
+        self.ids.duplicate_list.data = rows
+        self.has_results = bool(rows)
+        if groups:
+            extra = len(rows) - len(groups)
+            self.status = f"{len(groups)} grupos de duplicados ({extra} archivos sobrantes)"
+        else:
+            self.status = "No se encontraron duplicados"
+
+    def _on_keep_changed(self, index, active):
+        rows = self.ids.duplicate_list.data
+        if index < len(rows):
+            rows[index]['keep'] = active
+
+    def confirm_delete(self):
+        """Pedir confirmación antes de borrar los archivos no marcados."""
+        rows = self.ids.duplicate_list.data
+        doomed = [row for row in rows if not row['keep']]
+        if not doomed:
+            self.show_dialog("Nada que borrar", "Marca como no conservados los archivos a borrar")
+            return
+
+        # Nunca borrar todas las copias de una canción
+        kept_groups = {row['group'] for row in rows if row['keep']}
+        emptied = sorted({row['group'] for row in doomed} - kept_groups)
+        if emptied:
+            groups = ", ".join(str(group) for group in emptied)
+            self.show_dialog(
+                "Conserva al menos uno",
+                f"Marca un archivo para conservar en cada grupo (grupos: {groups})"
+            )
+            return
+
+        size = sum(row['size'] for row in doomed)
+        if self.dialog:
+            self.dialog.dismiss()
+        self.dialog = MDDialog(
+            title="Borrar duplicados",
+            text=f"Se borrarán {len(doomed)} archivos ({size / 1e6:.1f} MB) del dispositivo.",
+            buttons=[
+                MDFlatButton(text="CANCELAR", on_release=lambda x: self.dialog.dismiss()),
+                MDFlatButton(text="BORRAR", on_release=lambda x: self._delete(doomed)),
+            ],
+        )
+        self.dialog.open()
+
+    def _delete(self, doomed):
+        self.dialog.dismiss()
+        removed = []
+        for row in doomed:
+            try:
+                os.remove(row['path'])
+                removed.append(row['path'])
+            except OSError as e:
+                log.warning("No se pudo borrar %s: %s", row['path'], e)
+
+        # Quitar de la lista y del índice de huellas sin re-escanear
+        if removed:
+            self.manager.get_screen('list').remove_tracks(removed)
+            self.index.forget(removed)
+
+        # Rehacer los grupos con lo que queda (sin recalcular huellas)
+        gone = set(removed)
+        groups = {}
+        for row in self.ids.duplicate_list.data:
+            if row['path'] not in gone:
+                groups.setdefault(row['group'], []).append(row)
+        remaining = [
+            [(r['path'], r['size'], r['duration'], None) for r in rows]
+            for rows in groups.values() if len(rows) > 1
+        ]
+        self._show_groups(remaining)
+        self.show_dialog("Duplicados", f"{len(removed)} archivos borrados")
+
+    def show_dialog(self, title, text):
+        """Mostrar un diálogo simple."""
+        if self.dialog:
+            self.dialog.dismiss()
+
+        self.dialog = MDDialog(
+            title=title,
+            text=text,
+            buttons=[
+                MDFlatButton(
+                    text="OK",
+                    on_release=lambda x: self.dialog.dismiss()
+                ),
+            ],
+        )
+        self.dialog.open()
+
+    def go_back(self):
+        """Volver a la lista de canciones."""
+        self.manager.current = 'list'
@@ -1,42 +1,65 @@
 from kivy.uix.screenmanager import Screen
-from kivy.properties import StringProperty, BooleanProperty, NumericProperty
+from kivy.properties import StringProperty, BooleanProperty, NumericProperty, ObjectProperty
 from kivy.clock import Clock
-from ffpyplayer.player import MediaPlayer
-from mutagen import File as MutagenFile
+from utils.artwork_cache import ArtworkCache, COVER_SIZE
+from utils.config_manager import ConfigManager
+from utils.instrumentation import get_logger
+from utils.loudness import LoudnessCache
+from utils.metadata import MetadataCache
+from utils.playback import PlaybackController
+from utils.player_backend import get_default_backend
+from utils.track_table import TrackTable
 import os
-import random
 import logging
 
 # Silenciar warnings molestos de FFmpeg (opcional)
 logging.getLogger('libav').setLevel(logging.ERROR)
 logging.getLogger('libav.mp3float').setLevel(logging.CRITICAL)
 
+log = get_logger('player')
+
 class PlayerScreen(Screen):
     # Propiedades de Kivy
     current_song = StringProperty("")
+    current_artist = StringProperty("")
     shuffle = BooleanProperty(False)
     repeat = BooleanProperty(False)
     duration = NumericProperty(1)
     slider_value = NumericProperty(0)
     is_paused = BooleanProperty(False)
+    cover = ObjectProperty(None, allownone=True)
     
     # Propiedades para mostrar el tiempo formateado
     current_time_text = StringProperty("0:00")
     duration_text = StringProperty("0:00")
 
     # Variables internas
-    song_list = []
-    index = 0
-    player = None
-    
-    # Control del tiempo (simple)
-    start_time = 0.0
-    elapsed_time = 0.0
-    is_seeking = False
-    
-    # Eventos del Clock
-    progress_event = None
-    eof_check_event = None
+    metadata = None
+    playback = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Metadatos (duración/título) servidos desde la caché en memoria
+        self.metadata = MetadataCache.get_default()
+        self.metadata.add_listener(self._on_metadata_updated)
+        self.artwork = ArtworkCache.get_default()
+        self.loudness = LoudnessCache.get_default()
+        
+        # La lógica de reproducción (cola, precarga, fin de pista) vive en
+        # PlaybackController; esta pantalla solo refleja su estado
+        self.tracks = TrackTable.get_default()
+        self.playback = PlaybackController(
+            backend=get_default_backend(),
+            scheduler=Clock,
+            tracks=self.tracks,
+            listener=self,
+            duration_for=self.get_audio_duration,
+            volume_for=self.get_track_volume
+        )
+
+    @property
+    def current_path(self):
+        return self.playback.current_path
 
     # --------------------------------------------------------------------------
     ## OBTENER DURACIÓN REAL
@@ -54,203 +77,111 @@ class PlayerScreen(Screen):
         else:
             return f"{minutes}:{secs:02d}"
 
+    def get_track_volume(self, filepath):
+        """
+        Volumen normalizado desde la caché de loudness (sin analizar al
+        reproducir). Si la pista aún no está analizada suena a volumen
+        completo y se adelanta su análisis para la próxima vez.
+        """
+        if not ConfigManager.get_normalize_volume():
+            return 1.0
+        volume = self.loudness.volume_for(filepath)
+        if volume is None:
+            self.loudness.request([filepath], priority=True)
+            return 1.0
+        return volume
+
     def get_audio_duration(self, filepath):
-        """Obtiene la duración REAL del archivo de audio usando mutagen."""
-        try:
-            audio = MutagenFile(filepath)
-            if audio is not None and hasattr(audio.info, 'length'):
-                duration = audio.info.length
-                print(f"✅ Duración real (mutagen): {duration:.2f}s")
-                return duration
-        except Exception as e:
-            print(f"⚠️ Error al leer con mutagen: {e}")
+        """
+        Obtiene la duración desde la caché de metadatos, sin abrir el archivo.
+        Si aún no se conoce, pide la extracción en segundo plano y devuelve
+        una estimación por tamaño que se corrige al llegar el dato real.
+        """
+        duration = self.metadata.get_duration(filepath)
+        if duration:
+            return duration
+        
+        self.metadata.request([filepath], priority=True)
         
         # Fallback: Estimar por tamaño de archivo
         try:
             file_size = os.path.getsize(filepath)
             duration = file_size / 20000
-            print(f"📏 Duración estimada por tamaño: {duration:.2f}s")
+            log.debug("Duración estimada por tamaño: %.2fs", duration)
             return duration
         except:
             return 180
 
+    def _on_metadata_updated(self, paths):
+        """Actualizar título/duración si llegan los metadatos de la canción actual."""
+        current_path = self.current_path
+        if not current_path or (paths is not None and current_path not in paths):
+            return
+        
+        self.current_song, self.current_artist = self.metadata.display_text(current_path)
+        self.playback.set_duration_hint(self.metadata.get_duration(current_path))
+
     # --------------------------------------------------------------------------
-    ## CONTROL DE CARGA Y REPRODUCCIÓN
+    ## EVENTOS DEL CONTROLADOR
     # --------------------------------------------------------------------------
 
-    def load_song(self, song_path, songs):
-        """Carga una nueva canción y comienza la reproducción."""
-        self.stop_song()
-        
-        # Inicializar UI y lista
-        self.current_song = os.path.basename(song_path)
-        self.song_list = songs
-        self.index = songs.index(song_path)
-        self.slider_value = 0 
+    def on_track_started(self, track_id, song_path):
+        self.current_song, self.current_artist = self.metadata.display_text(song_path)
+        self.load_cover(song_path)
+        self.slider_value = 0
         self.is_paused = False
 
-        # Obtener duración REAL con mutagen
-        self.duration = self.get_audio_duration(song_path)
-        self.duration_text = self.format_time(self.duration)
+    def load_cover(self, song_path):
+        """Portada grande de la pista actual, cargada en segundo plano."""
+        self.cover = self.artwork.get_texture(song_path, COVER_SIZE)
+        if self.cover is None and not self.artwork.has_no_artwork(song_path, COVER_SIZE):
+            def apply(path, texture):
+                if path == self.current_path:
+                    self.cover = texture
+            self.artwork.request(song_path, apply, COVER_SIZE)
 
-        # Crear el reproductor
-        try:
-            ff_opts = {'paused': False, 'sync': 'audio'}
-            self.player = MediaPlayer(song_path, ff_opts=ff_opts)
-        except Exception as e:
-            print(f"Error al cargar la canción: {e}")
-            self.player = None
-            return
+    def on_duration_changed(self, duration):
+        self.duration = duration
+        self.duration_text = self.format_time(duration)
 
-        # Reiniciar el contador de tiempo
-        self.start_time = Clock.get_time()
-        self.elapsed_time = 0.0
+    def on_position_changed(self, position):
+        if self.duration > 0:
+            self.slider_value = min(position / self.duration, 1.0)
+        self.current_time_text = self.format_time(position)
 
-        # Programar actualizaciones
-        if self.progress_event:
-            self.progress_event.cancel()
-        if self.eof_check_event:
-            self.eof_check_event.cancel()
-            
-        self.progress_event = Clock.schedule_interval(self.update_progress, 0.1)
-        self.eof_check_event = Clock.schedule_interval(self.check_eof, 0.5)
+    def on_queue_finished(self):
+        self.slider_value = 1
+
+    # --------------------------------------------------------------------------
+    ## CONTROL DE REPRODUCCIÓN Y PLAYLIST
+    # --------------------------------------------------------------------------
+
+    def load_song(self, track_id, songs):
+        """Carga una nueva canción (ID de pista) y comienza la reproducción."""
+        self.playback.load_song(track_id, songs)
 
     def stop_song(self):
         """Detiene la reproducción y limpia recursos."""
-        if self.progress_event:
-            self.progress_event.cancel()
-            self.progress_event = None
-        if self.eof_check_event:
-            self.eof_check_event.cancel()
-            self.eof_check_event = None
-            
-        if self.player:
-            try:
-                self.player.close_player()
-            except:
-                pass
-            self.player = None
-            self.is_paused = False
+        self.playback.stop()
+        self.is_paused = False
 
     def play_pause(self):
         """Alterna pausa/reproducción."""
-        if self.player:
-            self.is_paused = not self.is_paused
-            self.player.set_pause(self.is_paused)
-            
-            if self.is_paused:
-                # Al pausar: guardar tiempo transcurrido
-                self.elapsed_time += Clock.get_time() - self.start_time
-            else:
-                # Al reanudar: reiniciar el marcador
-                self.start_time = Clock.get_time()
+        self.is_paused = self.playback.play_pause()
 
-    # --------------------------------------------------------------------------
-    ## CONTROL DE PLAYLIST
-    # --------------------------------------------------------------------------
+    def on_shuffle(self, instance, value):
+        self.playback.set_modes(shuffle=value)
+
+    def on_repeat(self, instance, value):
+        self.playback.set_modes(repeat=value)
 
     def next_song(self):
         """Pasa a la siguiente canción."""
-        if not self.song_list:
-            return
-        
-        # Si REPEAT está activado, repetir la misma canción
-        if self.repeat:
-            print("🔁 Repitiendo canción actual")
-            self.load_song(self.song_list[self.index], self.song_list)
-            return
-            
-        # Si NO hay repeat, continuar con la lógica normal
-        if self.shuffle:
-            if len(self.song_list) > 1:
-                remaining = [i for i in range(len(self.song_list)) if i != self.index]
-                if not remaining:
-                    self.stop_song()
-                    self.slider_value = 1
-                    return
-                self.index = random.choice(remaining)
-            else:
-                self.stop_song()
-                self.slider_value = 1
-                return
-        else:
-            # Modo normal (sin shuffle, sin repeat)
-            self.index += 1
-            if self.index >= len(self.song_list):
-                # Llegamos al final, detener
-                self.index = len(self.song_list) - 1
-                self.stop_song()
-                self.slider_value = 1
-                return
-        
-        self.load_song(self.song_list[self.index], self.song_list)
+        self.playback.next_song()
 
     def prev_song(self):
-        """Vuelve a la canción anterior."""
-        if not self.song_list:
-            return
-        
-        self.index -= 1
-        if self.index < 0:
-            if self.repeat:
-                self.index = len(self.song_list) - 1
-            else:
-                self.index = 0
-        
-        self.load_song(self.song_list[self.index], self.song_list)
-
-    # --------------------------------------------------------------------------
-    ## ACTUALIZACIÓN DE PROGRESO (SIMPLE)
-    # --------------------------------------------------------------------------
-
-    def update_progress(self, dt):
-        """Actualiza el slider basado en el tiempo transcurrido."""
-        if not self.player or self.is_paused or self.is_seeking:
-            return
-        
-        # Calcular tiempo actual
-        current_time = self.elapsed_time + (Clock.get_time() - self.start_time)
-        
-        # Actualizar slider
-        if self.duration > 0:
-            self.slider_value = min(current_time / self.duration, 1.0)
-        
-        # Actualizar el texto del tiempo actual
-        self.current_time_text = self.format_time(current_time)
-
-    def check_eof(self, dt):
-        """Verifica si la canción terminó."""
-        if not self.player:
-            return
-        
-        # Calcular tiempo actual
-        current_time = self.elapsed_time + (Clock.get_time() - self.start_time)
-        
-        # Si superamos la duración, pasar a la siguiente (con margen de 0.5s antes)
-        if current_time >= self.duration - 0.5:
-            print(f"🔚 Canción terminada ({current_time:.2f}s / {self.duration:.2f}s)")
-            
-            # IMPORTANTE: Cancelar eventos primero
-            if self.eof_check_event:
-                self.eof_check_event.cancel()
-                self.eof_check_event = None
-            if self.progress_event:
-                self.progress_event.cancel()
-                self.progress_event = None
-            
-            # Pausar el reproductor ANTES de cerrarlo (evita el crash)
-            if self.player:
-                try:
-                    self.player.set_pause(True)
-                except:
-                    pass
-            
-            # Poner el slider al final
-            self.slider_value = 1
-            
-            # Cambiar a la siguiente canción después de un momento
-            # stop_song() se encargará de cerrar el reproductor limpiamente
-            Clock.schedule_once(lambda dt: self.next_song(), 0.2)
+        """Vuelve a la canción anterior (según el historial)."""
+        self.playback.prev_song()
 
     # --------------------------------------------------------------------------
     ## CONTROL DEL SLIDER
@@ -263,26 +194,16 @@ class PlayerScreen(Screen):
 
     def on_slider_touch_down(self):
         """Usuario presiona el slider."""
-        self.is_seeking = True
+        self.playback.is_seeking = True
     
     def on_slider_touch_up(self, value):
         """Usuario suelta el slider."""
         self.seek(value)
-        self.is_seeking = False
+        self.playback.is_seeking = False
         
         # Actualizar el tiempo mostrado al hacer seek
-        current_time = self.elapsed_time + (Clock.get_time() - self.start_time)
-        self.current_time_text = self.format_time(current_time)
+        self.current_time_text = self.format_time(self.playback.position)
                 
     def seek(self, value):
         """Cambia la posición de reproducción."""
-        if self.player and self.duration > 0:
-            pos = value * self.duration
-            
-            try:
-                self.player.seek(pos, relative=False)
-                # Reiniciar los contadores de tiempo
-                self.elapsed_time = pos
-                self.start_time = Clock.get_time()
-            except Exception as e:
-                print(f"Error en seek: {e}")
\ No newline at end of file
+        self.playback.seek(value)
@@ -0,0 +1,241 @@
+from kivymd.uix.screen import MDScreen
+from kivymd.uix.dialog import MDDialog
+from kivymd.uix.button import MDFlatButton
+from kivymd.uix.card import MDCard
+from kivymd.uix.textfield import MDTextField
+from kivy.properties import StringProperty, BooleanProperty, NumericProperty
+from kivy.clock import Clock
+from utils.config_manager import ConfigManager
+from utils.instrumentation import get_logger
+from utils.metadata import MetadataCache
+from utils.playlists import PlaylistStore, PLAYLIST_EXTENSIONS
+import os
+import threading
+
+log = get_logger('playlists')
+
+try:
+    from plyer import filechooser
+    PLYER_AVAILABLE = True
+except ImportError:
+    PLYER_AVAILABLE = False
+
+
+class PlaylistRow(MDCard):
+    """Fila de una lista de reproducción: nombre, nº de canciones y acciones."""
+    playlist_id = NumericProperty(0)
+    text = StringProperty("")
+    secondary_text = StringProperty("")
+
+    # Lo fija PlaylistsScreen
+    action_callback = None
+
+    def action(self, name):
+        if PlaylistRow.action_callback:
+            PlaylistRow.action_callback(name, self.playlist_id, self.text)
+
+
+class PlaylistsScreen(MDScreen):
+    status = StringProperty("")
+    is_busy = BooleanProperty(False)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.dialog = None
+        self.store = PlaylistStore.get_default()
+        PlaylistRow.action_callback = self._on_row_action
+
+    def on_pre_enter(self):
+        self.refresh()
+
+    def refresh(self):
+        """Recargar las listas guardadas."""
+        self.ids.playlist_list.data = [
+            {
+                'playlist_id': playlist_id,
+                'text': name,
+                'secondary_text': f"{count} canciones",
+            }
+            for playlist_id, name, count in self.store.list_playlists()
+        ]
+        if not self.is_busy:
+            self.status = "" if self.ids.playlist_list.data else "No hay listas guardadas"
+
+    def _on_row_action(self, name, playlist_id, playlist_name):
+        if name == 'play':
+            self.play(playlist_id)
+        elif name == 'export':
+            self.export(playlist_id, playlist_name)
+        elif name == 'delete':
+            self.confirm_delete(playlist_id, playlist_name)
+
+    # --------------------------------------------------------------------------
+    ## REPRODUCIR Y GUARDAR
+    # --------------------------------------------------------------------------
+
+    def play(self, playlist_id):
+        """Cargar la lista en la cola del reproductor."""
+        songs, missing = self.store.load(playlist_id)
+        if not songs:
+            self.show_dialog("Lista vacía", "Ninguna canción de la lista está en la biblioteca")
+            return
+        if missing:
+            log.info("%d canciones de la lista ya no están en la biblioteca", missing)
+
+        player_screen = self.manager.get_screen('player')
+        player_screen.load_song(songs[0], songs)
+        self.manager.current = 'player'
+
+    def save_visible(self):
+        """Guardar como lista las canciones que muestra ahora la biblioteca."""
+        song_list_screen = self.manager.get_screen('list')
+        songs = song_list_screen.visible_tracks()
+        if not len(songs):
+            self.show_dialog("Sin canciones", "La biblioteca no muestra ninguna canción")
+            return
+
+        field = MDTextField(hint_text="Nombre de la lista", text=song_list_screen.search_query)
+
+        def create(*args):
+            self.dialog.dismiss()
+            self.store.create(field.text, songs)
+            self.refresh()
+
+        self._open_dialog(MDDialog(
+            title=f"Guardar {len(songs)} canciones",
+            type="custom",
+            content_cls=field,
+            buttons=[
+                MDFlatButton(text="CANCELAR", on_release=lambda x: self.dialog.dismiss()),
+                MDFlatButton(text="GUARDAR", on_release=create),
+            ],
+        ))
+
+    def confirm_delete(self, playlist_id, playlist_name):
+        def delete(*args):
+            self.dialog.dismiss()
+            self.store.delete(playlist_id)
+            self.refresh()
+
+        self._open_dialog(MDDialog(
+            title="Borrar lista",
+            text=f"¿Borrar la lista \"{playlist_name}\"? Las canciones no se borran.",
+            buttons=[
+                MDFlatButton(text="CANCELAR", on_release=lambda x: self.dialog.dismiss()),
+                MDFlatButton(text="BORRAR", on_release=delete),
+            ],
+        ))
+
+    # --------------------------------------------------------------------------
+    ## IMPORTAR / EXPORTAR M3U (EN SEGUNDO PLANO)
+    # --------------------------------------------------------------------------
+
+    def _run_in_background(self, status, work, done):
+        """work() en un hilo; done(resultado) en el hilo principal."""
+        self.is_busy = True
+        self.status = status
+
+        def worker():
+            try:
+                result = work()
+            except Exception as e:
+                log.error("Error con la lista: %s", e)
+                result = e
+            Clock.schedule_once(lambda dt: self._finish(done, result), 0)
+
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    def _finish(self, done, result):
+        self.is_busy = False
+        self.status = ""
+        if isinstance(result, Exception):
+            self.show_dialog("Error", str(result))
+        else:
+            done(result)
+        self.refresh()
+
+    def open_import(self):
+        """Elegir un archivo M3U/M3U8 e importarlo."""
+        if self.is_busy:
+            return
+        if not PLYER_AVAILABLE:
+            self.show_dialog("Error", "El selector de archivos no está disponible.")
+            return
+        try:
+            music_folder = ConfigManager.get_music_folder()
+            filechooser.open_file(
+                title="Importar lista M3U",
+                path=music_folder if os.path.isdir(music_folder) else os.path.expanduser("~"),
+                filters=[["Listas M3U"] + [f"*{ext}" for ext in PLAYLIST_EXTENSIONS]],
+                on_selection=lambda selection: Clock.schedule_once(
+                    lambda dt: self.import_file(selection[0]) if selection else None, 0
+                ),
+            )
+        except Exception as e:
+            self.show_dialog("Error", f"No se pudo abrir el selector:\n{e}")
+
+    def import_file(self, file_path):
+        def progress(added, missing):
+            Clock.schedule_once(
+                lambda dt: setattr(self, 'status', f"Importando... {added} canciones"), 0
+            )
+
+        def done(result):
+            _playlist_id, added, missing = result
+            text = f"{added} canciones importadas"
+            if missing:
+                text += f"\n{missing} no están en la biblioteca"
+            self.show_dialog("Lista importada", text)
+
+        self._run_in_background(
+            f"Importando {os.path.basename(file_path)}...",
+            lambda: self.store.import_m3u(file_path, on_progress=progress),
+            done
+        )
+
+    def export(self, playlist_id, playlist_name):
+        """Exportar como M3U8 a la carpeta de música (rutas relativas)."""
+        if self.is_busy:
+            return
+        folder = ConfigManager.get_music_folder()
+        safe_name = "".join(c for c in playlist_name if c not in '\\/:*?"<>|').strip() or "Lista"
+        file_path = os.path.join(folder, f"{safe_name}.m3u8")
+
+        self._run_in_background(
+            f"Exportando {playlist_name}...",
+            lambda: self.store.export_m3u(
+                playlist_id, file_path, metadata=MetadataCache.get_default()
+            ),
+            lambda written: self.show_dialog(
+                "Lista exportada", f"{written} canciones en:\n{file_path}"
+            )
+        )
+
+    # --------------------------------------------------------------------------
+    ## DIÁLOGOS
+    # --------------------------------------------------------------------------
+
+    def _open_dialog(self, dialog):
+        if self.dialog:
+            self.dialog.dismiss()
+        self.dialog = dialog
+        self.dialog.open()
+
+    def show_dialog(self, title, text):
+        """Mostrar un diálogo simple."""
+        self._open_dialog(MDDialog(
+            title=title,
+            text=text,
+            buttons=[
+                MDFlatButton(
+                    text="OK",
+                    on_release=lambda x: self.dialog.dismiss()
+                ),
+            ],
+        ))
+
+    def go_back(self):
+        """Volver a la lista de canciones."""
+        self.manager.current = 'list'
@@ -1,11 +1,15 @@
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
-from kivy.properties import StringProperty
+from kivy.properties import StringProperty, BooleanProperty
 from utils.config_manager import ConfigManager
+from utils.library_index import is_music_file
+from utils.instrumentation import get_logger
 from kivy.utils import platform
 import os
 
+log = get_logger('settings')
+
 # Importar módulos de Android
 ANDROID = False
 if platform == 'android':
@@ -15,9 +19,9 @@ if platform == 'android':
         from android import activity, mActivity
         from jnius import autoclass, cast
         ANDROID = True
-        print("✅ Módulos de Android cargados correctamente")
+        log.info("Módulos de Android cargados")
     except ImportError as e:
-        print(f"⚠️ Módulos de Android no disponibles: {e}")
+        log.warning("Módulos de Android no disponibles: %s", e)
 
 # Importar plyer para Windows/Linux/Mac
 try:
@@ -28,6 +32,8 @@ except ImportError:
 
 class SettingsScreen(MDScreen):
     music_folder = StringProperty("")
+    watch_folder = BooleanProperty(True)
+    normalize_volume = BooleanProperty(True)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -35,12 +41,14 @@ class SettingsScreen(MDScreen):
         
         # Cargar configuración al iniciar
         self.music_folder = ConfigManager.get_music_folder()
+        self.watch_folder = ConfigManager.get_watch_folder()
+        self.normalize_volume = ConfigManager.get_normalize_volume()
         
         # Si es Android, configurar el callback y solicitar permisos
         if ANDROID:
             activity.bind(on_activity_result=self.on_activity_result)
             self.request_android_permissions()
-            print(f"📁 Carpeta inicial configurada: {self.music_folder}")
+            log.info("Carpeta de música configurada: %s", self.music_folder)
     
     def request_android_permissions(self):
         """Solicitar permisos de almacenamiento en Android."""
@@ -49,13 +57,13 @@ class SettingsScreen(MDScreen):
                 Permission.READ_EXTERNAL_STORAGE,
                 Permission.WRITE_EXTERNAL_STORAGE
             ])
-            print("✅ Permisos de almacenamiento solicitados")
+            log.info("Permisos de almacenamiento solicitados")
         except Exception as e:
-            print(f"❌ Error solicitando permisos: {e}")
+            log.error("Error solicitando permisos: %s", e)
     
     def open_file_manager(self):
         """Abrir el selector de carpetas según la plataforma."""
-        print(f"🔧 Abriendo selector de carpetas (Android: {ANDROID})")
+        log.debug("Abriendo selector de carpetas (Android: %s)", ANDROID)
         
         if ANDROID:
             self.open_android_folder_picker()
@@ -65,7 +73,7 @@ class SettingsScreen(MDScreen):
     def open_android_folder_picker(self):
         """Abrir el explorador de archivos nativo de Android (SAF)."""
         try:
-            print("📂 Iniciando Storage Access Framework...")
+            log.debug("Iniciando Storage Access Framework")
             
             Intent = autoclass('android.content.Intent')
             
@@ -80,26 +88,21 @@ class SettingsScreen(MDScreen):
                 # Intentar abrir en la carpeta Music por defecto
                 initial_uri = Uri.parse("content://com.android.externalstorage.documents/tree/primary:Music")
                 intent.putExtra(DocumentsContract.EXTRA_INITIAL_URI, initial_uri)
-                print("📍 Carpeta inicial configurada: Music")
             except Exception as e:
-                print(f"⚠️ No se pudo configurar carpeta inicial: {e}")
+                log.warning("No se pudo configurar la carpeta inicial: %s", e)
             
             # Iniciar el selector
             mActivity.startActivityForResult(intent, 42)
-            print("✅ Selector de carpetas abierto")
             
         except Exception as e:
-            print(f"❌ Error abriendo selector de Android: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error abriendo el selector de Android: %s", e)
             self.show_dialog("Error", f"No se pudo abrir el selector:\n{str(e)}")
     
     def on_activity_result(self, request_code, result_code, intent):
         """Callback cuando el usuario selecciona una carpeta en Android."""
-        print(f"📨 Activity result recibido - Code: {request_code}, Result: {result_code}")
+        log.debug("Activity result: request %s, result %s", request_code, result_code)
         
         if request_code != 42:
-            print("⏭️ No es nuestro request code, ignorando")
             return
         
         # result_code -1 = RESULT_OK (el usuario seleccionó algo)
@@ -112,15 +115,13 @@ class SettingsScreen(MDScreen):
                 # Decodificar caracteres especiales (%3A -> :, %2F -> /)
                 uri_string = uri_string.replace("%3A", ":").replace("%2F", "/").replace("%20", " ")
                 
-                print(f"📂 URI decodificado: {uri_string}")
+                log.debug("URI decodificado: %s", uri_string)
                 
                 # Extraer el path del URI
                 path = None
                 
                 # Caso 1: URIs con "primary:" (almacenamiento interno)
                 if "primary:" in uri_string:
-                    print("🔍 Detectado almacenamiento primario (internal storage)")
-                    
                     # Intentar extraer desde "tree/primary:"
                     if "/tree/primary:" in uri_string:
                         parts = uri_string.split("/tree/primary:")
@@ -129,7 +130,7 @@ class SettingsScreen(MDScreen):
                             
                             external_storage = primary_external_storage_path()
                             path = os.path.join(external_storage, relative_path)
-                            print(f"📁 Path extraído (tree): {path}")
+                            log.debug("Ruta extraída (tree): %s", path)
                     
                     # Si no funcionó, intentar desde "document/primary:"
                     elif "/document/primary:" in uri_string:
@@ -139,7 +140,7 @@ class SettingsScreen(MDScreen):
                             
                             external_storage = primary_external_storage_path()
                             path = os.path.join(external_storage, relative_path)
-                            print(f"📁 Path extraído (document): {path}")
+                            log.debug("Ruta extraída (document): %s", path)
                     
                     # Último intento: buscar cualquier "primary:"
                     else:
@@ -149,11 +150,11 @@ class SettingsScreen(MDScreen):
                             
                             external_storage = primary_external_storage_path()
                             path = os.path.join(external_storage, relative_path)
-                            print(f"📁 Path extraído (genérico): {path}")
+                            log.debug("Ruta extraída (genérico): %s", path)
                 
                 # Caso 2: URIs con números (tarjetas SD)
                 elif any(char.isdigit() for char in uri_string.split(":")[0]):
-                    print("💾 Detectado almacenamiento externo (SD card)")
+                    log.info("Carpeta en almacenamiento externo (tarjeta SD): %s", uri_string)
                     # Usar Clock.schedule_once para mostrar el diálogo en el thread principal
                     from kivy.clock import Clock
                     Clock.schedule_once(lambda dt: self.show_dialog(
@@ -164,12 +165,11 @@ class SettingsScreen(MDScreen):
                 
                 # Si se obtuvo un path, usarlo (desde el thread principal de Kivy)
                 if path:
-                    print(f"✅ Path final extraído: {path}")
                     # Usar Clock.schedule_once para ejecutar en el thread principal
                     from kivy.clock import Clock
                     Clock.schedule_once(lambda dt: self.select_folder(path), 0)
                 else:
-                    print(f"❌ No se pudo convertir el URI: {uri_string}")
+                    log.warning("No se pudo convertir el URI: %s", uri_string)
                     from kivy.clock import Clock
                     Clock.schedule_once(lambda dt: self.show_dialog(
                         "No se pudo determinar la ruta",
@@ -177,13 +177,11 @@ class SettingsScreen(MDScreen):
                     ), 0)
                         
             except Exception as e:
-                print(f"❌ Error procesando carpeta seleccionada: {e}")
-                import traceback
-                traceback.print_exc()
+                log.exception("Error procesando la carpeta seleccionada: %s", e)
                 from kivy.clock import Clock
                 Clock.schedule_once(lambda dt: self.show_dialog("Error", f"Error al procesar la carpeta:\n{str(e)}"), 0)
         else:
-            print("❌ Usuario canceló la selección o result_code incorrecto")
+            log.debug("Selección de carpeta cancelada")
     
     def open_desktop_file_manager(self):
         """Abrir selector de carpetas para Windows/Linux/Mac."""
@@ -201,29 +199,25 @@ class SettingsScreen(MDScreen):
                 selected_folder = selection[0]
                 self.select_folder(selected_folder)
             else:
-                print("No se seleccionó ninguna carpeta")
+                log.debug("No se seleccionó ninguna carpeta")
                 
         except Exception as e:
-            print(f"Error al abrir selector de carpetas: {e}")
+            log.error("Error al abrir el selector de carpetas: %s", e)
             self.show_dialog("Error", f"No se pudo abrir el selector:\n{str(e)}")
     
     def select_folder(self, path):
         """Guardar la carpeta seleccionada."""
-        print(f"🔄 Intentando seleccionar carpeta: {path}")
-        
         # Verificar si la carpeta existe
         exists = os.path.exists(path)
         is_dir = os.path.isdir(path) if exists else False
-        
-        print(f"   📊 Existe: {exists}")
-        print(f"   📊 Es directorio: {is_dir}")
+        log.debug("Carpeta seleccionada: %s (existe: %s, carpeta: %s)", path, exists, is_dir)
         
         if not exists:
             try:
                 os.makedirs(path)
-                print(f"✅ Carpeta creada: {path}")
+                log.info("Carpeta creada: %s", path)
             except Exception as e:
-                print(f"⚠️ No se pudo crear la carpeta: {e}")
+                log.warning("No se pudo crear la carpeta %s: %s", path, e)
         
         if exists and not is_dir:
             self.show_dialog("Error", f"La ruta no es una carpeta:\n{path}")
@@ -231,11 +225,10 @@ class SettingsScreen(MDScreen):
         
         # Actualizar la propiedad
         self.music_folder = path
-        print(f"🔄 music_folder actualizado a: {self.music_folder}")
         
         # Guardar en la configuración
         if ConfigManager.set_music_folder(path):
-            print(f"✅ Carpeta guardada en configuración: {path}")
+            log.info("Carpeta de música: %s", path)
             
             # Recargar la lista de canciones
             self.reload_song_list(path)
@@ -243,44 +236,32 @@ class SettingsScreen(MDScreen):
             # Contar archivos
             try:
                 files = os.listdir(path)
-                audio_files = [f for f in files if f.lower().endswith(('.mp3', '.m4a', '.flac', '.wav', '.ogg'))]
-                print(f"📊 Archivos de audio encontrados: {len(audio_files)}")
+                audio_files = [f for f in files if is_music_file(f)]
+                log.debug("Archivos de audio en la carpeta: %d", len(audio_files))
                 
                 self.show_dialog(
                     "¡Carpeta actualizada!", 
                     f"Carpeta de música:\n{path}\n\n{len(audio_files)} archivo(s) de audio encontrado(s)."
                 )
             except Exception as e:
-                print(f"⚠️ No se pudo listar archivos: {e}")
+                log.warning("No se pudo listar %s: %s", path, e)
                 self.show_dialog(
                     "¡Carpeta actualizada!", 
                     f"Carpeta de música:\n{path}"
                 )
         else:
-            print(f"❌ No se pudo guardar en configuración")
+            log.error("No se pudo guardar la carpeta en la configuración")
             self.show_dialog("Error", "No se pudo guardar la configuración")
     
     def reload_song_list(self, music_folder):
-        """Recargar la lista de canciones desde la nueva carpeta."""
+        """Recargar la lista de canciones desde la nueva carpeta (en segundo plano)."""
         try:
-            from utils.file_manager import find_music_files
-            
-            print(f"🔄 Buscando canciones en: {music_folder}")
-            songs = find_music_files(music_folder)
-            print(f"✅ Canciones encontradas: {len(songs)}")
-            
+            log.info("Buscando canciones en %s", music_folder)
             song_list_screen = self.manager.get_screen('list')
-            song_list_screen.songs = songs
-            
-            if hasattr(song_list_screen, 'on_pre_enter'):
-                song_list_screen.on_pre_enter()
-            
-            print(f"✅ Lista de reproducción actualizada")
+            song_list_screen.start_scan(music_folder, clear=True)
             
         except Exception as e:
-            print(f"❌ Error al recargar canciones: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error al recargar las canciones: %s", e)
     
     def show_dialog(self, title, text):
         """Mostrar un diálogo simple."""
@@ -299,13 +280,41 @@ class SettingsScreen(MDScreen):
         )
         self.dialog.open()
     
+    def change_watch_folder(self, enabled):
+        """Activar/desactivar la detección automática de cambios en la carpeta."""
+        if enabled == self.watch_folder:
+            return
+        self.watch_folder = enabled
+        ConfigManager.set_watch_folder(enabled)
+        
+        song_list_screen = self.manager.get_screen('list')
+        if enabled:
+            song_list_screen.watcher.start(self.music_folder)
+        else:
+            song_list_screen.watcher.stop()
+        log.info("Vigilancia de carpeta: %s", 'activada' if enabled else 'desactivada')
+    
+    def change_normalize_volume(self, enabled):
+        """Activar/desactivar la normalización de volumen entre pistas."""
+        if enabled == self.normalize_volume:
+            return
+        self.normalize_volume = enabled
+        ConfigManager.set_normalize_volume(enabled)
+        
+        # Analizar la biblioteca en segundo plano (se aplica desde la siguiente canción)
+        if enabled:
+            song_list_screen = self.manager.get_screen('list')
+            tracks = song_list_screen.tracks
+            song_list_screen.loudness.request([tracks.path(t) for t in song_list_screen.songs])
+        log.info("Normalización de volumen: %s", 'activada' if enabled else 'desactivada')
+    
     def change_theme(self, theme_style):
         """Cambiar entre tema claro y oscuro."""
         from kivymd.app import MDApp
         app = MDApp.get_running_app()
         app.theme_cls.theme_style = theme_style
         ConfigManager.set_theme(theme_style=theme_style)
-        print(f"✅ Tema cambiado a: {theme_style}")
+        log.info("Tema: %s", theme_style)
     
     def change_primary_color(self, color):
         """Cambiar el color primario del tema."""
@@ -313,7 +322,7 @@ class SettingsScreen(MDScreen):
         app = MDApp.get_running_app()
         app.theme_cls.primary_palette = color
         ConfigManager.set_theme(primary_color=color)
-        print(f"✅ Color primario cambiado a: {color}")
+        log.info("Color primario: %s", color)
     
     def go_back(self):
         """Volver a la lista de canciones."""
@@ -1,63 +1,429 @@
 from kivymd.uix.screen import MDScreen
-from kivy.properties import ListProperty, StringProperty, ObjectProperty
+from kivy.properties import ObjectProperty, StringProperty, NumericProperty
+from kivy.clock import Clock
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivymd.uix.card import MDCard
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton
-import os
+from utils.scanner import LibraryScanner
+from utils.folder_watcher import FolderWatcher
+from utils.config_manager import ConfigManager
+from utils.metadata import MetadataCache
+from utils.artwork_cache import ArtworkCache
+from utils.loudness import LoudnessCache
+from utils.search_index import SearchIndex
+from utils.track_table import TrackTable
+from utils.library_index import LibraryIndex
+from utils.instrumentation import get_logger, metrics
+from array import array
+from bisect import bisect_left
+import threading
 
-class SongItem(MDCard):
+log = get_logger('library')
+
+
+class SongItem(RecycleDataViewBehavior, MDCard):
     """Widget personalizado para cada canción en la lista."""
     text = StringProperty("")
-    callback = ObjectProperty(None)
-    song_path = StringProperty("")
+    secondary_text = StringProperty("")
+    track_id = NumericProperty(-1)
+    art = ObjectProperty(None, allownone=True)
+    
+    # Compartidos por todas las filas (los fija SongListScreen). Los datos
+    # del RecycleView no guardan nada por fila: el ID sale de la posición
+    # y los textos se resuelven solo para las filas visibles.
+    select_callback = None
+    track_at = None
+    text_for = None
+    art_for = None
+    
+    def refresh_view_attrs(self, rv, index, data):
+        """Rellenar la fila visible a partir de su posición en la lista."""
+        if SongItem.track_at:
+            self.track_id = SongItem.track_at(index)
+            self.text, self.secondary_text = SongItem.text_for(self.track_id)
+            SongItem.art_for(self, self.track_id)
+        return super().refresh_view_attrs(rv, index, data)
     
     def on_release(self):
         """Llamado cuando se hace clic en la card."""
-        if self.callback:
-            self.callback(self.song_path)
+        if SongItem.select_callback:
+            SongItem.select_callback(self.track_id)
+
+# Única fila compartida por todas las entradas del RecycleView
+EMPTY_ROW = {}
 
 class SongListScreen(MDScreen):
-    songs = ListProperty([])
+    # IDs de TrackTable en orden de la lista (array compacto de enteros)
+    songs = ObjectProperty(None)
+    scan_status = StringProperty("")
+    search_query = StringProperty("")
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.dialog = None
+        self.tracks = TrackTable.get_default()
+        # Nunca se modifica en el sitio: cada cambio crea un array nuevo, y
+        # el reproductor sabe por la identidad si su cola está al día
+        self.songs = array('I')
+        
+        # Escaneo en segundo plano de la carpeta de música
+        self.scanner = LibraryScanner(
+            on_batch=self._on_scan_batch,
+            on_done=self._on_scan_done
+        )
+        self._scan_seen = set()
+        self._scan_notify = False
+        self._scan_folder = None
+        # Altas/bajas llegadas durante un escaneo: la lista aún no está
+        # ordenada, se aplican cuando termina
+        self._scanning = False
+        self._scan_before = set()   # Pistas de antes del escaneo (para las bajas)
+        self._pending_added = []
+        self._pending_removed = set()
+        
+        # Vigilancia opcional de la carpeta (altas/bajas sin re-escanear)
+        self.watcher = FolderWatcher(
+            on_changes=self.apply_library_changes,
+            on_overflow=lambda: self.start_scan(self._scan_folder)
+        )
+        
+        # Metadatos (título/artista) extraídos en segundo plano
+        self.metadata = MetadataCache.get_default()
+        self.metadata.add_listener(self._on_metadata_updated)
+        self.metadata.request([])
+        
+        # Loudness de cada pista para la normalización de volumen
+        self.loudness = LoudnessCache.get_default()
+        
+        # Miniaturas de portada (se cargan en segundo plano al mostrarse)
+        self.artwork = ArtworkCache.get_default()
+        
+        # Índice de búsqueda (se construye fuera del hilo de la UI)
+        self.search_index = SearchIndex()
+        
+        # Modelo de la lista: IDs visibles; el RecycleView solo ve filas vacías
+        self._visible = array('I')
+        SongItem.select_callback = self.select_song
+        SongItem.track_at = self._visible_track_at
+        SongItem.text_for = self.display_text
+        SongItem.art_for = self.load_row_art
+
+    def _visible_track_at(self, index):
+        return self._visible[index]
+
+    def visible_tracks(self):
+        """Copia de los IDs que muestra la lista (con el filtro de búsqueda)."""
+        return array('I', self._visible)
+
+    def display_text(self, track_id):
+        """(título, artista) de una pista para mostrar en su fila."""
+        return self.metadata.display_text(self.tracks.path(track_id))
+
+    def load_row_art(self, row, track_id):
+        """
+        Portada de una fila: de la memoria si ya está; si no, se pide en
+        segundo plano y se aplica solo si la fila sigue mostrando esa pista
+        (el RecycleView recicla las filas al hacer scroll).
+        """
+        path = self.tracks.path(track_id)
+        row.art = self.artwork.get_texture(path)
+        if row.art is None and not self.artwork.has_no_artwork(path):
+            def apply(_path, texture):
+                if row.track_id == track_id:
+                    row.art = texture
+            self.artwork.request(path, apply)
+
+    def load_paths(self, paths):
+        """Reemplazar la biblioteca por una lista ordenada de rutas."""
+        self.songs = self.tracks.add_many(paths)
+
+    def _sync_list_data(self, visible):
+        """
+        Aplicar al RecycleView solo la diferencia con lo que ya muestra:
+        se recorta el prefijo y el sufijo comunes y se reemplaza el tramo
+        intermedio (un append si solo se añadieron canciones al final).
+        """
+        with metrics.timer('list.sync'):
+            self._apply_list_diff(visible)
+
+    def _apply_list_diff(self, visible):
+        old = self._visible
+        new = array('I', visible)
+        if new == old:
+            return
+        
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and old[start] == new[start]:
+            start += 1
+        
+        end_old, end_new = len(old), len(new)
+        while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+            end_old -= 1
+            end_new -= 1
+        
+        self._visible = new
+        rows = [EMPTY_ROW] * (end_new - start)
+        data = self.ids.song_list.data
+        if start == len(old):
+            data.extend(rows)
+        else:
+            data[start:end_old] = rows
 
     def on_pre_enter(self):
-        """Llenar la lista cuando se entra a la pantalla."""
-        self.ids.song_list.data = [
-            {
-                'text': os.path.basename(s),
-                'song_path': s,
-                'callback': self.select_song
-            }
-            for s in self.songs
-        ]
+        """Sincronizar la lista cuando se entra a la pantalla (solo si cambió)."""
+        results = self.search_index.search(self.search_query) if self.search_query else None
+        visible = self.songs if results is None else results
+        self._sync_list_data(visible)
+    
+    def filter_songs(self, text):
+        """Filtrar la lista con el índice de búsqueda (en cada tecla)."""
+        self.search_query = text
+        self.on_pre_enter()
+    
+    def rebuild_search_index(self):
+        """Reconstruir el índice de búsqueda en segundo plano."""
+        songs = array('I', self.songs)
+        
+        def build():
+            index = SearchIndex()
+            with metrics.timer('search.build'):
+                index.build(songs, self.tracks, self.metadata)
+            
+            def swap(dt):
+                self.search_index = index
+                if self.search_query:
+                    self.on_pre_enter()
+            Clock.schedule_once(swap, 0)
+        
+        thread = threading.Thread(target=build)
+        thread.daemon = True
+        thread.start()
+    
+    def _on_metadata_updated(self, paths):
+        """Refrescar las filas visibles cuando llegan etiquetas nuevas."""
+        if paths is None:
+            # Se cargó la caché guardada
+            self.rebuild_search_index()
+        
+        # Las filas solo guardan el ID: basta con volver a pintar las visibles
+        self.ids.song_list.refresh_from_data()
 
-    def select_song(self, song_path):
+    def select_song(self, track_id):
         """Seleccionar una canción y cambiar al reproductor."""
         player_screen = self.manager.get_screen('player')
-        player_screen.load_song(song_path, self.songs)
+        player_screen.load_song(track_id, self.songs)
         self.manager.current = 'player'
     
     def refresh_song_list(self):
         """Refrescar/recargar la lista de canciones desde la carpeta configurada."""
-        try:
-            from utils.file_manager import find_music_files
-            from utils.config_manager import ConfigManager
-            
-            music_folder = ConfigManager.get_music_folder()
-            self.songs = find_music_files(music_folder)
-            
-            # Actualizar la vista
+        music_folder = ConfigManager.get_music_folder()
+        self.start_scan(music_folder, notify=True)
+    
+    def start_scan(self, music_folder, clear=False, notify=False):
+        """
+        Escanear la carpeta en segundo plano. Las canciones nuevas se añaden
+        a la lista por lotes; un escaneo nuevo cancela el anterior.
+        """
+        self._scan_before.update(self.songs)
+        if clear:
+            self.songs = array('I')
             self.on_pre_enter()
-            
-            # Mostrar mensaje
+        
+        self._scan_seen = set(self.songs)
+        self._scan_notify = notify
+        self._scan_folder = music_folder
+        self.scan_status = "Buscando canciones..."
+        self._scanning = True
+        self.scanner.start(music_folder)
+    
+    def _on_scan_batch(self, paths, dirs_scanned):
+        """Añadir un lote de canciones encontradas (hilo principal)."""
+        ids = [self.tracks.add(p) for p in paths]
+        new_songs = [t for t in ids if t not in self._scan_seen]
+        self._scan_seen.update(new_songs)
+        
+        if new_songs:
+            self.songs = self.songs + array('I', new_songs)
+            self.on_pre_enter()
+        
+        self.scan_status = f"Escaneando... {len(self._scan_seen)} canciones · {dirs_scanned} carpetas"
+    
+    def _on_scan_done(self, paths):
+        """Fin del escaneo: reemplazar por la lista final ordenada."""
+        self.scan_status = ""
+        self._scan_seen = set()
+        self._scanning = False
+        before, self._scan_before = self._scan_before, set()
+        
+        if paths is None:
+            # Lista parcial en orden de llegada: ordenarla para poder insertar
+            self.songs = array('I', sorted(self.songs, key=self.tracks.sort_key))
+            self._apply_pending()
+            self.on_pre_enter()
+            if self._scan_notify:
+                self.show_message("Error", "No se pudo actualizar la lista")
+            return
+        
+        songs = self.tracks.add_many(paths)
+        # Lo que ya no está en disco deja de contar como de la biblioteca
+        for track_id in before.union(self.songs).difference(songs):
+            self.tracks.remove(track_id)
+        if songs != self.songs:
+            self.songs = songs
+            self.on_pre_enter()
+        self._apply_pending()
+        
+        if ConfigManager.get_watch_folder():
+            self.watcher.start(self._scan_folder)
+        
+        # Extraer/validar etiquetas de toda la biblioteca en segundo plano
+        self.metadata.request(paths)
+        self.rebuild_search_index()
+        if ConfigManager.get_normalize_volume():
+            self.loudness.request(paths)
+        
+        if self._scan_notify:
             self.show_message("Lista actualizada", f"{len(self.songs)} canciones encontradas")
-            
-        except Exception as e:
-            print(f"Error al refrescar canciones: {e}")
-            self.show_message("Error", "No se pudo actualizar la lista")
+    
+    # --------------------------------------------------------------------------
+    ## ALTAS, BAJAS Y RENOMBRADOS SIN RE-ESCANEAR
+    # --------------------------------------------------------------------------
+    
+    def _sorted_position(self, track_id):
+        """Posición de una pista en la lista ordenada (bisect, O(log n))."""
+        sort_key = self.tracks.sort_key
+        return bisect_left(self.songs, sort_key(track_id), key=sort_key)
+    
+    def _insert_sorted(self, track_id):
+        """Insertar una pista en su sitio de la lista ordenada. O(log n) comparaciones."""
+        songs = self.songs
+        position = self._sorted_position(track_id)
+        if position < len(songs) and songs[position] == track_id:
+            return False
+        self.songs = songs[:position] + array('I', (track_id,)) + songs[position:]
+        return True
+    
+    def _remove_sorted(self, track_id):
+        """Quitar una pista de la lista ordenada (localizada por bisect)."""
+        songs = self.songs
+        position = self._sorted_position(track_id)
+        if position < len(songs) and songs[position] == track_id:
+            self.songs = songs[:position] + songs[position + 1:]
+            return True
+        return False
+    
+    def _apply_pending(self):
+        """Aplicar las altas/bajas que esperaban al final del escaneo."""
+        added, self._pending_added = self._pending_added, []
+        removed, self._pending_removed = self._pending_removed, set()
+        added = [p for p in added if p not in removed]
+        if added:
+            self.add_tracks(added)
+        if removed:
+            self.remove_tracks(removed)
+    
+    def _library_mutated(self, added_paths=()):
+        """Refrescar lista visible, metadatos y búsqueda tras una mutación."""
+        self.on_pre_enter()
+        if added_paths:
+            self.metadata.request(list(added_paths), priority=True)
+            if ConfigManager.get_normalize_volume():
+                self.loudness.request(list(added_paths))
+        self.rebuild_search_index()
+    
+    def add_tracks(self, paths):
+        """
+        Añadir archivos concretos (p. ej. la ruta final de una descarga) a la
+        lista ya ordenada, sin recorrer carpetas. La cola del reproductor no
+        se toca. Devuelve cuántas pistas eran nuevas (0 si se aplazan hasta
+        el final del escaneo en curso).
+        """
+        if self._scanning:
+            self._pending_added.extend(paths)
+            return 0
+        added = [p for p in paths if self._insert_sorted(self.tracks.add(p))]
+        if added:
+            LibraryIndex.get_default().add_files(added)
+            self._library_mutated(added)
+        return len(added)
+    
+    def remove_tracks(self, paths):
+        """Quitar archivos concretos de la lista. Devuelve cuántos había."""
+        if self._scanning:
+            # El escaneo aún podría devolverlos: quitarlos también al final
+            self._pending_removed.update(paths)
+            gone = {t for t in map(self.tracks.id_of, paths) if t is not None}
+            before = len(self.songs)
+            self.songs = array('I', (t for t in self.songs if t not in gone))
+            if len(self.songs) != before:
+                self.on_pre_enter()
+            return before - len(self.songs)
+        removed = []
+        for path in paths:
+            track_id = self.tracks.id_of(path)
+            if track_id is not None and self._remove_sorted(track_id):
+                self.tracks.remove(track_id)
+                removed.append(path)
+        if removed:
+            LibraryIndex.get_default().remove_files(removed)
+            self._library_mutated()
+        return len(removed)
+    
+    def rename_track(self, old_path, new_path):
+        """Un archivo cambió de nombre o de carpeta: moverlo en la lista."""
+        if self._scanning:
+            self.remove_tracks([old_path])
+            self.add_tracks([new_path])
+            return True
+        track_id = self.tracks.id_of(old_path)
+        if track_id is None or not self._remove_sorted(track_id):
+            return self.add_tracks([new_path]) > 0
+        self.tracks.remove(track_id)
+        LibraryIndex.get_default().remove_files([old_path])
+        self._insert_sorted(self.tracks.add(new_path))
+        LibraryIndex.get_default().add_files([new_path])
+        self._library_mutated([new_path])
+        return True
+    
+    def apply_library_changes(self, added, removed):
+        """Aplicar altas/bajas detectadas por el watcher sin re-escanear."""
+        tracks = self.tracks
+        removed_ids = set()
+        removed_dirs = set()
+        for path in removed:
+            track_id = tracks.id_of(path)
+            if track_id is not None:
+                removed_ids.add(track_id)
+            removed_dirs.update(tracks.dir_ids_under(path))
+        
+        current = set(self.songs)
+        added_ids = [t for t in (tracks.add(p) for p in added) if t not in current]
+        
+        songs = [
+            t for t in self.songs
+            if t not in removed_ids and tracks.dir_id(t) not in removed_dirs
+        ]
+        removed_count = len(self.songs) - len(songs)
+        if not added_ids and not removed_count:
+            return
+        
+        # Dar de baja lo borrado también en la tabla y en el índice
+        kept = set(songs)
+        gone = [t for t in self.songs if t not in kept]
+        index = LibraryIndex.get_default()
+        index.remove_files([tracks.path(t) for t in gone])
+        index.add_files([tracks.path(t) for t in added_ids])
+        for track_id in gone:
+            tracks.remove(track_id)
+        
+        songs.extend(added_ids)
+        songs.sort(key=tracks.sort_key)
+        self.songs = array('I', songs)
+        # Metadatos y loudness de las nuevas, como en add_tracks
+        self._library_mutated([tracks.path(t) for t in added_ids])
+        log.info("Biblioteca actualizada: +%d / -%d", len(added_ids), removed_count)
     
     def show_message(self, title, text):
         """Mostrar un mensaje temporal."""
@@ -84,6 +450,14 @@ class SongListScreen(MDScreen):
         """Abrir la pantalla de descarga."""
         self.manager.current = 'downloader'
     
+    def open_duplicates(self):
+        """Abrir la búsqueda de canciones duplicadas."""
+        self.manager.current = 'duplicates'
+    
+    def open_playlists(self):
+        """Abrir las listas de reproducción guardadas."""
+        self.manager.current = 'playlists'
+    
     def show_about(self):
         """Mostrar información sobre la app."""
         if self.dialog:
@@ -0,0 +1,20 @@
+import os
+
+
+def get_user_data_dir():
+    """
+    Devuelve la carpeta de datos de la app (índices, cachés...).
+
+    Usa el user_data_dir de la app de Kivy en ejecución; si no hay app
+    (scripts, benchmarks) cae al directorio actual.
+    """
+    try:
+        from kivy.app import App
+        app = App.get_running_app()
+        if app is not None:
+            path = app.user_data_dir
+            os.makedirs(path, exist_ok=True)
+            return path
+    except ImportError:
+        pass
+    return os.getcwd()
@@ -0,0 +1,408 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.app_paths import get_user_data_dir
+from utils.instrumentation import get_logger, metrics
+from utils.metadata import _create_executor
+
+log = get_logger('artwork')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbs (
+    path TEXT NOT NULL,
+    size_px INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    file TEXT,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, size_px)
+);
+CREATE INDEX IF NOT EXISTS thumbs_last_used ON thumbs(last_used);
+"""
+
+# Tamaños de miniatura (lado mayor, en píxeles)
+ROW_SIZE = 128      # Filas de la lista de canciones
+COVER_SIZE = 512    # Portada de PlayerScreen
+
+
+def thumbnail_name(path, size_px):
+    """Nombre del archivo de miniatura de una pista y un tamaño."""
+    digest = hashlib.sha1(f"{path}\0{size_px}".encode('utf-8', 'surrogateescape')).hexdigest()
+    return f"{digest}.jpg"
+
+
+def _embedded_picture(audio):
+    """Bytes de la portada incrustada (ID3, MP4, FLAC/Vorbis/Opus) o None."""
+    tags = audio.tags
+    if tags is not None:
+        # MP3 (ID3): la portada delantera si existe, si no la primera
+        if hasattr(tags, 'getall'):
+            frames = tags.getall('APIC')
+            if frames:
+                front = [f for f in frames if getattr(f, 'type', None) == 3]
+                return (front or frames)[0].data
+        # M4A/MP4
+        covers = tags.get('covr') if hasattr(tags, 'get') else None
+        if covers:
+            return bytes(covers[0])
+        # Ogg Vorbis/Opus: METADATA_BLOCK_PICTURE en base64
+        blocks = tags.get('metadata_block_picture') if hasattr(tags, 'get') else None
+        if blocks:
+            import base64
+            from mutagen.flac import Picture
+            return Picture(base64.b64decode(blocks[0])).data
+    # FLAC
+    pictures = getattr(audio, 'pictures', None)
+    if pictures:
+        return pictures[0].data
+    return None
+
+
+def extract_thumbnail(path, size_px, out_path):
+    """
+    Extrae la portada incrustada con mutagen y guarda una miniatura JPEG
+    reducida con Pillow en `out_path`.
+
+    Se ejecuta en los procesos del pool, por eso es una función de módulo.
+    Devuelve (ruta, tamaño_px, mtime_ns, tamaño, tiene_portada, bytes) o
+    None si el archivo ya no existe o faltan mutagen/Pillow.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    try:
+        from mutagen import File as MutagenFile
+        from PIL import Image
+    except ImportError:
+        return None
+
+    data = None
+    try:
+        audio = MutagenFile(path)
+        if audio is not None:
+            data = _embedded_picture(audio)
+    except Exception:
+        data = None
+
+    if not data:
+        return (path, size_px, st.st_mtime_ns, st.st_size, False, 0)
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert('RGB')
+            image.thumbnail((size_px, size_px))
+            tmp_path = out_path + '.tmp'
+            image.save(tmp_path, 'JPEG', quality=85)
+        os.replace(tmp_path, out_path)
+    except Exception:
+        # Imagen corrupta o formato desconocido: como si no tuviera portada
+        return (path, size_px, st.st_mtime_ns, st.st_size, False, 0)
+
+    return (path, size_px, st.st_mtime_ns, st.st_size, True, os.path.getsize(out_path))
+
+
+def _extract_job(job):
+    return extract_thumbnail(*job)
+
+
+def _decode_thumbnail(file_path):
+    """JPEG de la caché -> (ancho, alto, píxeles RGB de abajo a arriba)."""
+    from PIL import Image
+    with Image.open(file_path) as image:
+        image = image.convert('RGB').transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        return image.size[0], image.size[1], image.tobytes()
+
+
+class ArtworkCache:
+    """
+    Miniaturas de las portadas incrustadas en los archivos de audio.
+
+    - En disco: JPEG reducidos en la carpeta de datos, con un índice SQLite
+      (ruta + tamaño, validado por mtime y tamaño del archivo). El total
+      está acotado a MAX_DISK_BYTES y se expulsan las menos usadas (LRU).
+    - En memoria: las últimas MEMORY_ITEMS texturas, listas para pintar.
+
+    Las filas piden su miniatura con request(); la extracción (mutagen +
+    Pillow) va a un pool de procesos y la lectura del JPEG a un hilo. Las
+    peticiones más recientes se atienden primero y las más antiguas se
+    descartan al pasar de MAX_PENDING: al hacer scroll rápido solo se
+    decodifica lo que sigue en pantalla.
+    """
+
+    DB_NAME = "artwork_cache.db"
+    FOLDER_NAME = "thumbnails"
+    MAX_DISK_BYTES = 64 * 1024 * 1024
+    MEMORY_ITEMS = 160
+    MAX_PENDING = 96
+    BATCH_SIZE = 8      # Peticiones atendidas por vuelta del coordinador
+    WORKERS = 2
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path, folder):
+        self.db_path = db_path
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._records = {}              # (ruta, tamaño_px) -> (mtime_ns, tamaño, archivo, bytes)
+        self._loaded = False
+        self._disk_bytes = 0
+        self._textures = OrderedDict()  # (ruta, tamaño_px) -> Texture (LRU)
+        self._pending = OrderedDict()   # (ruta, tamaño_px) -> [callbacks]
+        self._worker = None
+
+    @classmethod
+    def get_default(cls):
+        """Caché compartida, guardada en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                data_dir = get_user_data_dir()
+                cls._default = cls(
+                    os.path.join(data_dir, cls.DB_NAME),
+                    os.path.join(data_dir, cls.FOLDER_NAME)
+                )
+            return cls._default
+
+    # --------------------------------------------------------------------------
+    ## LECTURA (HILO PRINCIPAL, SIN I/O)
+    # --------------------------------------------------------------------------
+
+    def get_texture(self, path, size_px=ROW_SIZE):
+        """Textura en memoria de la portada, o None si no está cargada."""
+        key = (path, size_px)
+        texture = self._textures.get(key)
+        if texture is not None:
+            self._textures.move_to_end(key)
+            metrics.count('artwork.hit')
+        else:
+            metrics.count('artwork.miss')
+        return texture
+
+    def has_no_artwork(self, path, size_px=ROW_SIZE):
+        """True si ya se sabe que la pista no tiene portada."""
+        record = self._records.get((path, size_px))
+        return record is not None and record[2] is None
+
+    def request(self, path, callback, size_px=ROW_SIZE):
+        """
+        Cargar en segundo plano la portada de una pista. `callback(ruta,
+        textura)` se llama en el hilo principal (textura None si no tiene).
+        """
+        key = (path, size_px)
+        with self._lock:
+            callbacks = self._pending.get(key)
+            if callbacks is None:
+                self._pending[key] = callbacks = []
+            else:
+                self._pending.move_to_end(key)
+            callbacks.append(callback)
+
+            # Las más antiguas ya no están en pantalla
+            while len(self._pending) > self.MAX_PENDING:
+                self._pending.popitem(last=False)
+                metrics.count('artwork.dropped')
+
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._worker_thread)
+                self._worker.daemon = True
+                self._worker.start()
+
+    # --------------------------------------------------------------------------
+    ## COORDINADOR EN SEGUNDO PLANO
+    # --------------------------------------------------------------------------
+
+    def _load_from_disk(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size_px, mtime_ns, size, file, bytes FROM thumbs"
+            ).fetchall()
+        self._records = {
+            (path, size_px): (mtime_ns, size, file, nbytes)
+            for path, size_px, mtime_ns, size, file, nbytes in rows
+        }
+        self._disk_bytes = sum(r[3] for r in self._records.values())
+        self._loaded = True
+
+    def _take_batch(self):
+        """Las peticiones más recientes primero (LIFO)."""
+        with self._lock:
+            batch = []
+            while self._pending and len(batch) < self.BATCH_SIZE:
+                batch.append(self._pending.popitem(last=True))
+            if not batch:
+                self._worker = None
+            return batch
+
+    def _cached_file(self, key):
+        """Archivo de miniatura vigente, '' si no tiene portada, None si hay que extraer."""
+        record = self._records.get(key)
+        if record is None:
+            return None
+        try:
+            st = os.stat(key[0])
+        except OSError:
+            return None
+        mtime_ns, size, file, _nbytes = record
+        if st.st_mtime_ns != mtime_ns or st.st_size != size:
+            return None
+        if file is None:
+            return ''
+        file_path = os.path.join(self.folder, file)
+        return file_path if os.path.exists(file_path) else None
+
+    def _worker_thread(self):
+        from kivy.clock import Clock
+
+        if not self._loaded:
+            self._load_from_disk()
+
+        executor = None
+        try:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+
+                ready = {}      # key -> ruta del JPEG o '' (sin portada)
+                jobs = []
+                for key, _callbacks in batch:
+                    file_path = self._cached_file(key)
+                    if file_path is None:
+                        path, size_px = key
+                        jobs.append((path, size_px, os.path.join(self.folder, thumbnail_name(path, size_px))))
+                    else:
+                        ready[key] = file_path
+
+                if jobs:
+                    if executor is None:
+                        executor = _create_executor(self.WORKERS)
+                    start = time.perf_counter()
+                    results = list(executor.map(_extract_job, jobs))
+                    metrics.record('artwork.extract', (time.perf_counter() - start) / len(jobs))
+                    for key, file_path in self._store(results).items():
+                        ready[key] = file_path
+
+                self._touch(ready)
+                decoded = []
+                for key, callbacks in batch:
+                    file_path = ready.get(key)
+                    pixels = None
+                    if file_path:
+                        try:
+                            pixels = _decode_thumbnail(file_path)
+                        except Exception as e:
+                            log.debug("Miniatura ilegible %s: %s", file_path, e)
+                    decoded.append((key, pixels, callbacks))
+
+                Clock.schedule_once(lambda dt, d=decoded: self._deliver(d), 0)
+        except Exception as e:
+            log.warning("Error cargando portadas: %s", e)
+            with self._lock:
+                self._pending.clear()
+                self._worker = None
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _store(self, results):
+        """Guardar en el índice lo extraído; devuelve key -> ruta del JPEG o ''."""
+        rows = []
+        ready = {}
+        now = time.time()
+        for result in results:
+            if result is None:
+                continue
+            path, size_px, mtime_ns, size, has_art, nbytes = result
+            key = (path, size_px)
+            file = thumbnail_name(path, size_px) if has_art else None
+            old = self._records.get(key)
+            self._disk_bytes += nbytes - (old[3] if old is not None else 0)
+            self._records[key] = (mtime_ns, size, file, nbytes)
+            rows.append((path, size_px, mtime_ns, size, file, nbytes, now))
+            ready[key] = os.path.join(self.folder, file) if file else ''
+
+        if rows:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO thumbs "
+                    "(path, size_px, mtime_ns, size, file, bytes, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+            if self._disk_bytes > self.MAX_DISK_BYTES:
+                self._evict(keep=set(ready))
+        return ready
+
+    def _touch(self, keys):
+        """Marcar como usadas (orden LRU del disco)."""
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE thumbs SET last_used = ? WHERE path = ? AND size_px = ?",
+                [(now, path, size_px) for path, size_px in keys],
+            )
+            self._conn.commit()
+
+    def _evict(self, keep=()):
+        """Borrar las miniaturas menos usadas hasta bajar del 90 % del límite."""
+        target = self.MAX_DISK_BYTES * 0.9
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size_px, file, bytes FROM thumbs "
+                "WHERE file IS NOT NULL ORDER BY last_used"
+            ).fetchall()
+            removed = []
+            for path, size_px, file, nbytes in rows:
+                if self._disk_bytes <= target:
+                    break
+                if (path, size_px) in keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.folder, file))
+                except OSError:
+                    pass
+                self._disk_bytes -= nbytes
+                self._records.pop((path, size_px), None)
+                removed.append((path, size_px))
+            self._conn.executemany(
+                "DELETE FROM thumbs WHERE path = ? AND size_px = ?", removed
+            )
+            self._conn.commit()
+        metrics.count('artwork.evicted', len(removed))
+
+    # --------------------------------------------------------------------------
+    ## ENTREGA EN EL HILO PRINCIPAL
+    # --------------------------------------------------------------------------
+
+    def _deliver(self, decoded):
+        """Crear las texturas (solo subir píxeles ya decodificados) y avisar."""
+        from kivy.graphics.texture import Texture
+
+        for key, pixels, callbacks in decoded:
+            texture = None
+            if pixels is not None:
+                width, height, data = pixels
+                texture = Texture.create(size=(width, height), colorfmt='rgb')
+                texture.blit_buffer(data, colorfmt='rgb', bufferfmt='ubyte')
+                self._textures[key] = texture
+                self._textures.move_to_end(key)
+                while len(self._textures) > self.MEMORY_ITEMS:
+                    self._textures.popitem(last=False)
+            for callback in callbacks:
+                callback(key[0], texture)
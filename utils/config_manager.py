@@ -1,38 +1,118 @@
+import atexit
 import json
 import os
+import threading
+
+from utils.app_paths import get_user_data_dir
+from utils.instrumentation import get_logger
+
+log = get_logger('config')
 
 class ConfigManager:
-    """Gestiona la configuración de la app (carpeta de música, tema, etc.)"""
+    """
+    Gestiona la configuración de la app (carpeta de música, tema, etc.)
+    
+    La configuración se lee una sola vez y se sirve desde memoria. Los
+    cambios se agrupan y se escriben con un retardo de SAVE_DELAY segundos,
+    de forma atómica (archivo temporal + rename) en la carpeta de datos.
+    """
     
     CONFIG_FILE = "music_player_config.json"
+    SAVE_DELAY = 0.5
+    
+    _config = None
+    _lock = threading.RLock()
+    _save_timer = None
+    _dirty = False      # Hay cambios sin escribir
     
     @staticmethod
-    def load_config():
-        """Cargar configuración desde el archivo JSON."""
-        if os.path.exists(ConfigManager.CONFIG_FILE):
-            try:
-                with open(ConfigManager.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        # Configuración por defecto
+    def default_config():
+        """Configuración por defecto."""
         return {
             'music_folder': os.path.expanduser("~/Music"),
             'theme_style': 'Dark',
-            'primary_color': 'Blue'
+            'primary_color': 'Blue',
+            'watch_music_folder': True,
+            'normalize_volume': True,
+            'download_workers': 3,
+            'download_codec': 'best',
+            'download_quality': '192'
         }
     
     @staticmethod
-    def save_config(config):
-        """Guardar configuración en el archivo JSON."""
+    def get_config_path():
+        """Ruta del archivo de configuración en la carpeta de datos de la app."""
+        return os.path.join(get_user_data_dir(), ConfigManager.CONFIG_FILE)
+    
+    @staticmethod
+    def _read_file(path):
+        """Leer un archivo de configuración; None si no existe o está dañado."""
         try:
-            with open(ConfigManager.CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Error guardando configuración: {e}")
-            return False
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("Configuración ilegible en %s: %s", path, e)
+            return None
+        return data if isinstance(data, dict) else None
+    
+    @staticmethod
+    def load_config():
+        """Obtener la configuración (desde memoria tras la primera lectura)."""
+        with ConfigManager._lock:
+            if ConfigManager._config is None:
+                config = ConfigManager.default_config()
+                
+                # Migrar el archivo antiguo del directorio de trabajo
+                stored = ConfigManager._read_file(ConfigManager.get_config_path())
+                if stored is None and os.path.abspath(ConfigManager.CONFIG_FILE) != ConfigManager.get_config_path():
+                    stored = ConfigManager._read_file(ConfigManager.CONFIG_FILE)
+                    # Copiarlo a la carpeta de datos en la próxima escritura
+                    ConfigManager._dirty = stored is not None
+                
+                if stored:
+                    config.update(stored)
+                ConfigManager._config = config
+            return ConfigManager._config
+    
+    @staticmethod
+    def save_config(config):
+        """Actualizar la configuración y programar su escritura en disco."""
+        with ConfigManager._lock:
+            ConfigManager._config = config
+            ConfigManager._dirty = True
+            if ConfigManager._save_timer is not None:
+                ConfigManager._save_timer.cancel()
+            ConfigManager._save_timer = threading.Timer(ConfigManager.SAVE_DELAY, ConfigManager.flush)
+            ConfigManager._save_timer.daemon = True
+            ConfigManager._save_timer.start()
+        return True
+    
+    @staticmethod
+    def flush():
+        """Escribir ya los cambios pendientes (temporal + rename atómico)."""
+        with ConfigManager._lock:
+            if ConfigManager._save_timer is not None:
+                ConfigManager._save_timer.cancel()
+                ConfigManager._save_timer = None
+            # Sin cambios no se reescribe (on_pause, on_stop, atexit)
+            if ConfigManager._config is None or not ConfigManager._dirty:
+                return True
+            
+            path = ConfigManager.get_config_path()
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(ConfigManager._config, f, indent=4, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                ConfigManager._dirty = False
+                return True
+            except OSError as e:
+                log.error("Error guardando la configuración: %s", e)
+                return False
     
     @staticmethod
     def get_music_folder():
@@ -47,6 +127,64 @@ class ConfigManager:
         config['music_folder'] = folder_path
         return ConfigManager.save_config(config)
     
+    @staticmethod
+    def get_watch_folder():
+        """Obtener si se vigilan los cambios en la carpeta de música."""
+        config = ConfigManager.load_config()
+        return config.get('watch_music_folder', True)
+    
+    @staticmethod
+    def set_watch_folder(enabled):
+        """Activar/desactivar la vigilancia de la carpeta de música."""
+        config = ConfigManager.load_config()
+        config['watch_music_folder'] = bool(enabled)
+        return ConfigManager.save_config(config)
+    
+    @staticmethod
+    def get_normalize_volume():
+        """Obtener si se iguala el volumen entre pistas (loudness)."""
+        config = ConfigManager.load_config()
+        return config.get('normalize_volume', True)
+    
+    @staticmethod
+    def set_normalize_volume(enabled):
+        """Activar/desactivar la normalización de volumen."""
+        config = ConfigManager.load_config()
+        config['normalize_volume'] = bool(enabled)
+        return ConfigManager.save_config(config)
+    
+    @staticmethod
+    def get_download_workers():
+        """Obtener cuántas descargas se ejecutan a la vez."""
+        config = ConfigManager.load_config()
+        try:
+            return max(1, int(config.get('download_workers', 3)))
+        except (TypeError, ValueError):
+            return 3
+    
+    @staticmethod
+    def set_download_workers(count):
+        """Establecer cuántas descargas se ejecutan a la vez."""
+        config = ConfigManager.load_config()
+        config['download_workers'] = max(1, int(count))
+        return ConfigManager.save_config(config)
+    
+    @staticmethod
+    def get_download_format():
+        """Obtener el formato de descarga: (códec, calidad en kbps)."""
+        config = ConfigManager.load_config()
+        return config.get('download_codec', 'best'), str(config.get('download_quality', '192'))
+    
+    @staticmethod
+    def set_download_format(codec=None, quality=None):
+        """Establecer el códec ('best' = sin recodificar, 'm4a', 'opus', 'mp3') y la calidad."""
+        config = ConfigManager.load_config()
+        if codec:
+            config['download_codec'] = codec
+        if quality:
+            config['download_quality'] = str(quality)
+        return ConfigManager.save_config(config)
+    
     @staticmethod
     def get_theme():
         """Obtener configuración del tema."""
@@ -64,4 +202,8 @@ class ConfigManager:
             config['theme_style'] = theme_style
         if primary_color:
             config['primary_color'] = primary_color
-        return ConfigManager.save_config(config)
\ No newline at end of file
+        return ConfigManager.save_config(config)
+
+
+# No perder cambios pendientes al cerrar la app
+atexit.register(ConfigManager.flush)
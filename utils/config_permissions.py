@@ -1,5 +1,8 @@
 from kivy.utils import platform
 from android.permissions import request_permissions, Permission
+from utils.instrumentation import get_logger
+
+log = get_logger('permissions')
 
 def get_permissions():
     if platform == "android":
@@ -8,6 +11,6 @@ def get_permissions():
                 Permission.READ_EXTERNAL_STORAGE,
                 Permission.WRITE_EXTERNAL_STORAGE
             ])
-            print("Permisos solicitados correctamente.")
+            log.info("Permisos solicitados")
         except Exception as e:
-            print(f"Error pidiendo permisos: {e}")
+            log.error("Error pidiendo permisos: %s", e)
@@ -0,0 +1,130 @@
+import os
+import re
+import sqlite3
+import threading
+from urllib.parse import urlparse, parse_qs
+
+from utils.app_paths import get_user_data_dir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    video_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    title TEXT
+);
+"""
+
+# IDs de vídeo de YouTube: 11 caracteres [A-Za-z0-9_-]
+_VIDEO_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# Los archivos se guardan como "Título [ID].ext" (plantilla de yt-dlp)
+OUTPUT_TEMPLATE = '%(title)s [%(id)s].%(ext)s'
+_ID_IN_NAME = re.compile(r'\[([A-Za-z0-9_-]{11})\]\.[^.]+$')
+
+
+def youtube_video_id(url):
+    """ID del vídeo a partir de la URL, sin red; None si no es un vídeo."""
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").lower()
+    path_parts = [p for p in parsed.path.split('/') if p]
+
+    candidate = None
+    if host.endswith("youtu.be"):
+        candidate = path_parts[0] if path_parts else None
+    elif "youtube.com" in host:
+        if path_parts[:1] == ['watch']:
+            candidate = (parse_qs(parsed.query).get('v') or [None])[0]
+        elif len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live', 'v'):
+            candidate = path_parts[1]
+
+    if candidate and _VIDEO_ID.match(candidate):
+        return candidate
+    return None
+
+
+def video_id_from_filename(path):
+    """ID guardado en el nombre de archivo ("Título [ID].mp3"), o None."""
+    match = _ID_IN_NAME.search(os.path.basename(path))
+    return match.group(1) if match else None
+
+
+class DownloadArchive:
+    """
+    Archivo persistente (SQLite) de descargas: ID de vídeo -> archivo local.
+
+    Se consulta antes de tocar la red, así que reenviar una URL o una
+    playlist ya descargada no cuesta nada. Las entradas cuyo archivo ya
+    no existe se olvidan al consultarlas; `rebuild` lo reconstruye a
+    partir de los nombres de archivo de la carpeta de música.
+    """
+
+    DB_NAME = "download_archive.db"
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def get_default(cls):
+        """Archivo compartido, guardado en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                db_path = os.path.join(get_user_data_dir(), cls.DB_NAME)
+                cls._default = cls(db_path)
+            return cls._default
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, video_id):
+        """Ruta local del vídeo si ya se descargó y el archivo sigue ahí."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM archive WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if os.path.exists(row[0]):
+                return row[0]
+            self._conn.execute("DELETE FROM archive WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+        return None
+
+    def record(self, video_id, path, title=None):
+        """Registrar una descarga terminada."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archive (video_id, path, title) VALUES (?, ?, ?)",
+                (video_id, path, title),
+            )
+            self._conn.commit()
+
+    def rebuild(self, paths):
+        """
+        Reconstruir el archivo desde los archivos de la biblioteca (p. ej.
+        find_music_files). Devuelve cuántas entradas quedaron.
+        """
+        rows = []
+        for path in paths:
+            video_id = video_id_from_filename(path)
+            if video_id:
+                rows.append((video_id, path, None))
+        with self._lock:
+            self._conn.execute("DELETE FROM archive")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archive (video_id, path, title) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
@@ -0,0 +1,479 @@
+import os
+import queue
+import threading
+import itertools
+import time
+
+from utils.download_archive import OUTPUT_TEMPLATE, youtube_video_id
+from utils.instrumentation import get_logger, metrics
+
+log = get_logger('downloads')
+
+# Estados de cada elemento de la cola
+QUEUED = 'queued'
+DOWNLOADING = 'downloading'
+POSTPROCESSING = 'post-processing'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+STATE_LABELS = {
+    QUEUED: "En cola",
+    DOWNLOADING: "Descargando",
+    POSTPROCESSING: "Convirtiendo",
+    DONE: "Listo",
+    FAILED: "Error",
+    SKIPPED: "Ya descargado",
+}
+
+# Trabajos y mensajes entre la app y los procesos de descarga
+JOB_DOWNLOAD = 'download'
+JOB_EXPAND = 'expand'
+
+MSG_STARTED = 'started'
+MSG_PROGRESS = 'progress'
+MSG_POSTPROCESSING = 'post-processing'
+MSG_DONE = 'done'
+MSG_PLAYLIST = 'playlist'
+MSG_ERROR = 'error'
+
+# Formatos de descarga: códec -> selector de formato de yt-dlp. Salvo
+# 'mp3', se elige una fuente que ya esté en ese códec y FFmpeg solo
+# re-empaqueta el audio (sin decodificar/codificar).
+FORMAT_SELECTORS = {
+    'best': 'bestaudio/best',
+    'm4a': 'bestaudio[ext=m4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+    'mp3': 'bestaudio/best',
+}
+QUALITIES = ('128', '192', '320')
+
+# Avisos de progreso por descarga como mucho cada PROGRESS_INTERVAL segundos
+PROGRESS_INTERVAL = 0.1
+
+
+class _SilentLogger:
+    """Logger para yt-dlp: nada a stdout/stderr (sin tocar sys.stdout)."""
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        pass
+
+
+def is_youtube_url(url):
+    return "youtube.com" in url or "youtu.be" in url
+
+
+def is_playlist_url(url):
+    return "list=" in url or "/playlist" in url
+
+
+def describe_error(error):
+    """Mensaje legible para un error de yt-dlp/FFmpeg."""
+    error_msg = str(error)
+    if "ffmpeg" in error_msg.lower():
+        return "❌ FFmpeg no está instalado.\nDescárgalo de: https://ffmpeg.org/download.html"
+    return f"❌ Error: {error_msg}"
+
+
+# ------------------------------------------------------------------------------
+## PROCESO TRABAJADOR
+# ------------------------------------------------------------------------------
+
+def _base_options():
+    return {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'logger': _SilentLogger(),
+    }
+
+
+def _final_path(info):
+    """Ruta del archivo ya convertido según el info de yt-dlp."""
+    for download in info.get('requested_downloads') or ():
+        if download.get('filepath'):
+            return download['filepath']
+    return info.get('filepath')
+
+
+def format_options(codec, quality):
+    """Opciones de yt-dlp (formato y post-procesado) para un códec/calidad."""
+    if codec not in FORMAT_SELECTORS:
+        codec = 'best'
+    extract = {
+        'key': 'FFmpegExtractAudio',
+        # 'best' conserva el códec original (copia del stream de audio)
+        'preferredcodec': codec,
+    }
+    if codec == 'mp3':
+        extract['preferredquality'] = quality if quality in QUALITIES else '192'
+    return {
+        'format': FORMAT_SELECTORS[codec],
+        'postprocessors': [extract, {
+            # Título/artista en las etiquetas: el ID queda solo en el nombre
+            'key': 'FFmpegMetadata',
+            'add_metadata': True,
+        }],
+    }
+
+
+def _download(yt_dlp, item_id, url, output_folder, codec, quality, send):
+    last_progress = [0.0]
+
+    def on_progress(d):
+        status = d.get('status')
+        if status == 'downloading':
+            now = time.monotonic()
+            if now - last_progress[0] < PROGRESS_INTERVAL:
+                return
+            last_progress[0] = now
+            send(item_id, MSG_PROGRESS, (
+                d.get('downloaded_bytes') or 0,
+                d.get('total_bytes') or d.get('total_bytes_estimate'),
+                d.get('speed'),
+                d.get('eta'),
+            ))
+        elif status == 'finished':
+            size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            send(item_id, MSG_PROGRESS, (size, size or None, None, None))
+
+    started_postprocessing = [False]
+
+    def on_postprocess(d):
+        if d.get('status') == 'started' and not started_postprocessing[0]:
+            started_postprocessing[0] = True
+            send(item_id, MSG_POSTPROCESSING, None)
+
+    ydl_opts = _base_options()
+    ydl_opts.update(format_options(codec, quality))
+    ydl_opts.update({
+        'noplaylist': True,
+        'progress_hooks': [on_progress],
+        'postprocessor_hooks': [on_postprocess],
+        'outtmpl': os.path.join(output_folder, OUTPUT_TEMPLATE),
+    })
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True) or {}
+    send(item_id, MSG_DONE, (info.get('id'), info.get('title', 'Desconocido'), _final_path(info)))
+
+
+def _expand_playlist(yt_dlp, item_id, url, send):
+    ydl_opts = _base_options()
+    ydl_opts['extract_flat'] = 'in_playlist'
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False) or {}
+
+    urls = []
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if entry_url and not entry_url.startswith('http'):
+            entry_url = f"https://www.youtube.com/watch?v={entry_url}"
+        if entry_url:
+            urls.append(entry_url)
+    send(item_id, MSG_PLAYLIST, (info.get('title', url), urls))
+
+
+def _worker_main(jobs, events):
+    """
+    Bucle de un trabajador de descargas.
+
+    Se ejecuta en un proceso aparte (función de módulo para poder usarse
+    con multiprocessing): yt-dlp y FFmpeg no compiten por el GIL con la UI.
+    Recibe trabajos (id, tipo, url, carpeta, códec, calidad) por `jobs` y envía mensajes
+    (id, tipo, datos) por `events`. None termina el trabajador.
+    """
+    def send(item_id, kind, payload):
+        events.put((item_id, kind, payload))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        item_id, kind, url, output_folder, codec, quality = job
+        send(item_id, MSG_STARTED, None)
+        try:
+            import yt_dlp
+        except ImportError:
+            send(item_id, MSG_ERROR, ("❌ yt-dlp no está instalado.\nInstálalo con: pip install yt-dlp", False))
+            continue
+
+        try:
+            if kind == JOB_EXPAND:
+                _expand_playlist(yt_dlp, item_id, url, send)
+            else:
+                _download(yt_dlp, item_id, url, output_folder, codec, quality, send)
+        except Exception as e:
+            send(item_id, MSG_ERROR, (describe_error(e), kind == JOB_DOWNLOAD))
+
+
+def _use_processes():
+    """Procesos aparte salvo en Android (sin multiprocessing), que usa hilos."""
+    try:
+        from kivy.utils import platform
+    except ImportError:
+        return True
+    return platform != 'android'
+
+
+# ------------------------------------------------------------------------------
+## COLA
+# ------------------------------------------------------------------------------
+
+class DownloadItem:
+    """Un elemento de la cola de descargas con su propio estado."""
+    __slots__ = ('id', 'url', 'video_id', 'state', 'title', 'error', 'attempts', 'filepath',
+                 'downloaded_bytes', 'total_bytes', 'speed', 'eta', 'started_at')
+
+    def __init__(self, item_id, url):
+        self.id = item_id
+        self.url = url
+        self.video_id = None if is_playlist_url(url) else youtube_video_id(url)
+        self.state = QUEUED
+        self.title = ""
+        self.error = ""
+        self.attempts = 0
+        self.filepath = None
+        self.started_at = None
+        self.reset_progress()
+
+    def reset_progress(self):
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+
+    @property
+    def label(self):
+        return self.title or self.url
+
+    @property
+    def progress(self):
+        """Fracción descargada (0..1), o None si no se conoce el total."""
+        if not self.total_bytes:
+            return None
+        return min(self.downloaded_bytes / self.total_bytes, 1.0)
+
+
+class DownloadQueue:
+    """
+    Cola de descargas servida por un pool acotado de procesos trabajadores.
+
+    Cada URL (o cada vídeo de una playlist) es un DownloadItem con estado
+    propio. Los trabajadores reciben trabajos por una cola de mensajes y
+    responden por otra; un hilo de la app aplica esos mensajes a los
+    elementos. Los fallos se reintentan automáticamente hasta MAX_ATTEMPTS
+    y después pueden reintentarse a mano. `on_update(item)` se llama desde
+    ese hilo cada vez que un elemento cambia, también con cada aviso de
+    progreso: debe ser barato (marcar y salir).
+
+    Con un `archive` (DownloadArchive), los vídeos ya descargados o ya en
+    la cola se marcan SKIPPED al encolarlos, sin llegar a la red.
+    `format_getter()` devuelve (códec, calidad) al encolar cada elemento.
+    """
+
+    MAX_ATTEMPTS = 2
+
+    def __init__(self, output_folder_getter, on_update, workers=3, archive=None,
+                 format_getter=None):
+        self.output_folder_getter = output_folder_getter
+        self.format_getter = format_getter
+        self.on_update = on_update
+        self.archive = archive
+        self.items = []
+        self._by_id = {}
+        self._by_video = {}   # ID de vídeo -> elemento pendiente
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._processes = _use_processes()
+        if self._processes:
+            import multiprocessing
+            self._jobs = multiprocessing.Queue()
+            self._events = multiprocessing.Queue()
+        else:
+            self._jobs = queue.Queue()
+            self._events = queue.Queue()
+        self._workers = []
+        self.max_workers = 0
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop)
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+        self.set_workers(workers)
+
+    # --------------------------------------------------------------------------
+    ## API
+    # --------------------------------------------------------------------------
+
+    def set_workers(self, count):
+        """Ajustar el tamaño del pool de trabajadores."""
+        count = max(1, int(count))
+        with self._lock:
+            while self.max_workers < count:
+                self._workers.append(self._start_worker())
+                self.max_workers += 1
+            while self.max_workers > count:
+                # El primero que lo recoja termina al acabar su trabajo actual
+                self._jobs.put(None)
+                self.max_workers -= 1
+            self._workers = [w for w in self._workers if w.is_alive()]
+
+    def _start_worker(self):
+        if self._processes:
+            import multiprocessing
+            worker = multiprocessing.Process(target=_worker_main, args=(self._jobs, self._events))
+        else:
+            worker = threading.Thread(target=_worker_main, args=(self._jobs, self._events))
+        worker.daemon = True
+        worker.start()
+        return worker
+
+    def shutdown(self):
+        """Parar los trabajadores (las descargas en curso se abandonan)."""
+        with self._lock:
+            for worker in self._workers:
+                if self._processes and worker.is_alive():
+                    worker.terminate()
+            self._workers = []
+            self.max_workers = 0
+
+    def add(self, urls):
+        """Encolar una o varias URLs; devuelve los elementos creados."""
+        created = []
+        for url in urls:
+            item = DownloadItem(next(self._ids), url)
+            with self._lock:
+                self.items.append(item)
+                self._by_id[item.id] = item
+            created.append(item)
+            if not self._skip_known(item):
+                self._submit(item)
+        return created
+
+    def _skip_known(self, item):
+        """Marcar SKIPPED si el vídeo ya está en el archivo o en la cola."""
+        if item.video_id is None:
+            return False
+        with self._lock:
+            pending = self._by_video.get(item.video_id)
+            if pending is not None and pending.state not in (DONE, FAILED):
+                item.state = SKIPPED
+                item.title = f"Ya en la cola: {pending.label}"
+                return True
+            path = self.archive.lookup(item.video_id) if self.archive is not None else None
+            if path is not None:
+                item.state = SKIPPED
+                item.title = os.path.splitext(os.path.basename(path))[0]
+                item.filepath = path
+                return True
+            self._by_video[item.video_id] = item
+        return False
+
+    def retry(self, item):
+        """Volver a encolar un elemento fallido."""
+        if item.state != FAILED:
+            return
+        item.state = QUEUED
+        item.error = ""
+        item.attempts = 0
+        self._notify(item)
+        self._submit(item)
+
+    def clear_finished(self):
+        """Quitar de la lista los elementos terminados."""
+        with self._lock:
+            self.items = [i for i in self.items if i.state not in (DONE, SKIPPED)]
+            self._by_id = {i.id: i for i in self.items}
+            self._by_video = {i.video_id: i for i in self.items if i.video_id}
+
+    def counts(self):
+        """Número de elementos por estado."""
+        result = {state: 0 for state in STATE_LABELS}
+        for item in list(self.items):
+            result[item.state] += 1
+        return result
+
+    # --------------------------------------------------------------------------
+    ## MENSAJES DE LOS TRABAJADORES
+    # --------------------------------------------------------------------------
+
+    def _submit(self, item):
+        kind = JOB_EXPAND if is_playlist_url(item.url) else JOB_DOWNLOAD
+        codec, quality = self.format_getter() if self.format_getter else ('best', None)
+        self._jobs.put((item.id, kind, item.url, self.output_folder_getter(), codec, quality))
+
+    def _notify(self, item):
+        try:
+            self.on_update(item)
+        except Exception as e:
+            log.warning("Error notificando descarga: %s", e)
+
+    def _record_metrics(self, item):
+        """Duración y throughput del intento que terminó (incluye el post-proceso)."""
+        metrics.count('download.done')
+        if item.started_at is None:
+            return
+        elapsed = time.perf_counter() - item.started_at
+        metrics.record('download.duration', elapsed)
+        if item.downloaded_bytes:
+            metrics.count('download.bytes', item.downloaded_bytes)
+            if elapsed > 0:
+                metrics.record('download.bytes_per_second', item.downloaded_bytes / elapsed)
+        log.info("Descargado %s en %.1f s", item.label, elapsed)
+
+    def _dispatch_loop(self):
+        while True:
+            item_id, kind, payload = self._events.get()
+            item = self._by_id.get(item_id)
+            if item is None:
+                continue
+            self._apply(item, kind, payload)
+            self._notify(item)
+
+    def _apply(self, item, kind, payload):
+        """Actualizar un elemento con un mensaje de su trabajador."""
+        if kind == MSG_STARTED:
+            item.state = DOWNLOADING
+            item.attempts += 1
+            item.started_at = time.perf_counter()
+            item.reset_progress()
+        elif kind == MSG_PROGRESS:
+            item.downloaded_bytes, item.total_bytes, item.speed, item.eta = payload
+        elif kind == MSG_POSTPROCESSING:
+            item.state = POSTPROCESSING
+            item.speed = None
+            item.eta = None
+        elif kind == MSG_DONE:
+            video_id, item.title, item.filepath = payload
+            item.state = DONE
+            self._record_metrics(item)
+            video_id = item.video_id or video_id
+            if self.archive is not None and video_id and item.filepath:
+                self.archive.record(video_id, item.filepath, item.title)
+        elif kind == MSG_PLAYLIST:
+            title, urls = payload
+            item.title = f"Playlist: {title} ({len(urls)} vídeos)"
+            item.state = DONE
+            for child in self.add(urls):
+                self._notify(child)
+        elif kind == MSG_ERROR:
+            message, retryable = payload
+            if retryable and item.attempts < self.MAX_ATTEMPTS:
+                item.state = QUEUED
+                self._submit(item)
+            else:
+                item.state = FAILED
+                item.error = message
@@ -1,17 +1,52 @@
 import os
 
-def find_music_files(directory):
+from utils.instrumentation import get_logger
+from utils.library_index import LibraryIndex, VALID_EXTENSIONS, song_sort_key
+
+log = get_logger('library')
+
+
+def walk_music_files(directory):
     """
     Recursively scans a directory and returns a sorted list
-    of all .mp3 and .mp4 files.
+    of all supported audio files, without using the library index.
     """
-    valid_extensions = ('.mp3', '.mp4')
     songs = []
 
     for root, dirs, files in os.walk(directory):
         for file in files:
-            if file.lower().endswith(valid_extensions):
+            if file.lower().endswith(VALID_EXTENSIONS):
                 songs.append(os.path.join(root, file))
 
     # Sort alphabetically by filename
-    return sorted(songs, key=lambda x: os.path.basename(x).lower())
+    return sorted(songs, key=song_sort_key)
+
+
+def find_music_files(directory):
+    """
+    Returns a sorted list of all supported audio files under a directory
+    (see VALID_EXTENSIONS).
+
+    Uses the persistent library index, so only directories whose mtime
+    changed since the last scan are listed again.
+    """
+    try:
+        return LibraryIndex.get_default().scan(directory)
+    except Exception as e:
+        log.warning("Índice de biblioteca no disponible, escaneando la carpeta: %s", e)
+        return walk_music_files(directory)
+
+
+def cached_music_files(directory):
+    """
+    Returns the indexed song list for a directory without touching the disk,
+    or None if the directory has never been scanned.
+    """
+    try:
+        index = LibraryIndex.get_default()
+        if not index.is_indexed(directory):
+            return None
+        return index.list_tracks(directory)
+    except Exception as e:
+        log.warning("No se pudo leer el índice de biblioteca: %s", e)
+        return None
@@ -0,0 +1,329 @@
+import os
+import sqlite3
+import subprocess
+import threading
+
+from utils.app_paths import get_user_data_dir
+from utils.instrumentation import get_logger, metrics
+from utils.loudness import analysis_available, find_ffmpeg
+from utils.metadata import _create_executor, _stale_paths
+
+log = get_logger('duplicates')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL,
+    fp BLOB
+);
+"""
+
+# Ventana analizada: tras el silencio inicial, hasta WINDOW_SECONDS
+SAMPLE_RATE = 11025
+DECODE_SECONDS = 90
+WINDOW_SECONDS = 20.0
+MIN_SECONDS = 4.0
+SILENCE = 0.01          # Umbral del silencio inicial (-40 dBFS)
+
+# Espectrograma y rejilla de la huella: 17 tramos x 17 bandas -> 256 bits
+FRAME = 2048
+HOP = 512
+GRID = 17
+LOW_HZ = 300.0
+HIGH_HZ = 3000.0
+
+# Índice LSH: la huella se parte en 16 trozos de 16 bits; dos pistas son
+# candidatas si coinciden en algún trozo y se confirman por distancia
+FP_BITS = 256
+BAND_BITS = 16
+MAX_DISTANCE = 56       # Bits distintos como máximo (~22 %; sin relación: ~128)
+MAX_DURATION_DIFF = 3.0
+MAX_BUCKET = 256        # Cubetas más grandes (silencio, ruido) no aportan
+
+
+def _decode_window(path, ffmpeg):
+    """Audio mono a SAMPLE_RATE de los primeros DECODE_SECONDS, o None."""
+    import numpy as np
+    command = [
+        ffmpeg, '-v', 'error', '-nostdin', '-t', str(DECODE_SECONDS), '-i', path,
+        '-map', '0:a:0', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', '-'
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    data = result.stdout[:len(result.stdout) - len(result.stdout) % 4]
+    if not data:
+        return None
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def spectral_hash(samples):
+    """
+    Huella de 256 bits (32 bytes) de una señal mono a SAMPLE_RATE.
+
+    Energía logarítmica en una rejilla de 17 tramos de tiempo x 17 bandas
+    logarítmicas (300-3000 Hz); cada bit es el signo de la diferencia entre
+    bandas vecinas respecto al tramo anterior. Sobrevive a recodificar,
+    cambiar el bitrate o el volumen. None si hay menos de MIN_SECONDS.
+    """
+    import numpy as np
+
+    audible = np.flatnonzero(np.abs(samples) > SILENCE)
+    if not len(audible):
+        return None
+    samples = samples[audible[0]:audible[0] + int(WINDOW_SECONDS * SAMPLE_RATE)]
+    if len(samples) < MIN_SECONDS * SAMPLE_RATE:
+        return None
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME)[::HOP]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME), axis=-1)) ** 2
+
+    freqs = np.fft.rfftfreq(FRAME, d=1.0 / SAMPLE_RATE)
+    edges = np.geomspace(LOW_HZ, HIGH_HZ, GRID + 1)
+    band_of = np.searchsorted(edges, freqs, side='right') - 1
+    membership = band_of[:, None] == np.arange(GRID)
+    bands = spectrum @ membership
+
+    segments = np.array_split(bands, GRID, axis=0)
+    grid = np.log10(np.stack([s.mean(axis=0) for s in segments]) + 1e-10)
+
+    band_diff = grid[:, :-1] - grid[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return np.packbits(bits.ravel()).tobytes()
+
+
+def _duration(path):
+    try:
+        from mutagen import File as MutagenFile
+        audio = MutagenFile(path)
+        if audio is not None and audio.info is not None:
+            return getattr(audio.info, 'length', None)
+    except Exception:
+        pass
+    return None
+
+
+def fingerprint_file(path, ffmpeg=None):
+    """
+    Huella acústica de un archivo (ffmpeg + NumPy).
+
+    Se ejecuta en los procesos del pool, por eso es una función de módulo.
+    Devuelve (ruta, mtime_ns, tamaño, duración, huella) o None si el
+    archivo ya no existe o no hay ffmpeg. La huella es None si la pista es
+    demasiado corta o silenciosa, o si no se pudo decodificar (duración
+    None): el fallo queda en caché hasta que el archivo cambie.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if ffmpeg is None:
+        return None
+    samples = _decode_window(path, ffmpeg)
+    if samples is None:
+        return (path, st.st_mtime_ns, st.st_size, None, None)
+    return (path, st.st_mtime_ns, st.st_size, _duration(path), spectral_hash(samples))
+
+
+def _fingerprint_chunk(paths):
+    ffmpeg = find_ffmpeg()
+    return [fingerprint_file(path, ffmpeg) for path in paths]
+
+
+# Bits a 1 de cada byte (distancia de Hamming vectorizada)
+_POPCOUNT = bytes(bin(i).count('1') for i in range(256))
+
+
+def _candidate_pairs(np, keys, max_bucket):
+    """
+    Pares (i, j), i < j, con la misma clave en `keys`. Se ordena una vez y
+    se emparejan vecinos a distancia 1, 2, ... dentro de cada tramo igual;
+    los tramos de más de `max_bucket` elementos se ignoran.
+    """
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    lengths = np.diff(np.r_[starts, len(keys)])
+    run_length = np.repeat(lengths, lengths)
+    usable = (run_length > 1) & (run_length <= max_bucket)
+
+    pairs = []
+    longest = int(run_length[usable].max()) if usable.any() else 0
+    for distance in range(1, longest):
+        same = usable[:-distance] & (ordered[:-distance] == ordered[distance:])
+        if not same.any():
+            break
+        i = order[:-distance][same]
+        j = order[distance:][same]
+        pairs.append(np.stack((np.minimum(i, j), np.maximum(i, j)), axis=1))
+    return pairs
+
+
+def group_duplicates(entries, max_distance=MAX_DISTANCE):
+    """
+    Agrupar pistas casi idénticas sin comparar todas con todas.
+
+    `entries`: (ruta, tamaño, duración, huella en bytes). La huella se
+    parte en FP_BITS / BAND_BITS trozos y solo se comparan las pistas que
+    coinciden en algún trozo (LSH), con NumPy: el coste es casi lineal.
+    Devuelve grupos de 2 o más entradas, del archivo más grande (mejor
+    calidad) al más pequeño.
+    """
+    import numpy as np
+
+    count = len(entries)
+    if count < 2:
+        return []
+    fps = np.frombuffer(b''.join(entry[3] for entry in entries), dtype=np.uint8)
+    fps = fps.reshape(count, FP_BITS // 8)
+    bands = fps.view(f'>u{BAND_BITS // 8}')
+
+    pairs = []
+    for band in range(bands.shape[1]):
+        pairs.extend(_candidate_pairs(np, bands[:, band], MAX_BUCKET))
+    if not pairs:
+        return []
+    pairs = np.unique(np.concatenate(pairs), axis=0)
+    metrics.record('duplicates.comparisons', len(pairs))
+
+    # Duración parecida (si se conoce) y pocos bits distintos
+    durations = np.array([entry[2] or np.nan for entry in entries], dtype=float)
+    diff = np.abs(durations[pairs[:, 0]] - durations[pairs[:, 1]])
+    pairs = pairs[~(diff > MAX_DURATION_DIFF)]
+    popcount = np.frombuffer(_POPCOUNT, dtype=np.uint8)
+    confirmed = []
+    for start in range(0, len(pairs), 100_000):
+        chunk = pairs[start:start + 100_000]
+        distance = popcount[fps[chunk[:, 0]] ^ fps[chunk[:, 1]]].sum(axis=1, dtype=np.int32)
+        confirmed.append(chunk[distance <= max_distance])
+    confirmed = np.concatenate(confirmed) if confirmed else np.zeros((0, 2), dtype=int)
+
+    # Unión-búsqueda sobre los pares confirmados
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in confirmed.tolist():
+        parent[find(a)] = find(b)
+
+    groups = {}
+    for index in set(confirmed.ravel().tolist()):
+        groups.setdefault(find(index), []).append(entries[index])
+    result = [
+        sorted(group, key=lambda e: (-e[1], len(e[0]), e[0]))
+        for group in groups.values()
+    ]
+    result.sort(key=lambda group: group[0][0])
+    return result
+
+
+class FingerprintIndex:
+    """
+    Caché persistente (SQLite) de huellas acústicas por ruta + mtime +
+    tamaño: al repetir la búsqueda solo se procesan las pistas nuevas o
+    modificadas.
+    """
+
+    DB_NAME = "fingerprints.db"
+    CHUNK_SIZE = 8
+    WORKERS = 2
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def get_default(cls):
+        """Índice compartido, guardado en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                db_path = os.path.join(get_user_data_dir(), cls.DB_NAME)
+                cls._default = cls(db_path)
+            return cls._default
+
+    def available(self):
+        """Las huellas necesitan ffmpeg y NumPy."""
+        return analysis_available()
+
+    def _records(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size, duration, fp FROM fingerprints"
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def _store(self, results):
+        rows = [r for r in results if r is not None]
+        if rows:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (path, mtime_ns, size, duration, fp) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+        return rows
+
+    def forget(self, paths):
+        """Quitar del índice archivos borrados."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM fingerprints WHERE path = ?", [(p,) for p in paths]
+            )
+            self._conn.commit()
+
+    def find_duplicates(self, paths, on_progress=None, cancelled=None):
+        """
+        Calcular las huellas que falten y agrupar los duplicados de `paths`.
+        Bloquea: llamar desde un hilo. `on_progress(hechas, total)` se llama
+        tras cada lote. Devuelve la lista de grupos o None si se canceló.
+        """
+        records = self._records()
+        known = {p: records[p][:2] for p in paths if p in records}
+        stale = _stale_paths(paths, known)
+        log.info("Huellas: %d en caché, %d por calcular", len(paths) - len(stale), len(stale))
+
+        if stale:
+            executor = _create_executor(self.WORKERS)
+            try:
+                chunks = [
+                    stale[i:i + self.CHUNK_SIZE]
+                    for i in range(0, len(stale), self.CHUNK_SIZE)
+                ]
+                done = 0
+                batch = self.WORKERS * 2
+                for start in range(0, len(chunks), batch):
+                    if cancelled is not None and cancelled.is_set():
+                        return None
+                    for results in executor.map(_fingerprint_chunk, chunks[start:start + batch]):
+                        for path, *record in self._store(results):
+                            records[path] = tuple(record)
+                        done += len(results)
+                        metrics.count('duplicates.fingerprinted', len(results))
+                    if on_progress is not None:
+                        on_progress(done, len(stale))
+            finally:
+                executor.shutdown(wait=False)
+
+        entries = []
+        for path in paths:
+            record = records.get(path)
+            if record is not None and record[3]:
+                _mtime_ns, size, duration, fp = record
+                entries.append((path, size, duration, fp))
+        with metrics.timer('duplicates.grouping'):
+            return group_duplicates(entries)
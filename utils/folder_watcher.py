@@ -0,0 +1,231 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+from kivy.clock import Clock
+
+from utils.instrumentation import get_logger
+from utils.library_index import LibraryIndex, is_music_file
+
+log = get_logger('watcher')
+
+# Constantes de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    """Cargar libc con inotify_* (Linux y Android); None si no existe."""
+    for name in (ctypes.util.find_library("c"), "libc.so.6", "libc.so"):
+        if not name:
+            continue
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            libc.inotify_init1
+            return libc
+        except (OSError, AttributeError):
+            continue
+    return None
+
+
+class FolderWatcher:
+    """
+    Vigila la carpeta de música y notifica altas/bajas de canciones.
+
+    Usa inotify en Linux/Android y, si no está disponible, sondea el índice
+    de la biblioteca (barato: un stat por carpeta). Los eventos se agrupan
+    y se entregan en el hilo principal con un retardo de DEBOUNCE segundos
+    desde el último cambio.
+    """
+
+    DEBOUNCE = 0.5        # Segundos de calma antes de entregar un lote
+    POLL_INTERVAL = 5.0   # Segundos entre sondeos en el modo sin inotify
+
+    def __init__(self, on_changes, on_overflow=None):
+        # on_changes(añadidas, eliminadas) en el hilo principal. `eliminadas`
+        # puede contener carpetas: todo lo que cuelga de ellas desaparece.
+        # on_overflow() se llama si inotify perdió eventos.
+        self.on_changes = on_changes
+        self.on_overflow = on_overflow
+        self.folder = None
+        self._stop_event = None
+        self._thread = None
+        self._added = set()
+        self._removed = set()
+        self._last_event = 0.0
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, folder):
+        """Vigilar `folder`, reemplazando la vigilancia anterior."""
+        folder = os.path.normpath(folder)
+        if self.is_running and folder == self.folder:
+            return
+        self.stop()
+
+        self.folder = folder
+        self._stop_event = threading.Event()
+        libc = _load_libc()
+        target = self._inotify_thread if libc is not None else self._poll_thread
+        self._thread = threading.Thread(target=target, args=(folder, self._stop_event, libc))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        self._thread = None
+        self._stop_event = None
+
+    # --------------------------------------------------------------------------
+    ## AGRUPACIÓN DE EVENTOS
+    # --------------------------------------------------------------------------
+
+    def _file_added(self, path):
+        self._removed.discard(path)
+        self._added.add(path)
+        self._last_event = time.monotonic()
+
+    def _path_removed(self, path):
+        self._added.discard(path)
+        self._removed.add(path)
+        self._last_event = time.monotonic()
+
+    def _flush_if_quiet(self, stop_event):
+        """Entregar los cambios acumulados si pasó el tiempo de debounce."""
+        if not (self._added or self._removed):
+            return
+        if time.monotonic() - self._last_event < self.DEBOUNCE:
+            return
+
+        added, removed = sorted(self._added), self._removed
+        self._added, self._removed = set(), set()
+
+        def deliver(dt):
+            if not stop_event.is_set():
+                self.on_changes(added, removed)
+        Clock.schedule_once(deliver, 0)
+
+    # --------------------------------------------------------------------------
+    ## INOTIFY
+    # --------------------------------------------------------------------------
+
+    def _inotify_thread(self, folder, stop_event, libc):
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            log.warning("inotify no disponible (errno %d), usando sondeo", ctypes.get_errno())
+            self._poll_thread(folder, stop_event, libc)
+            return
+
+        watches = {}
+
+        def add_watch(directory):
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = directory
+
+        def add_tree(directory, report_files):
+            """Vigilar un árbol nuevo y, si se pide, reportar sus canciones."""
+            for root, dirs, files in os.walk(directory):
+                add_watch(root)
+                if report_files:
+                    for name in files:
+                        if is_music_file(name):
+                            self._file_added(os.path.join(root, name))
+
+        try:
+            add_tree(folder, report_files=False)
+
+            while not stop_event.is_set():
+                timeout = self.DEBOUNCE if (self._added or self._removed) else 1.0
+                ready, _, _ = select.select([fd], [], [], timeout)
+                if ready:
+                    try:
+                        data = os.read(fd, 64 * 1024)
+                    except BlockingIOError:
+                        data = b""
+                    self._handle_events(data, watches, add_tree)
+                self._flush_if_quiet(stop_event)
+        finally:
+            os.close(fd)
+
+    def _handle_events(self, data, watches, add_tree):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Se perdieron eventos: pedir un re-escaneo completo
+                if self.on_overflow is not None:
+                    Clock.schedule_once(lambda dt: self.on_overflow(), 0)
+                continue
+
+            if mask & IN_IGNORED:
+                watches.pop(wd, None)
+                continue
+
+            directory = watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    add_tree(path, report_files=True)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._path_removed(path)
+            elif is_music_file(path):
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    self._file_added(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._path_removed(path)
+
+    # --------------------------------------------------------------------------
+    ## SONDEO (FALLBACK)
+    # --------------------------------------------------------------------------
+
+    def _poll_thread(self, folder, stop_event, libc=None):
+        index = LibraryIndex.get_default()
+        known = None
+
+        while not stop_event.is_set():
+            try:
+                current = set(index.scan(folder))
+            except Exception as e:
+                log.warning("Error sondeando %s: %s", folder, e)
+                current = known
+
+            if known is not None and current is not None:
+                for path in current - known:
+                    self._file_added(path)
+                for path in known - current:
+                    self._path_removed(path)
+                self._last_event = 0.0
+                self._flush_if_quiet(stop_event)
+            known = current
+
+            stop_event.wait(self.POLL_INTERVAL)
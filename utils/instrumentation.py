@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.app_paths import get_user_data_dir
+
+# Todos los loggers de la app cuelgan de "musicapp" (Kivy los muestra y
+# guarda junto a los suyos a través del logger raíz)
+logger = logging.getLogger('musicapp')
+logger.setLevel(logging.INFO)
+
+# Perfilado opcional: MUSICAPP_PROFILE=1 al arrancar
+PROFILE_ENV = 'MUSICAPP_PROFILE'
+
+
+def get_logger(name):
+    """Logger de un área de la app: get_logger('scan') -> 'musicapp.scan'."""
+    return logger.getChild(name)
+
+
+class _Stat:
+    __slots__ = ('count', 'total', 'min', 'max', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'last': self.last,
+        }
+
+
+class Metrics:
+    """
+    Contadores y tiempos en memoria, baratos para dejarlos activos: cada
+    registro es una suma en un diccionario. `snapshot()` devuelve todo y
+    `log_summary()` lo vuelca al log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record(self, name, value):
+        """Registrar una medida (segundos, bytes/s...)."""
+        with self._lock:
+            stat = self._timings.get(name)
+            if stat is None:
+                self._timings[name] = stat = _Stat()
+            stat.add(value)
+
+    @contextmanager
+    def timer(self, name):
+        """with metrics.timer('list.sync'): ... registra la duración en segundos."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def ratio(self, hits, misses):
+        """Proporción hits / (hits + misses), o None sin datos."""
+        with self._lock:
+            h = self._counters.get(hits, 0)
+            m = self._counters.get(misses, 0)
+        return h / (h + m) if h + m else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'timings': {name: stat.as_dict() for name, stat in self._timings.items()},
+            }
+
+    def log_summary(self):
+        snapshot = self.snapshot()
+        for name, value in sorted(snapshot['counters'].items()):
+            logger.info("contador %s = %s", name, value)
+        for name, stat in sorted(snapshot['timings'].items()):
+            logger.info("medida %s: n=%d media=%.4f mín=%.4f máx=%.4f",
+                        name, stat['count'], stat['mean'], stat['min'], stat['max'])
+        hit_rate = self.ratio('metadata.hit', 'metadata.miss')
+        if hit_rate is not None:
+            logger.info("caché de metadatos: %.1f %% de aciertos", hit_rate * 100)
+
+
+metrics = Metrics()
+
+
+# ------------------------------------------------------------------------------
+## PERFILADO BAJO DEMANDA
+# ------------------------------------------------------------------------------
+
+class Profiler:
+    """
+    cProfile + tracemalloc, solo si se activa (MUSICAPP_PROFILE=1 o
+    Profiler.start()). `dump()` guarda un .prof y el top de memoria en la
+    carpeta de datos; en Unix también se puede pedir con SIGUSR1.
+    """
+
+    _profile = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def enabled(cls):
+        return cls._profile is not None
+
+    @classmethod
+    def start(cls):
+        import cProfile
+        import tracemalloc
+        with cls._lock:
+            if cls._profile is not None:
+                return
+            cls._profile = cProfile.Profile()
+            cls._profile.enable()
+            tracemalloc.start(10)
+        cls._install_signal()
+        logger.info("Perfilado activado (cProfile + tracemalloc)")
+
+    @classmethod
+    def start_from_env(cls):
+        if os.environ.get(PROFILE_ENV, '') not in ('', '0'):
+            cls.start()
+
+    @classmethod
+    def _install_signal(cls):
+        try:
+            import signal
+            # El manejador corre en el hilo principal, quizá dentro de un
+            # dump(): no esperar al lock (se bloquearía a sí mismo)
+            signal.signal(signal.SIGUSR1, lambda signum, frame: cls.dump(blocking=False))
+        except (AttributeError, ValueError):
+            # Windows (sin SIGUSR1) o fuera del hilo principal
+            pass
+
+    @classmethod
+    def dump(cls, folder=None, top=25, blocking=True):
+        """
+        Guardar estadísticas de CPU y memoria; devuelve las rutas o None.
+        Con blocking=False no hace nada si ya hay un dump en curso.
+        """
+        import pstats
+        import tracemalloc
+        if not cls._lock.acquire(blocking=blocking):
+            logger.info("Ya se está guardando un perfil")
+            return None
+        try:
+            if cls._profile is None:
+                return None
+            folder = folder or get_user_data_dir()
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            prof_path = os.path.join(folder, f"profile-{stamp}.prof")
+            mem_path = os.path.join(folder, f"memory-{stamp}.txt")
+
+            cls._profile.disable()
+            try:
+                pstats.Stats(cls._profile).dump_stats(prof_path)
+            finally:
+                cls._profile.enable()
+
+            snapshot = tracemalloc.take_snapshot()
+            with open(mem_path, 'w', encoding='utf-8') as f:
+                current, peak = tracemalloc.get_traced_memory()
+                f.write(f"actual: {current / 1e6:.1f} MB · pico: {peak / 1e6:.1f} MB\n\n")
+                for stat in snapshot.statistics('lineno')[:top]:
+                    f.write(f"{stat}\n")
+        finally:
+            cls._lock.release()
+
+        logger.info("Perfil guardado en %s y %s", prof_path, mem_path)
+        return prof_path, mem_path
@@ -0,0 +1,39 @@
+import importlib
+import time
+
+from kivy.uix.screenmanager import ScreenManager
+
+from utils.instrumentation import get_logger, metrics
+
+log = get_logger('screens')
+
+
+class LazyScreenManager(ScreenManager):
+    """
+    ScreenManager que crea las pantallas la primera vez que se navega a
+    ellas (o que alguien pide get_screen). Así el módulo de cada pantalla
+    (ffpyplayer, yt-dlp, plyer...) no se importa al arrancar.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lazy = {}
+
+    def register_lazy(self, name, module, class_name):
+        """Registrar una pantalla que se importará y creará al usarla."""
+        self._lazy[name] = (module, class_name)
+
+    def is_loaded(self, name):
+        """True si la pantalla ya se creó."""
+        return name in self.screen_names
+
+    def get_screen(self, name):
+        if name in self._lazy and name not in self.screen_names:
+            module, class_name = self._lazy.pop(name)
+            start = time.perf_counter()
+            screen_class = getattr(importlib.import_module(module), class_name)
+            self.add_widget(screen_class(name=name))
+            elapsed = time.perf_counter() - start
+            metrics.record(f'screen.load.{name}', elapsed)
+            log.info("Pantalla '%s' cargada en %.0f ms", name, elapsed * 1000)
+        return super().get_screen(name)
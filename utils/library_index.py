@@ -0,0 +1,354 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.app_paths import get_user_data_dir
+
+# Contenedores que el reproductor (ffpyplayer) abre directamente; m4a/opus/
+# webm son los que deja yt-dlp cuando se descarga sin recodificar
+VALID_EXTENSIONS = ('.mp3', '.mp4', '.m4a', '.opus', '.webm')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_dir ON tracks(dir);
+CREATE INDEX IF NOT EXISTS tracks_name_key ON tracks(name_key);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def song_sort_key(path):
+    """Clave de orden de la lista: nombre de archivo en minúsculas."""
+    return os.path.basename(path).lower()
+
+
+def is_music_file(name):
+    return name.lower().endswith(VALID_EXTENSIONS)
+
+
+class LibraryIndex:
+    """
+    Índice persistente (SQLite) de la biblioteca de música.
+
+    Guarda cada carpeta con su mtime y cada pista con mtime/tamaño/inodo.
+    Al re-escanear solo se listan las carpetas cuyo mtime cambió; el resto
+    se recorre con un único stat por carpeta.
+    """
+
+    DB_NAME = "library_index.db"
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._check_extensions()
+
+    def _check_extensions(self):
+        """
+        Si cambió la lista de extensiones admitidas, marcar todas las
+        carpetas como modificadas para que el próximo escaneo las liste.
+        """
+        extensions = ','.join(VALID_EXTENSIONS)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'extensions'"
+            ).fetchone()
+            if row is not None and row[0] == extensions:
+                return
+            self._conn.execute("UPDATE dirs SET mtime_ns = -1")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('extensions', ?)",
+                (extensions,),
+            )
+            self._conn.commit()
+
+    @classmethod
+    def get_default(cls):
+        """Índice compartido, guardado en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                db_path = os.path.join(get_user_data_dir(), cls.DB_NAME)
+                cls._default = cls(db_path)
+            return cls._default
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --------------------------------------------------------------------------
+    ## CONSULTAS
+    # --------------------------------------------------------------------------
+
+    @staticmethod
+    def _subtree_clause(column, root):
+        """WHERE que selecciona `root` y todo lo que cuelga de él."""
+        prefix = root.rstrip(os.sep) + os.sep
+        return (f"({column} = ? OR substr({column}, 1, ?) = ?)",
+                (root, len(prefix), prefix))
+
+    def is_indexed(self, root):
+        """True si la carpeta ya se escaneó alguna vez."""
+        root = os.path.normpath(root)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM dirs WHERE path = ?", (root,)
+            ).fetchone()
+        return row is not None
+
+    def list_tracks(self, root):
+        """Pistas indexadas bajo `root`, ordenadas igual que find_music_files."""
+        root = os.path.normpath(root)
+        clause, params = self._subtree_clause("dir", root)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT path FROM tracks WHERE {clause} ORDER BY name_key, path",
+                params,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def paths_by_name(self, names, chunk=500):
+        """
+        {nombre en minúsculas: [rutas]} de las pistas indexadas con esos
+        nombres de archivo; consulta el índice, sin tocar el disco.
+        """
+        keys = list({name.lower() for name in names})
+        found = {}
+        for start in range(0, len(keys), chunk):
+            part = keys[start:start + chunk]
+            marks = ','.join('?' * len(part))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT name_key, path FROM tracks WHERE name_key IN ({marks})", part
+                ).fetchall()
+            for name_key, path in rows:
+                found.setdefault(name_key, []).append(path)
+        return found
+
+    def _tracks_in_dir(self, directory):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM tracks WHERE dir = ?", (directory,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _load_dirs(self, root):
+        """
+        Devuelve {carpeta: mtime_ns} y {carpeta: [subcarpetas]} bajo `root`.
+        Las subcarpetas salen de las rutas de la tabla dirs, no de la
+        columna parent (escanear una subcarpeta suelta la deja en NULL).
+        """
+        clause, params = self._subtree_clause("path", root)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT path, mtime_ns FROM dirs WHERE {clause}", params
+            ).fetchall()
+
+        mtimes = {}
+        children = {}
+        for path, mtime_ns in rows:
+            mtimes[path] = mtime_ns
+            if path != root:
+                children.setdefault(os.path.dirname(path), []).append(path)
+        return mtimes, children
+
+    def _root_parent(self, root):
+        """Carpeta padre de `root` si está indexada (escaneo de una subcarpeta)."""
+        parent = os.path.dirname(root)
+        if parent == root:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM dirs WHERE path = ?", (parent,)
+            ).fetchone()
+        return parent if row is not None else None
+
+    # --------------------------------------------------------------------------
+    ## ALTAS Y BAJAS PUNTUALES
+    # --------------------------------------------------------------------------
+
+    def add_files(self, paths):
+        """
+        Registrar archivos nuevos sin re-listar su carpeta (p. ej. tras una
+        descarga). El mtime de la carpeta no se toca: el próximo escaneo la
+        sigue verificando.
+        """
+        rows = []
+        for path in paths:
+            path = os.path.normpath(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            rows.append((path, os.path.dirname(path), song_sort_key(path),
+                         st.st_mtime_ns, st.st_size, st.st_ino))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tracks (path, dir, name_key, mtime_ns, size, inode) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def remove_files(self, paths):
+        """Olvidar archivos concretos."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM tracks WHERE path = ?",
+                [(os.path.normpath(path),) for path in paths],
+            )
+            self._conn.commit()
+
+    # --------------------------------------------------------------------------
+    ## ESCANEO INCREMENTAL
+    # --------------------------------------------------------------------------
+
+    @staticmethod
+    def _list_dir(directory):
+        """Lista una carpeta: (subcarpetas, [(ruta, mtime_ns, tamaño, inodo)])."""
+        subdirs = []
+        files = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif is_music_file(entry.name) and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.path, st.st_mtime_ns, st.st_size, entry.inode()))
+                except OSError:
+                    continue
+        return subdirs, files
+
+    def _store_dir(self, directory, parent, mtime_ns, subdirs, files):
+        """Reemplaza en el índice el contenido directo de una carpeta."""
+        conn = self._conn
+        conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+            (directory, parent, mtime_ns),
+        )
+        # Subcarpetas ya indexadas por separado pasan a colgar de esta
+        conn.executemany(
+            "UPDATE dirs SET parent = ? WHERE path = ?",
+            [(directory, child) for child in subdirs],
+        )
+        conn.execute("DELETE FROM tracks WHERE dir = ?", (directory,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO tracks (path, dir, name_key, mtime_ns, size, inode) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (path, directory, song_sort_key(path), mtime_ns_, size, inode)
+                for path, mtime_ns_, size, inode in files
+            ],
+        )
+
+    def _forget_dirs(self, directories):
+        """Elimina carpetas (y sus pistas) que ya no existen."""
+        conn = self._conn
+        for directory in directories:
+            conn.execute("DELETE FROM dirs WHERE path = ?", (directory,))
+            conn.execute("DELETE FROM tracks WHERE dir = ?", (directory,))
+
+    def _visit(self, directory, known_mtime):
+        """
+        Trabajo por carpeta, seguro para ejecutarse en hilos: un stat y,
+        solo si el mtime cambió, el listado completo.
+        """
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        if known_mtime == mtime_ns:
+            return mtime_ns, None, None
+        try:
+            subdirs, files = self._list_dir(directory)
+        except OSError:
+            return None
+        return mtime_ns, subdirs, files
+
+    def scan(self, root, on_batch=None, cancelled=None, workers=1):
+        """
+        Sincroniza el índice con el disco y devuelve la lista ordenada
+        de pistas bajo `root`.
+
+        Recorre el árbol por niveles; con `workers` > 1 el trabajo de cada
+        carpeta se reparte en un pool de hilos. `on_batch(rutas, carpetas)`
+        recibe las pistas de cada nivel según se van encontrando. Si el
+        evento `cancelled` se activa, el escaneo se detiene y devuelve None.
+        """
+        root = os.path.normpath(root)
+        known_mtimes, known_children = self._load_dirs(root)
+        seen = set()
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        try:
+            # No cortar el enlace con la carpeta padre si ya está indexada
+            level = [(root, self._root_parent(root))]
+            while level:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+
+                directories = [directory for directory, _ in level]
+                mtimes = [known_mtimes.get(directory) for directory in directories]
+                if executor is not None:
+                    results = list(executor.map(self._visit, directories, mtimes))
+                else:
+                    results = list(map(self._visit, directories, mtimes))
+
+                next_level = []
+                found = []
+                with self._lock:
+                    for (directory, parent), result in zip(level, results):
+                        if result is None:
+                            continue
+                        seen.add(directory)
+                        mtime_ns, subdirs, files = result
+
+                        if subdirs is None:
+                            # Sin cambios: reutilizar lo que ya está indexado
+                            children = known_children.get(directory, ())
+                            if on_batch is not None:
+                                found.extend(self._tracks_in_dir(directory))
+                        else:
+                            self._store_dir(directory, parent, mtime_ns, subdirs, files)
+                            children = subdirs
+                            found.extend(path for path, _, _, _ in files)
+
+                        next_level.extend((child, directory) for child in children)
+                    self._conn.commit()
+
+                if on_batch is not None and found:
+                    on_batch(found, len(seen))
+                level = next_level
+
+            with self._lock:
+                self._forget_dirs(set(known_mtimes) - seen)
+                self._conn.commit()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+        return self.list_tracks(root)
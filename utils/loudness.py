@@ -0,0 +1,374 @@
+import importlib.util
+import math
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+
+from utils.app_paths import get_user_data_dir
+from utils.instrumentation import get_logger, metrics
+from utils.metadata import _create_executor, _stale_paths
+
+log = get_logger('loudness')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS loudness (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    loudness REAL,
+    peak REAL
+);
+"""
+
+# Nivel de referencia de ReplayGain 2.0 (LUFS)
+TARGET_LUFS = -18.0
+
+# Decodificación con ffmpeg (el mismo que usa yt-dlp) a float32 intercalado
+SAMPLE_RATE = 48000
+BLOCK_SECONDS = 0.4     # Bloques de BS.1770 (400 ms, solapados un 75 %)
+HOP_SECONDS = 0.1
+CHUNK_SECONDS = 5.0     # Audio procesado de una vez (memoria acotada)
+
+# Filtro K de BS.1770 a 48 kHz: estante de agudos + paso alto
+_K_SHELF = ((1.53512485958697, -2.69169618940638, 1.19839281085285),
+            (1.0, -1.69065929318241, 0.73248077421585))
+_K_HIGHPASS = ((1.0, -2.0, 1.0),
+               (1.0, -1.99004745483398, 0.99007225036621))
+
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+
+def find_ffmpeg():
+    """Ruta del ejecutable de ffmpeg o None (p. ej. en Android)."""
+    return shutil.which('ffmpeg')
+
+
+def analysis_available():
+    """El análisis necesita ffmpeg para decodificar y NumPy para medir."""
+    return find_ffmpeg() is not None and importlib.util.find_spec('numpy') is not None
+
+
+def _k_weights(np, block):
+    """
+    |H(f)|² del filtro K en las frecuencias de rfft(block), con el factor
+    de Parseval incluido: sum(pesos * |X|²) = media cuadrática filtrada.
+    """
+    freqs = np.fft.rfftfreq(block, d=1.0 / SAMPLE_RATE)
+    z = np.exp(-2j * np.pi * freqs / SAMPLE_RATE)
+    response = np.ones_like(freqs)
+    for b, a in (_K_SHELF, _K_HIGHPASS):
+        num = b[0] + b[1] * z + b[2] * z ** 2
+        den = a[0] + a[1] * z + a[2] * z ** 2
+        response = response * np.abs(num / den) ** 2
+
+    # Los bins intermedios de rfft representan dos frecuencias (±f)
+    parseval = np.full(freqs.shape, 2.0)
+    parseval[0] = 1.0
+    if block % 2 == 0:
+        parseval[-1] = 1.0
+    return response * parseval / float(block) ** 2
+
+
+def _block_powers(np, samples, weights, block, hop):
+    """Potencia K-ponderada de cada bloque, sumada entre canales."""
+    windows = np.lib.stride_tricks.sliding_window_view(samples, block, axis=0)[::hop]
+    spectrum = np.fft.rfft(windows, axis=-1)
+    power = (spectrum.real ** 2 + spectrum.imag ** 2) @ weights
+    return power.sum(axis=1)
+
+
+def _gated_loudness(np, powers):
+    """Loudness integrada (LUFS) con las puertas absoluta y relativa de BS.1770."""
+    if not len(powers):
+        return None
+    with np.errstate(divide='ignore'):
+        levels = -0.691 + 10 * np.log10(powers)
+    powers = powers[levels > ABSOLUTE_GATE]
+    if not len(powers):
+        return None
+    relative = -0.691 + 10 * np.log10(powers.mean()) + RELATIVE_GATE
+    with np.errstate(divide='ignore'):
+        levels = -0.691 + 10 * np.log10(powers)
+    gated = powers[levels > relative]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def _tag_loudness(path):
+    """Loudness a partir de etiquetas ReplayGain ya presentes, o None."""
+    try:
+        from mutagen import File as MutagenFile
+        audio = MutagenFile(path, easy=True)
+    except Exception:
+        return None, None, None
+    if audio is None:
+        return None, None, None
+
+    channels = getattr(audio.info, 'channels', None)
+    tags = audio.tags or {}
+    try:
+        gain = tags.get('replaygain_track_gain')
+        if not gain:
+            return None, None, channels
+        gain_db = float(str(gain[0]).lower().replace('db', '').strip())
+        peak = tags.get('replaygain_track_peak')
+        peak = float(str(peak[0]).strip()) if peak else None
+    except (ValueError, TypeError, KeyError):
+        return None, None, channels
+    return TARGET_LUFS - gain_db, peak, channels
+
+
+def analyze_loudness(path, ffmpeg=None):
+    """
+    Mide la loudness integrada (BS.1770, LUFS) y el pico de muestra.
+
+    Se ejecuta en los procesos del pool, por eso es una función de módulo.
+    Si el archivo ya trae ReplayGain se usa la etiqueta; si no, ffmpeg lo
+    decodifica por trozos y NumPy calcula la potencia K-ponderada de cada
+    bloque en el dominio de la frecuencia.
+    Devuelve (ruta, mtime_ns, tamaño, loudness, pico) o None si el archivo
+    ya no existe o no se puede analizar (sin NumPy o sin ffmpeg). Si ffmpeg
+    no lo decodifica, loudness y pico son None: el fallo queda en caché y
+    no se reintenta hasta que el archivo cambie.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    loudness, peak, channels = _tag_loudness(path)
+    if loudness is not None:
+        return (path, st.st_mtime_ns, st.st_size, loudness, peak)
+
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if ffmpeg is None:
+        return None
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    # Mono se mide como un solo canal (BS.1770); el resto, como estéreo
+    channels = 1 if channels == 1 else 2
+    command = [
+        ffmpeg, '-v', 'error', '-nostdin', '-i', path, '-map', '0:a:0',
+        '-ac', str(channels), '-ar', str(SAMPLE_RATE), '-f', 'f32le', '-'
+    ]
+    block = int(SAMPLE_RATE * BLOCK_SECONDS)
+    hop = int(SAMPLE_RATE * HOP_SECONDS)
+    weights = _k_weights(np, block)
+    chunk_bytes = int(SAMPLE_RATE * CHUNK_SECONDS) * channels * 4
+
+    powers = []
+    peak = 0.0
+    tail = np.zeros((0, channels), dtype=np.float32)
+    try:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+            while True:
+                data = proc.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % (channels * 4)
+                samples = np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, channels)
+                if len(samples):
+                    peak = max(peak, float(np.abs(samples).max()))
+                samples = np.concatenate((tail, samples))
+                if len(samples) >= block:
+                    blocks = (len(samples) - block) // hop + 1
+                    powers.append(_block_powers(np, samples, weights, block, hop))
+                    samples = samples[blocks * hop:]
+                tail = samples
+            if proc.wait() != 0 and not powers:
+                return (path, st.st_mtime_ns, st.st_size, None, None)
+    except OSError:
+        return None
+
+    powers = np.concatenate(powers) if powers else np.zeros(0)
+    loudness = _gated_loudness(np, powers)
+    return (path, st.st_mtime_ns, st.st_size, loudness, peak or None)
+
+
+def _analyze_chunk(paths):
+    ffmpeg = find_ffmpeg()
+    return [analyze_loudness(path, ffmpeg) for path in paths]
+
+
+def gain_to_volume(loudness, peak=None, target=TARGET_LUFS):
+    """
+    Volumen (0..1) para llevar una pista a `target`. MediaPlayer no puede
+    amplificar: las pistas más bajas que el objetivo quedan a 1.0.
+    """
+    if loudness is None:
+        return 1.0
+    gain_db = target - loudness
+    if peak:
+        # Nunca por encima de lo que permite el pico sin recortar
+        gain_db = min(gain_db, -20 * math.log10(peak))
+    return min(1.0, 10 ** (gain_db / 20))
+
+
+class LoudnessCache:
+    """
+    Caché persistente (SQLite) de loudness y pico por pista.
+
+    Como MetadataCache: las entradas se identifican por ruta + mtime +
+    tamaño, las consultas desde la UI solo leen memoria y el análisis
+    (ffmpeg + NumPy) se hace en un pool de procesos, de una en una pista
+    por tarea porque cada análisis decodifica el archivo completo.
+    """
+
+    DB_NAME = "loudness_cache.db"
+    CHUNK_SIZE = 1
+    WORKERS = 2
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._records = {}          # ruta -> (mtime_ns, tamaño, loudness, pico)
+        self._loaded = threading.Event()
+        self._pending = []
+        self._queued = set()
+        self._worker = None
+        self._unavailable = False   # Sin ffmpeg o NumPy: no reintentar
+
+    @classmethod
+    def get_default(cls):
+        """Caché compartida, guardada en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                db_path = os.path.join(get_user_data_dir(), cls.DB_NAME)
+                cls._default = cls(db_path)
+            return cls._default
+
+    # --------------------------------------------------------------------------
+    ## LECTURA (SIN I/O EN EL HILO PRINCIPAL)
+    # --------------------------------------------------------------------------
+
+    def get(self, path):
+        """(loudness, pico) en memoria de una pista, o None si no se conoce."""
+        record = self._records.get(path)
+        return record[2:] if record is not None else None
+
+    def volume_for(self, path):
+        """Volumen normalizado de una pista, o None si aún no está analizada."""
+        record = self.get(path)
+        if record is None:
+            metrics.count('loudness.miss')
+            return None
+        metrics.count('loudness.hit')
+        return gain_to_volume(*record)
+
+    # --------------------------------------------------------------------------
+    ## ANÁLISIS EN SEGUNDO PLANO
+    # --------------------------------------------------------------------------
+
+    def _load_from_disk(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size, loudness, peak FROM loudness"
+            ).fetchall()
+        self._records = {row[0]: row[1:] for row in rows}
+        self._loaded.set()
+
+    def _store(self, results):
+        rows = [r for r in results if r is not None]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO loudness (path, mtime_ns, size, loudness, peak) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        for path, mtime_ns, size, loudness, peak in rows:
+            self._records[path] = (mtime_ns, size, loudness, peak)
+
+    def request(self, paths, priority=False):
+        """
+        Encolar pistas para analizar en segundo plano (solo las que no
+        estén en caché o hayan cambiado). Con `priority` van al principio
+        (p. ej. la pista que se va a reproducir).
+        """
+        if self._unavailable:
+            return
+        with self._lock:
+            if priority:
+                first = set(paths)
+                self._pending = list(paths) + [p for p in self._pending if p not in first]
+                self._queued.update(first)
+            else:
+                new = [p for p in paths if p not in self._queued]
+                self._queued.update(new)
+                self._pending.extend(new)
+
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._worker_thread)
+                self._worker.daemon = True
+                self._worker.start()
+
+    def _take_chunk(self):
+        with self._lock:
+            chunk = self._pending[:self.WORKERS * 4]
+            del self._pending[:len(chunk)]
+            return chunk
+
+    def _worker_thread(self):
+        if not self._loaded.is_set():
+            self._load_from_disk()
+
+        if not analysis_available():
+            log.info("ffmpeg o NumPy no disponibles: sin análisis de loudness")
+            self._unavailable = True
+            with self._lock:
+                self._pending = []
+                self._queued = set()
+                self._worker = None
+            return
+
+        executor = None
+        try:
+            while True:
+                paths = self._take_chunk()
+                if not paths:
+                    with self._lock:
+                        if not self._pending:
+                            self._worker = None
+                            return
+                    continue
+
+                known = {
+                    p: self._records[p][:2] for p in paths if p in self._records
+                }
+                stale = _stale_paths(paths, known)
+                if stale:
+                    if executor is None:
+                        executor = _create_executor(self.WORKERS)
+                    chunks = [
+                        stale[i:i + self.CHUNK_SIZE]
+                        for i in range(0, len(stale), self.CHUNK_SIZE)
+                    ]
+                    for results in executor.map(_analyze_chunk, chunks):
+                        self._store(results)
+                        metrics.count('loudness.analyzed', len(results))
+
+                with self._lock:
+                    self._queued.difference_update(paths)
+        except Exception as e:
+            log.warning("Error analizando loudness: %s", e)
+            with self._lock:
+                self._pending = []
+                self._queued = set()
+                self._worker = None
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
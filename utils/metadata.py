@@ -0,0 +1,291 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils.app_paths import get_user_data_dir
+from utils.instrumentation import get_logger, metrics
+
+log = get_logger('metadata')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration REAL
+);
+"""
+
+
+def _first_tag(tags, key):
+    values = tags.get(key) if tags else None
+    if values:
+        return str(values[0]).strip() or None
+    return None
+
+
+def extract_metadata(path):
+    """
+    Lee etiquetas y duración de un archivo con mutagen.
+
+    Se ejecuta en los procesos del pool, por eso es una función de módulo.
+    Devuelve (ruta, mtime_ns, tamaño, título, artista, álbum, duración)
+    o None si el archivo ya no existe.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    title = artist = album = None
+    duration = None
+    try:
+        from mutagen import File as MutagenFile
+        audio = MutagenFile(path, easy=True)
+        if audio is not None:
+            if audio.tags:
+                title = _first_tag(audio.tags, 'title')
+                artist = _first_tag(audio.tags, 'artist')
+                album = _first_tag(audio.tags, 'album')
+            if audio.info is not None and hasattr(audio.info, 'length'):
+                duration = audio.info.length
+    except Exception:
+        pass
+
+    return (path, st.st_mtime_ns, st.st_size, title, artist, album, duration)
+
+
+def _extract_chunk(paths):
+    return [extract_metadata(path) for path in paths]
+
+
+def _is_current(path, mtime_ns, size):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_mtime_ns == mtime_ns and st.st_size == size
+
+
+def _stale_paths(paths, known):
+    """Rutas sin metadatos o cuyo archivo cambió desde la última extracción."""
+    stale = []
+    for path in paths:
+        record = known.get(path)
+        if record is None or not _is_current(path, record[0], record[1]):
+            stale.append(path)
+    return stale
+
+
+def _create_executor(workers):
+    """Pool de procesos; en Android (sin multiprocessing) cae a hilos."""
+    from kivy.utils import platform
+    if platform != 'android':
+        try:
+            return ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError, ImportError):
+            pass
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+class TrackMetadata:
+    """Metadatos de una pista tal como los ve la UI."""
+    __slots__ = ('title', 'artist', 'album', 'duration')
+
+    def __init__(self, title, artist, album, duration):
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.duration = duration
+
+
+class MetadataCache:
+    """
+    Caché persistente (SQLite) de título/artista/álbum/duración.
+
+    Las entradas se identifican por ruta + mtime + tamaño. Las lecturas
+    desde la UI solo consultan memoria; la extracción con mutagen se hace
+    en un pool de procesos y los resultados llegan al hilo principal
+    por Clock a través de los listeners registrados.
+    """
+
+    DB_NAME = "metadata_cache.db"
+    CHUNK_SIZE = 64      # Archivos por tarea enviada al pool
+    WORKERS = 2
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._records = {}          # ruta -> (mtime_ns, tamaño, TrackMetadata)
+        self._loaded = threading.Event()
+        self._pending = []          # Rutas en cola para extraer
+        self._queued = set()
+        self._worker = None
+        self._listeners = []
+
+    @classmethod
+    def get_default(cls):
+        """Caché compartida, guardada en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                db_path = os.path.join(get_user_data_dir(), cls.DB_NAME)
+                cls._default = cls(db_path)
+            return cls._default
+
+    def add_listener(self, callback):
+        """callback(rutas_actualizadas) en el hilo principal."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    # --------------------------------------------------------------------------
+    ## LECTURA (SIN I/O EN EL HILO PRINCIPAL)
+    # --------------------------------------------------------------------------
+
+    def get(self, path):
+        """Metadatos en memoria de una pista, o None si aún no se conocen."""
+        record = self._records.get(path)
+        return record[2] if record is not None else None
+
+    def _lookup(self, path):
+        """get() contando aciertos/fallos de la caché (consultas de la UI)."""
+        meta = self.get(path)
+        metrics.count('metadata.hit' if meta is not None else 'metadata.miss')
+        return meta
+
+    def get_duration(self, path):
+        meta = self._lookup(path)
+        return meta.duration if meta is not None else None
+
+    def display_text(self, path):
+        """(título, artista) para mostrar; cae al nombre de archivo."""
+        meta = self._lookup(path)
+        if meta is None:
+            return os.path.basename(path), ""
+        return meta.title or os.path.basename(path), meta.artist or ""
+
+    # --------------------------------------------------------------------------
+    ## CARGA Y EXTRACCIÓN EN SEGUNDO PLANO
+    # --------------------------------------------------------------------------
+
+    def _load_from_disk(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size, title, artist, album, duration FROM metadata"
+            ).fetchall()
+        self._records = {
+            path: (mtime_ns, size, TrackMetadata(title, artist, album, duration))
+            for path, mtime_ns, size, title, artist, album, duration in rows
+        }
+        self._loaded.set()
+
+    def _store(self, results):
+        rows = [r for r in results if r is not None]
+        if not rows:
+            return []
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata "
+                "(path, mtime_ns, size, title, artist, album, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        for path, mtime_ns, size, title, artist, album, duration in rows:
+            self._records[path] = (mtime_ns, size, TrackMetadata(title, artist, album, duration))
+        return [row[0] for row in rows]
+
+    def request(self, paths, priority=False):
+        """
+        Encolar pistas para extraer/validar sus metadatos en segundo plano.
+        Con `priority` se ponen al principio de la cola (p. ej. la pista
+        que se va a reproducir).
+        """
+        with self._lock:
+            if priority:
+                first = set(paths)
+                self._pending = list(paths) + [p for p in self._pending if p not in first]
+                self._queued.update(first)
+            else:
+                new = [p for p in paths if p not in self._queued]
+                self._queued.update(new)
+                self._pending.extend(new)
+
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._worker_thread)
+                self._worker.daemon = True
+                self._worker.start()
+
+    def _take_chunk(self):
+        with self._lock:
+            chunk = self._pending[:self.CHUNK_SIZE * self.WORKERS * 4]
+            del self._pending[:len(chunk)]
+            return chunk
+
+    def _worker_thread(self):
+        """Coordina el pool: valida contra el disco y extrae lo que falte."""
+        from kivy.clock import Clock
+
+        if not self._loaded.is_set():
+            self._load_from_disk()
+            Clock.schedule_once(lambda dt: self._notify(None), 0)
+
+        executor = None
+        try:
+            while True:
+                paths = self._take_chunk()
+                if not paths:
+                    with self._lock:
+                        if not self._pending:
+                            self._worker = None
+                            return
+                    continue
+
+                known = {
+                    p: self._records[p][:2] for p in paths if p in self._records
+                }
+                stale = _stale_paths(paths, known)
+
+                updated = []
+                if stale:
+                    if executor is None:
+                        executor = _create_executor(self.WORKERS)
+                    chunks = [
+                        stale[i:i + self.CHUNK_SIZE]
+                        for i in range(0, len(stale), self.CHUNK_SIZE)
+                    ]
+                    for results in executor.map(_extract_chunk, chunks):
+                        updated.extend(self._store(results))
+
+                with self._lock:
+                    self._queued.difference_update(paths)
+
+                if updated:
+                    Clock.schedule_once(lambda dt, u=updated: self._notify(u), 0)
+        except Exception as e:
+            log.warning("Error extrayendo metadatos: %s", e)
+            with self._lock:
+                self._pending = []
+                self._queued = set()
+                self._worker = None
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _notify(self, paths):
+        """Avisar a los listeners (None = se cargó la caché completa)."""
+        for callback in list(self._listeners):
+            callback(paths)
@@ -0,0 +1,237 @@
+import random
+from collections import deque
+
+
+class PlayQueue:
+    """
+    Cola de reproducción detrás de PlayerScreen.
+
+    - Mapa pista -> posición para saltar a una canción en O(1). Las pistas
+      son IDs de TrackTable (o cualquier valor hashable, p. ej. rutas).
+    - Shuffle como permutación Fisher–Yates generada de forma perezosa
+      (dispersa): cada paso es O(1) y ninguna canción se repite hasta
+      haber sonado todas.
+    - Historial atrás/adelante para prev/next.
+    - Cola "reproducir a continuación" (enqueue) en O(1).
+
+    La siguiente posición se fija la primera vez que se consulta
+    (peek_next), para que la precarga y el avance real coincidan.
+    """
+
+    HISTORY_LIMIT = 500
+
+    def __init__(self, tracks=()):
+        self.shuffle = False
+        self.repeat = False
+        self.set_tracks(tracks)
+
+    # --------------------------------------------------------------------------
+    ## CONTENIDO
+    # --------------------------------------------------------------------------
+
+    def set_tracks(self, tracks):
+        """Reemplazar las canciones de la cola (O(n), solo al cambiar de lista)."""
+        # Copia del mismo tipo: un array('I') de IDs sigue siendo compacto
+        self._tracks = tracks[:] if hasattr(tracks, '__getitem__') else list(tracks)
+        self._positions = {}
+        for i, track in enumerate(self._tracks):
+            self._positions.setdefault(track, i)
+
+        self.current = -1
+        self._history = deque(maxlen=self.HISTORY_LIMIT)
+        self._forward = []
+        self._upcoming = deque()
+        self._reset_plan()
+        self._reset_shuffle()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track):
+        return track in self._positions
+
+    def track(self, position):
+        return self._tracks[position]
+
+    @property
+    def current_track(self):
+        if 0 <= self.current < len(self._tracks):
+            return self._tracks[self.current]
+        return None
+
+    def position_of(self, track):
+        """Posición de una pista en la cola, o None."""
+        return self._positions.get(track)
+
+    def _add(self, track):
+        """Posición de `track`, añadiéndola al final si no está en la cola."""
+        position = self._positions.get(track)
+        if position is None:
+            position = len(self._tracks)
+            self._tracks.append(track)
+            self._positions[track] = position
+        return position
+
+    def enqueue(self, track):
+        """Reproducir `track` a continuación (después de lo ya encolado)."""
+        position = self._add(track)
+        self._upcoming.append(position)
+        if self._planned_source == 'end':
+            self._reset_plan()
+
+    # --------------------------------------------------------------------------
+    ## MODOS
+    # --------------------------------------------------------------------------
+
+    def set_modes(self, shuffle=None, repeat=None):
+        """Cambiar shuffle/repeat; invalida la siguiente canción ya elegida."""
+        # Antes de rehacer el shuffle: lo devuelto no debe pasar al ciclo nuevo
+        self._cancel_plan()
+        if shuffle is not None and shuffle != self.shuffle:
+            self.shuffle = shuffle
+            self._reset_shuffle()
+        if repeat is not None:
+            self.repeat = repeat
+
+    # --------------------------------------------------------------------------
+    ## SHUFFLE (FISHER–YATES PEREZOSO)
+    # --------------------------------------------------------------------------
+
+    def _reset_shuffle(self):
+        self._new_cycle()
+        self._returned = []   # Elegidas pero descartadas (cambio de modo)
+        if 0 <= self.current < len(self._tracks):
+            # La canción actual cuenta como ya sonada en este ciclo
+            self._mark_drawn(self.current)
+
+    def _new_cycle(self):
+        # Permutación dispersa: solo se guardan las posiciones intercambiadas
+        # (índice -> posición) y dónde está cada posición movida o ya sacada
+        self._swaps = {}
+        self._slots = {}
+        self._shuffle_k = 0
+
+    def _draw(self, forced=None):
+        """
+        Siguiente elemento de la permutación. `forced` es el índice (aún sin
+        sacar, >= _shuffle_k) que se extrae en lugar de uno al azar.
+        """
+        n = len(self._tracks)
+        k = self._shuffle_k
+        j = random.randrange(k, n) if forced is None else forced
+        value_k = self._swaps.pop(k, k)
+        value_j = self._swaps.get(j, j) if j != k else value_k
+        if j != k:
+            self._swaps[j] = value_k
+            self._slots[value_k] = j
+            # Índice < _shuffle_k: ya sacada en este ciclo
+            self._slots[value_j] = k
+        self._shuffle_k = k + 1
+        return value_j
+
+    def _mark_drawn(self, position):
+        """Contar `position` como ya sonada en este ciclo (p. ej. tras jump_to)."""
+        if position in self._returned:
+            self._returned.remove(position)
+            return
+        slot = self._slots.get(position, position)
+        if slot >= self._shuffle_k:
+            self._draw(slot)
+
+    def _shuffle_next(self):
+        if self._returned:
+            return self._returned.pop()
+        n = len(self._tracks)
+        if n <= 1:
+            return None
+        while True:
+            if self._shuffle_k >= n:
+                # Ciclo completo: empezar una permutación nueva
+                self._new_cycle()
+            position = self._draw()
+            if position != self.current:
+                return position
+
+    # --------------------------------------------------------------------------
+    ## NAVEGACIÓN
+    # --------------------------------------------------------------------------
+
+    def _reset_plan(self):
+        self._planned = None
+        self._planned_source = None
+
+    def _cancel_plan(self):
+        """Descartar la siguiente elegida, devolviendo lo sacado del shuffle."""
+        if self._planned_source == 'shuffle' and self._planned is not None:
+            self._returned.append(self._planned)
+        elif self._planned_source == 'upcoming':
+            self._upcoming.appendleft(self._planned)
+        self._reset_plan()
+
+    def _choose_next(self):
+        """Elegir la siguiente posición (None = fin de la cola)."""
+        if self._forward:
+            return self._forward[-1], 'forward'
+        if self._upcoming:
+            return self._upcoming.popleft(), 'upcoming'
+        if self.repeat:
+            return self.current, 'repeat'
+        if self.shuffle:
+            return self._shuffle_next(), 'shuffle'
+        if self.current + 1 >= len(self._tracks):
+            return None, 'end'
+        return self.current + 1, 'sequential'
+
+    def peek_next(self):
+        """Posición de la siguiente canción; la elección queda fijada."""
+        if self._planned_source is None:
+            self._planned, self._planned_source = self._choose_next()
+        return self._planned
+
+    def jump_to(self, track):
+        """
+        Saltar a una pista concreta (selección desde la lista). O(1).
+        Si no está en la cola se añade al final en lugar de fallar.
+        """
+        position = self._add(track)
+        self._cancel_plan()
+        if self.shuffle:
+            # Elegida a mano: no debe volver a salir en este ciclo
+            self._mark_drawn(position)
+        if self.current >= 0 and position != self.current:
+            self._history.append(self.current)
+        self._forward = []
+        self.current = position
+        return position
+
+    def advance(self):
+        """Pasar a la siguiente canción; devuelve su posición o None al final."""
+        position = self.peek_next()
+        source = self._planned_source
+        self._reset_plan()
+        if position is None:
+            return None
+
+        if source == 'forward':
+            self._forward.pop()
+        if source != 'repeat' and self.current >= 0:
+            self._history.append(self.current)
+        self.current = position
+        return position
+
+    def previous(self):
+        """Volver a la canción anterior del historial (o la anterior de la lista)."""
+        self._cancel_plan()
+        if self._history:
+            if self.current >= 0:
+                self._forward.append(self.current)
+            self.current = self._history.pop()
+            return self.current
+
+        if not self._tracks:
+            return None
+        position = self.current - 1
+        if position < 0:
+            position = len(self._tracks) - 1 if self.repeat else 0
+        self.current = position
+        return position
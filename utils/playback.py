@@ -0,0 +1,378 @@
+import os
+import time
+
+from utils.instrumentation import get_logger, metrics
+from utils.play_queue import PlayQueue
+
+log = get_logger('playback')
+
+
+class PlaybackController:
+    """
+    Lógica de reproducción de PlayerScreen, sin Kivy ni ffpyplayer.
+
+    - `backend` abre las canciones (utils.player_backend: ffpyplayer o el
+      falso de los benchmarks).
+    - `scheduler` programa el tick con schedule_interval(callback, segundos)
+      y el fin de pista con schedule_once(callback, segundos); ambos
+      devuelven un evento con cancel(): kivy.clock.Clock en la app.
+    - `listener` recibe los cambios para la UI (métodos opcionales):
+      on_track_started(track_id, ruta), on_duration_changed(duración),
+      on_position_changed(posición) y on_queue_finished().
+    - `duration_for(ruta)` da una duración provisional (caché de metadatos)
+      hasta que el decoder reporta la real.
+    - `volume_for(ruta)` da el volumen (0..1) de cada pista, p. ej. el de
+      la normalización de loudness; None deja el del reproductor.
+    - `clock` mide el hueco entre pistas (el del scheduler en benchmarks
+      con tiempo simulado).
+    """
+
+    # Un único evento del scheduler para progreso, precarga y fin de pista.
+    # Se cancela mientras está en pausa (cero wakeups).
+    TICK_INTERVAL = 0.25
+
+    # Precarga de la siguiente canción (reproducción sin pausas)
+    PRELOAD_SECONDS = 5.0
+
+    # Con la siguiente precargada, el final se programa a su hora exacta
+    # (el tick llegaría hasta TICK_INTERVAL tarde). Al saltar ese evento,
+    # margen para dar la pista por terminada si el pts va algo retrasado.
+    END_TOLERANCE = 0.05
+
+    def __init__(self, backend, scheduler, tracks, listener=None, duration_for=None,
+                 volume_for=None, clock=time.perf_counter):
+        self.backend = backend
+        self.scheduler = scheduler
+        self.tracks = tracks
+        self.listener = listener
+        self.duration_for = duration_for
+        self.volume_for = volume_for
+        self.clock = clock
+
+        # Cola de reproducción de IDs de pista (posiciones O(1), shuffle e historial)
+        self.queue = PlayQueue()
+        self.song_list = None      # Lista de origen de la cola actual
+        self.song_list_len = 0
+
+        self.player = None
+        self.current_path = ""
+        self.is_paused = False
+
+        # Control del tiempo: la posición sale del reloj del decoder (pts)
+        self.position = 0.0
+        self.duration = 0.0
+        self.duration_from_player = False
+        self.is_seeking = False
+        self.tick_event = None
+        self.end_event = None
+
+        self.preloaded_player = None
+        self.preloaded_index = None
+        self.eof_time = None        # Momento real del fin de la pista anterior
+        self._track_end = None      # Fin previsto según el último pts leído
+        self.last_transition_gap = 0.0
+        self._load_started = None   # Para medir el tiempo hasta el primer audio
+
+    def _emit(self, event, *args):
+        handler = getattr(self.listener, event, None)
+        if handler is not None:
+            handler(*args)
+
+    # --------------------------------------------------------------------------
+    ## CARGA Y REPRODUCCIÓN
+    # --------------------------------------------------------------------------
+
+    def load_song(self, track_id, songs):
+        """Carga una nueva canción (ID de pista) y comienza la reproducción."""
+        # Solo se reconstruye la cola si cambió la lista de origen (o si la
+        # pista no está en ella)
+        if (songs is not self.song_list or len(songs) != self.song_list_len
+                or track_id not in self.queue):
+            self.song_list = songs
+            self.song_list_len = len(songs)
+            self.queue.set_tracks(songs)
+        self.queue.jump_to(track_id)
+        self.play_track(track_id)
+
+    def play_track(self, track_id, player=None):
+        """
+        Reproduce una canción (ID de pista) de la cola.
+        Si se pasa `player` (precargado y en pausa), se usa en lugar de abrir uno nuevo.
+        """
+        if player is not None:
+            # Arrancar primero la precargada: cerrar la anterior no suma al hueco
+            player.set_pause(False)
+            if self.eof_time is not None:
+                # Silencio desde que terminó de verdad la anterior
+                self.last_transition_gap = max(0.0, self.clock() - self.eof_time)
+                metrics.record('playback.transition_gap', self.last_transition_gap)
+                log.debug("Transición sin pausa: %.1f ms", self.last_transition_gap * 1000)
+        self.eof_time = None
+        self._track_end = None
+
+        self.stop()
+
+        # La ruta solo se construye aquí
+        song_path = self.tracks.path(track_id)
+        self.current_path = song_path
+        self.is_paused = False
+        self.position = 0.0
+        self.duration_from_player = False
+
+        # Duración provisional (nunca bloquea)
+        self.duration = self.duration_for(song_path) if self.duration_for else 0.0
+        self._emit('on_track_started', track_id, song_path)
+        self._emit('on_duration_changed', self.duration)
+
+        # Crear el reproductor (o usar el precargado)
+        try:
+            if player is None:
+                self._load_started = time.perf_counter()
+                with metrics.timer('playback.open'):
+                    player = self.backend.open(song_path, paused=False)
+                self._apply_volume(player, song_path)
+            else:
+                self._load_started = None
+            self.player = player
+        except Exception as e:
+            log.error("Error al cargar la canción %s: %s", song_path, e)
+            self.player = None
+            return
+        metrics.count('playback.tracks')
+
+        self._emit('on_position_changed', 0.0)
+        self._start_ticking()
+
+    def _apply_volume(self, player, song_path):
+        """Volumen guardado de la pista (sin analizar nada al reproducir)."""
+        if self.volume_for is None:
+            return
+        volume = self.volume_for(song_path)
+        if volume is not None:
+            try:
+                player.set_volume(volume)
+            except Exception as e:
+                log.warning("No se pudo ajustar el volumen: %s", e)
+
+    def _start_ticking(self):
+        if self.tick_event is None:
+            self.tick_event = self.scheduler.schedule_interval(self.tick, self.TICK_INTERVAL)
+
+    def _stop_ticking(self):
+        if self.tick_event is not None:
+            self.tick_event.cancel()
+            self.tick_event = None
+        self._cancel_end_timer()
+
+    def _arm_end_timer(self, remaining):
+        """Programar el cambio de pista para el instante en que acaba la actual."""
+        if self.end_event is None:
+            self.end_event = self.scheduler.schedule_once(self._on_end_timer, max(0.0, remaining))
+
+    def _cancel_end_timer(self):
+        if self.end_event is not None:
+            self.end_event.cancel()
+            self.end_event = None
+
+    def stop(self):
+        """Detiene la reproducción y libera los reproductores."""
+        self._stop_ticking()
+        self.discard_preload()
+
+        if self.player:
+            self._close_player(self.player)
+            self.player = None
+            self.is_paused = False
+
+    def _close_player(self, player):
+        """Pausar y cerrar un reproductor (pausar antes evita el crash)."""
+        try:
+            player.set_pause(True)
+            player.close_player()
+        except Exception:
+            pass
+
+    def play_pause(self):
+        """Alterna pausa/reproducción."""
+        if self.player:
+            self.is_paused = not self.is_paused
+            self.player.set_pause(self.is_paused)
+
+            # En pausa no hace falta despertar al scheduler
+            if self.is_paused:
+                self._stop_ticking()
+            else:
+                self._start_ticking()
+        return self.is_paused
+
+    # --------------------------------------------------------------------------
+    ## COLA
+    # --------------------------------------------------------------------------
+
+    def set_modes(self, shuffle=None, repeat=None):
+        self.discard_preload()
+        self.queue.set_modes(shuffle=shuffle, repeat=repeat)
+
+    def next_song(self):
+        """Pasa a la siguiente canción."""
+        if not len(self.queue):
+            return
+
+        position = self.queue.advance()
+        if position is None:
+            # Llegamos al final, detener
+            self.stop()
+            self._emit('on_queue_finished')
+            return
+
+        if self.queue.repeat:
+            log.debug("Repitiendo canción actual")
+
+        # Usar el reproductor precargado si corresponde a esta canción
+        player = None
+        if self.preloaded_player is not None and self.preloaded_index == position:
+            player = self.preloaded_player
+            self.preloaded_player = None
+
+        self.play_track(self.queue.track(position), player=player)
+
+    def prev_song(self):
+        """Vuelve a la canción anterior (según el historial)."""
+        position = self.queue.previous()
+        if position is None:
+            return
+
+        self.play_track(self.queue.track(position))
+
+    def preload_next(self):
+        """Abrir en pausa el reproductor de la siguiente canción."""
+        if self.preloaded_player is not None:
+            return
+
+        position = self.queue.peek_next()
+        if position is None:
+            return
+
+        try:
+            song_path = self.tracks.path(self.queue.track(position))
+            self.preloaded_player = self.backend.open(song_path, paused=True)
+            self.preloaded_index = position
+            self._apply_volume(self.preloaded_player, song_path)
+            log.debug("Precargada: %s", os.path.basename(song_path))
+        except Exception as e:
+            log.warning("No se pudo precargar la siguiente canción: %s", e)
+            self.preloaded_player = None
+            self.preloaded_index = None
+
+    def discard_preload(self):
+        """Descartar el reproductor precargado."""
+        if self.preloaded_player is not None:
+            self._close_player(self.preloaded_player)
+        self.preloaded_player = None
+        self.preloaded_index = None
+
+    # --------------------------------------------------------------------------
+    ## PROGRESO Y FIN DE PISTA
+    # --------------------------------------------------------------------------
+
+    def _sync_duration(self):
+        """Usar la duración que reporta el propio decoder en cuanto esté disponible."""
+        if self.duration_from_player:
+            return
+        try:
+            duration = (self.player.get_metadata() or {}).get('duration')
+        except Exception:
+            duration = None
+        if duration and duration > 0:
+            self.duration = duration
+            self.duration_from_player = True
+            self._emit('on_duration_changed', duration)
+
+    def set_duration_hint(self, duration):
+        """Duración de los metadatos; no pisa la que ya dio el decoder."""
+        if duration and not self.duration_from_player:
+            self.duration = duration
+            self._emit('on_duration_changed', duration)
+
+    def _reached_eof(self, tolerance=0.0):
+        """Fin de pista según el decoder: 'eof' de get_frame o pts al final."""
+        try:
+            _frame, val = self.player.get_frame(show=False)
+        except Exception:
+            val = None
+        if val == 'eof':
+            return True
+        return (self.duration_from_player
+                and self.position >= self.duration - tolerance)
+
+    def _read_position(self):
+        """Posición real del decoder y fin previsto de la pista."""
+        pts = self.player.get_pts()
+        if pts is not None and pts >= 0:
+            self.position = pts
+            if self.duration_from_player and pts < self.duration:
+                self._track_end = self.clock() + self.duration - pts
+
+    def tick(self, dt):
+        """Evento único: progreso, precarga y detección de fin de pista."""
+        if not self.player or self.is_paused:
+            return
+
+        self._sync_duration()
+        self._read_position()
+        if self._load_started is not None and self.position > 0:
+            # Tiempo hasta el primer audio (resolución: TICK_INTERVAL)
+            metrics.record('playback.time_to_first_audio', time.perf_counter() - self._load_started)
+            self._load_started = None
+
+        if not self.is_seeking:
+            self._emit('on_position_changed', self.position)
+
+        # Abrir la siguiente canción unos segundos antes del final
+        remaining = self.duration - self.position
+        if remaining <= self.PRELOAD_SECONDS:
+            self.preload_next()
+
+        if self._reached_eof():
+            self.on_eof()
+        elif (self.preloaded_player is not None and self.duration_from_player
+              and remaining < self.TICK_INTERVAL):
+            # El próximo tick llegaría tarde: cambiar justo al acabar
+            self._arm_end_timer(remaining)
+
+    def _on_end_timer(self, dt):
+        self.end_event = None
+        if not self.player or self.is_paused:
+            return
+        self._read_position()
+        if self._reached_eof(self.END_TOLERANCE):
+            self.on_eof()
+        elif self.duration - self.position < self.TICK_INTERVAL:
+            # Aún no (p. ej. tras un seek o un tirón del decoder)
+            self._arm_end_timer(self.duration - self.position)
+
+    def on_eof(self):
+        """La canción terminó: pasar a la siguiente."""
+        log.debug("Canción terminada (%.2fs / %.2fs)", self.position, self.duration)
+        self._stop_ticking()
+
+        # El hueco se mide desde el fin real, no desde que se detectó
+        now = self.clock()
+        self.eof_time = min(now, self._track_end) if self._track_end is not None else now
+
+        # Con precarga el cambio es inmediato, sin abrir el decoder
+        self.next_song()
+
+    def seek(self, fraction):
+        """Cambia la posición de reproducción (fracción 0..1 de la duración)."""
+        if self.player and self.duration > 0:
+            pos = fraction * self.duration
+
+            # El fin programado ya no vale
+            self._cancel_end_timer()
+            try:
+                self.player.seek(pos, relative=False)
+                # El pts se actualizará en el siguiente tick
+                self.position = pos
+            except Exception as e:
+                log.warning("Error en seek: %s", e)
@@ -0,0 +1,131 @@
+import time
+
+
+class FFPyPlayerBackend:
+    """
+    Backend real: un ffpyplayer.MediaPlayer por canción.
+
+    Interfaz de un backend: open(ruta, paused) devuelve un reproductor con
+    los métodos de MediaPlayer que usa la app: set_pause, get_pts,
+    get_frame(show=False), get_metadata, seek, set_volume y close_player.
+    """
+
+    name = 'ffpyplayer'
+
+    def __init__(self):
+        # Import diferido: ffpyplayer solo se carga al reproducir
+        from ffpyplayer.player import MediaPlayer
+        self._media_player = MediaPlayer
+
+    def open(self, path, paused=False):
+        ff_opts = {'paused': paused, 'sync': 'audio'}
+        return self._media_player(path, ff_opts=ff_opts)
+
+
+class FakePlayer:
+    """
+    Reproductor simulado: el pts avanza con el reloj del backend.
+    Guarda cuándo empezó a sonar (`started_at`) y cuándo llegó al final
+    (`ended_at`), para medir el silencio real entre pistas.
+    """
+
+    def __init__(self, backend, path, duration, paused):
+        self._backend = backend
+        self.path = path
+        self.duration = duration
+        self.volume = 1.0
+        self.closed = False
+        self._paused = paused
+        self._offset = 0.0
+        self._started = None if paused else backend.clock()
+        self.started_at = self._started
+        self.ended_at = None
+
+    def _pts(self):
+        if self._started is None:
+            return self._offset
+        return self._offset + self._backend.clock() - self._started
+
+    def _note_end(self):
+        if self.ended_at is None and self._started is not None and self._pts() >= self.duration:
+            self.ended_at = self._started + self.duration - self._offset
+
+    def set_pause(self, paused):
+        if paused and self._started is not None:
+            self._note_end()
+            self._offset = self._pts()
+            self._started = None
+        elif not paused and self._started is None:
+            self._started = self._backend.clock()
+            if self.started_at is None:
+                self.started_at = self._started
+        self._paused = paused
+
+    def get_pts(self):
+        return min(self._pts(), self.duration)
+
+    def get_frame(self, show=True):
+        if self._pts() >= self.duration:
+            return None, 'eof'
+        return None, 0.0
+
+    def get_metadata(self):
+        return {'duration': self.duration}
+
+    def seek(self, pts, relative=False):
+        target = self._pts() + pts if relative else pts
+        self._offset = max(0.0, min(target, self.duration))
+        if self._started is not None:
+            self._started = self._backend.clock()
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def close_player(self):
+        self._note_end()
+        if not self.closed:
+            self.closed = True
+            self._backend.closed_count += 1
+
+
+class FakeBackend:
+    """
+    Backend en proceso sin audio ni archivos, para benchmarks headless.
+
+    `clock` da el tiempo (p. ej. el de un scheduler simulado) y
+    `duration_for(ruta)` la duración de cada pista. Cuenta los
+    reproductores abiertos y cerrados para detectar fugas.
+    """
+
+    name = 'fake'
+
+    def __init__(self, clock=time.perf_counter, duration_for=None, default_duration=180.0):
+        self.clock = clock
+        self.duration_for = duration_for
+        self.default_duration = default_duration
+        self.opened_count = 0
+        self.closed_count = 0
+        self.players = []   # Reproductores abiertos, en orden (para medir huecos)
+
+    @property
+    def open_players(self):
+        return self.opened_count - self.closed_count
+
+    def open(self, path, paused=False):
+        duration = self.duration_for(path) if self.duration_for else self.default_duration
+        self.opened_count += 1
+        player = FakePlayer(self, path, duration, paused)
+        self.players.append(player)
+        return player
+
+
+_default = None
+
+
+def get_default_backend():
+    """Backend de la app: ffpyplayer (se crea al primer uso)."""
+    global _default
+    if _default is None:
+        _default = FFPyPlayerBackend()
+    return _default
+
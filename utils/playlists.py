@@ -0,0 +1,314 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from urllib.parse import unquote, urlparse
+
+from utils.app_paths import get_user_data_dir
+from utils.instrumentation import get_logger, metrics
+from utils.library_index import LibraryIndex
+from utils.track_table import TrackTable
+
+log = get_logger('playlists')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    updated REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS entries (
+    playlist_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, position)
+) WITHOUT ROWID;
+"""
+
+PLAYLIST_EXTENSIONS = ('.m3u', '.m3u8')
+
+
+def _detect_encoding(file_path, sample_size=65536):
+    """.m3u8 es UTF-8; en .m3u se prueba UTF-8 con una muestra y si no, Latin-1."""
+    if file_path.lower().endswith('.m3u8'):
+        return 'utf-8-sig'
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Un carácter cortado al final de la muestra no cuenta
+        if e.start < len(sample) - 4:
+            return 'latin-1'
+    return 'utf-8-sig'
+
+
+def iter_m3u(file_path):
+    """
+    Entradas de un M3U/M3U8 como rutas absolutas normalizadas, línea a
+    línea (no se carga el archivo entero). Las relativas se resuelven
+    respecto a la carpeta de la lista; las URLs remotas dan None.
+    """
+    base = os.path.dirname(os.path.abspath(file_path))
+    with open(file_path, 'r', encoding=_detect_encoding(file_path), errors='replace') as f:
+        for line in f:
+            entry = line.strip()
+            if not entry or entry.startswith('#'):
+                continue
+            if '://' in entry:
+                parsed = urlparse(entry)
+                if parsed.scheme != 'file':
+                    yield None
+                    continue
+                entry = unquote(parsed.path)
+            if os.sep == '/':
+                entry = entry.replace('\\', '/')
+            yield os.path.normpath(os.path.join(base, entry))
+
+
+class PlaylistStore:
+    """
+    Listas de reproducción con nombre, guardadas en SQLite.
+
+    En disco cada entrada guarda la ruta (los IDs de TrackTable solo valen
+    durante la sesión); al cargar se traducen a IDs con un diccionario en
+    memoria, O(1) por entrada, y el reproductor recibe un array('I') igual
+    que la lista de la biblioteca. Importar y exportar M3U/M3U8 se hace en
+    streaming por lotes, resolviendo las rutas contra la tabla de pistas y
+    el índice de la biblioteca en lugar de comprobar cada archivo en disco.
+    """
+
+    DB_NAME = "playlists.db"
+    BATCH_SIZE = 1000
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, db_path, tracks=None, index=None):
+        self.db_path = db_path
+        self.tracks = tracks or TrackTable.get_default()
+        self._index = index
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def get_default(cls):
+        """Listas compartidas, guardadas en la carpeta de datos de la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                db_path = os.path.join(get_user_data_dir(), cls.DB_NAME)
+                cls._default = cls(db_path)
+            return cls._default
+
+    @property
+    def index(self):
+        return self._index or LibraryIndex.get_default()
+
+    # --------------------------------------------------------------------------
+    ## LISTAS
+    # --------------------------------------------------------------------------
+
+    def list_playlists(self):
+        """[(id, nombre, nº de entradas)] ordenadas por nombre."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT p.id, p.name, "
+                "(SELECT COUNT(*) FROM entries e WHERE e.playlist_id = p.id) "
+                "FROM playlists p ORDER BY p.name COLLATE NOCASE"
+            ).fetchall()
+
+    def _unique_name(self, name):
+        name = name.strip() or "Lista"
+        candidate = name
+        number = 2
+        while self._conn.execute(
+            "SELECT 1 FROM playlists WHERE name = ?", (candidate,)
+        ).fetchone():
+            candidate = f"{name} ({number})"
+            number += 1
+        return candidate
+
+    def create(self, name, track_ids=()):
+        """Crear una lista (el nombre se numera si ya existe). Devuelve su ID."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO playlists (name, updated) VALUES (?, ?)",
+                (self._unique_name(name), time.time()),
+            )
+            self._conn.commit()
+            playlist_id = cursor.lastrowid
+        if track_ids:
+            self.append(playlist_id, track_ids)
+        return playlist_id
+
+    def rename(self, playlist_id, name):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE playlists SET name = ?, updated = ? WHERE id = ?",
+                (self._unique_name(name), time.time(), playlist_id),
+            )
+            self._conn.commit()
+
+    def delete(self, playlist_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE playlist_id = ?", (playlist_id,))
+            self._conn.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+            self._conn.commit()
+
+    def _append_paths(self, playlist_id, paths):
+        """Añadir rutas al final de la lista (sin commit). Devuelve cuántas."""
+        row = self._conn.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM entries WHERE playlist_id = ?",
+            (playlist_id,),
+        ).fetchone()
+        start = row[0]
+        self._conn.executemany(
+            "INSERT INTO entries (playlist_id, position, path) VALUES (?, ?, ?)",
+            [(playlist_id, start + offset, path) for offset, path in enumerate(paths)],
+        )
+        self._conn.execute(
+            "UPDATE playlists SET updated = ? WHERE id = ?", (time.time(), playlist_id)
+        )
+        return len(paths)
+
+    def append(self, playlist_id, track_ids):
+        """Añadir pistas (IDs de TrackTable) al final de la lista."""
+        paths = [self.tracks.path(track_id) for track_id in track_ids]
+        with self._lock:
+            count = self._append_paths(playlist_id, paths)
+            self._conn.commit()
+        return count
+
+    def load(self, playlist_id):
+        """
+        IDs de pista de la lista, listos para PlayerScreen.load_song.
+        Devuelve (array('I'), nº de entradas que ya no están en la biblioteca).
+        Las pistas borradas o movidas se dan de baja en TrackTable, así que
+        id_of ya no las encuentra.
+        """
+        start = time.perf_counter()
+        ids = array('I')
+        missing = 0
+        id_of = self.tracks.id_of
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT path FROM entries WHERE playlist_id = ? ORDER BY position",
+                (playlist_id,),
+            )
+            for (path,) in cursor:
+                track_id = id_of(path)
+                if track_id is None:
+                    missing += 1
+                else:
+                    ids.append(track_id)
+        metrics.record('playlists.load', time.perf_counter() - start)
+        return ids, missing
+
+    # --------------------------------------------------------------------------
+    ## IMPORTAR / EXPORTAR M3U
+    # --------------------------------------------------------------------------
+
+    def _resolve(self, paths):
+        """
+        Rutas de la biblioteca para un lote de entradas (None si no está).
+
+        Primero la ruta exacta en TrackTable (memoria); las que no aparecen
+        se buscan por nombre de archivo en el índice, p. ej. listas hechas
+        en otro equipo con otra carpeta raíz. Solo vale si el nombre es único.
+        Corre en el hilo de importación: solo consulta, no registra pistas
+        (load las traduce a IDs en el hilo principal).
+        """
+        resolved = []
+        unresolved = []
+        for path in paths:
+            if path is not None and self.tracks.id_of(path) is not None:
+                resolved.append(path)
+            else:
+                resolved.append(None)
+                if path is not None:
+                    unresolved.append(len(resolved) - 1)
+
+        if unresolved:
+            by_name = self.index.paths_by_name(
+                os.path.basename(paths[i]) for i in unresolved
+            )
+            for i in unresolved:
+                matches = by_name.get(os.path.basename(paths[i]).lower()) or []
+                if paths[i] in matches:
+                    resolved[i] = paths[i]
+                elif len(matches) == 1:
+                    resolved[i] = matches[0]
+        return resolved
+
+    def import_m3u(self, file_path, name=None, on_progress=None):
+        """
+        Crear una lista a partir de un M3U/M3U8, por lotes de BATCH_SIZE
+        entradas. Devuelve (id de la lista, añadidas, no encontradas).
+        """
+        if name is None:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+        playlist_id = self.create(name)
+        added = missing = 0
+
+        def flush(batch):
+            nonlocal added, missing
+            found = [path for path in self._resolve(batch) if path is not None]
+            with self._lock:
+                self._append_paths(playlist_id, found)
+                self._conn.commit()
+            added += len(found)
+            missing += len(batch) - len(found)
+            if on_progress is not None:
+                on_progress(added, missing)
+
+        batch = []
+        with metrics.timer('playlists.import'):
+            for path in iter_m3u(file_path):
+                batch.append(path)
+                if len(batch) >= self.BATCH_SIZE:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+
+        log.info("Importada %s: %d pistas, %d no encontradas", file_path, added, missing)
+        return playlist_id, added, missing
+
+    def export_m3u(self, playlist_id, file_path, relative=True, metadata=None):
+        """
+        Escribir la lista como M3U8 (UTF-8) entrada a entrada. Con `relative`
+        las rutas son relativas a la carpeta del archivo cuando es posible.
+        `metadata` (MetadataCache) añade #EXTINF con duración y título si se
+        conocen, sin leer los archivos. Devuelve cuántas entradas escribió.
+        """
+        base = os.path.dirname(os.path.abspath(file_path))
+        tmp_path = file_path + '.tmp'
+        written = 0
+        with metrics.timer('playlists.export'):
+            with self._lock, open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write("#EXTM3U\n")
+                cursor = self._conn.execute(
+                    "SELECT path FROM entries WHERE playlist_id = ? ORDER BY position",
+                    (playlist_id,),
+                )
+                for (path,) in cursor:
+                    meta = metadata.get(path) if metadata is not None else None
+                    if meta is not None and meta.title:
+                        duration = int(meta.duration) if meta.duration else -1
+                        title = f"{meta.artist} - {meta.title}" if meta.artist else meta.title
+                        f.write(f"#EXTINF:{duration},{title}\n")
+                    entry = path
+                    if relative:
+                        try:
+                            entry = os.path.relpath(path, base)
+                        except ValueError:
+                            # Otra unidad en Windows: ruta absoluta
+                            pass
+                    f.write(entry + "\n")
+                    written += 1
+            os.replace(tmp_path, file_path)
+        return written
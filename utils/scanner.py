@@ -0,0 +1,113 @@
+import threading
+import time
+
+from kivy.clock import Clock
+
+from utils.instrumentation import get_logger, metrics
+from utils.library_index import LibraryIndex
+
+log = get_logger('scan')
+
+
+class LibraryScanner:
+    """
+    Escaneo de la carpeta de música en segundo plano.
+
+    El recorrido (os.scandir + pool de hilos por carpeta) corre fuera del
+    hilo de Kivy; los resultados llegan al hilo principal por Clock en lotes.
+    Iniciar un escaneo nuevo cancela el que siga en curso.
+    """
+
+    BATCH_SIZE = 500        # Pistas por lote enviado a la UI
+    FLUSH_INTERVAL = 0.15   # Segundos máximos entre lotes
+    WORKERS = 4             # Hilos para el trabajo por carpeta
+
+    def __init__(self, on_batch=None, on_done=None):
+        # on_batch(rutas, carpetas_escaneadas) y on_done(canciones | None)
+        # se llaman siempre en el hilo principal
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self._generation = 0
+        self._cancel_event = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self._cancel_event is not None and not self._cancel_event.is_set()
+
+    def start(self, folder):
+        """Iniciar un escaneo de `folder`, cancelando el anterior."""
+        with self._lock:
+            if self._cancel_event is not None:
+                self._cancel_event.set()
+            self._generation += 1
+            generation = self._generation
+            self._cancel_event = cancel_event = threading.Event()
+
+        thread = threading.Thread(
+            target=self._scan_thread, args=(folder, generation, cancel_event)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        """Cancelar el escaneo en curso (si lo hay)."""
+        with self._lock:
+            if self._cancel_event is not None:
+                self._cancel_event.set()
+            self._generation += 1
+
+    def _deliver(self, generation, callback, *args):
+        """Ejecutar un callback en el hilo principal si el escaneo sigue vigente."""
+        def run(dt):
+            if generation == self._generation and callback is not None:
+                callback(*args)
+        Clock.schedule_once(run, 0)
+
+    def _scan_thread(self, folder, generation, cancel_event):
+        """Thread que recorre la carpeta y envía los resultados por lotes."""
+        pending = []
+        last_flush = time.monotonic()
+        dirs_scanned = 0
+
+        def flush():
+            nonlocal pending, last_flush
+            if pending:
+                self._deliver(generation, self.on_batch, pending, dirs_scanned)
+                pending = []
+            last_flush = time.monotonic()
+
+        def on_level(paths, dirs_total):
+            nonlocal dirs_scanned
+            dirs_scanned = dirs_total
+            for path in paths:
+                pending.append(path)
+                if len(pending) >= self.BATCH_SIZE:
+                    flush()
+            if time.monotonic() - last_flush >= self.FLUSH_INTERVAL:
+                flush()
+
+        start = time.perf_counter()
+        try:
+            songs = LibraryIndex.get_default().scan(
+                folder, on_batch=on_level, cancelled=cancel_event, workers=self.WORKERS
+            )
+        except Exception as e:
+            log.error("Error escaneando %s: %s", folder, e)
+            songs = None
+
+        if cancel_event.is_set():
+            metrics.count('scan.cancelled')
+            return
+        if songs is not None:
+            elapsed = time.perf_counter() - start
+            metrics.record('scan.duration', elapsed)
+            if elapsed > 0:
+                metrics.record('scan.files_per_second', len(songs) / elapsed)
+            log.info("Escaneo de %s: %d pistas en %d carpetas, %.2f s",
+                     folder, len(songs), dirs_scanned, elapsed)
+        flush()
+        self._deliver(generation, self.on_done, songs)
+        with self._lock:
+            if self._cancel_event is cancel_event:
+                self._cancel_event = None
@@ -0,0 +1,122 @@
+import os
+import threading
+import unicodedata
+from array import array
+
+
+def normalize(text):
+    """Minúsculas y sin acentos: 'Canción' -> 'cancion'."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Índice de búsqueda sobre nombres de archivo (y etiquetas si las hay).
+
+    Cada canción tiene una clave normalizada; un índice de trigramas
+    (trigrama -> posiciones) reduce los candidatos antes de comprobar la
+    subcadena. Si la consulta nueva amplía la anterior, solo se filtran
+    los resultados previos (estrechamiento incremental).
+    """
+
+    MIN_QUERY = 2
+
+    def __init__(self):
+        self._ids = array('I')
+        self._keys = []
+        self._postings = {}
+        self._by_bigram = {}
+        self._short = array('I')
+        self._last_query = None
+        self._last_result = None
+        self._lock = threading.Lock()
+
+    def build(self, track_ids, tracks, metadata=None):
+        """
+        Construir el índice sobre IDs de TrackTable (pensado para un hilo
+        en segundo plano).
+        """
+        keys = []
+        postings = {}
+        short = array('I')     # Claves sin trigramas (p. ej. "01.mp3" -> "01")
+        for position, track_id in enumerate(track_ids):
+            parts = [os.path.splitext(tracks.name(track_id))[0]]
+            meta = metadata.get(tracks.path(track_id)) if metadata is not None else None
+            if meta is not None:
+                parts.extend(p for p in (meta.title, meta.artist, meta.album) if p)
+            key = normalize(' '.join(parts))
+            keys.append(key)
+            if len(key) < 3:
+                short.append(position)
+            for gram in _trigrams(key):
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = posting = array('I')
+                posting.append(position)
+
+        by_bigram = {}
+        for gram in postings:
+            by_bigram.setdefault(gram[:2], []).append(gram)
+            by_bigram.setdefault(gram[1:], []).append(gram)
+
+        with self._lock:
+            self._ids = array('I', track_ids)
+            self._keys = keys
+            self._postings = postings
+            self._by_bigram = by_bigram
+            self._short = short
+            self._last_query = None
+            self._last_result = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _candidates(self, query):
+        """Posiciones que contienen todos los trigramas de la consulta."""
+        if len(query) == 2:
+            result = set(self._short)
+            for gram in self._by_bigram.get(query, ()):
+                result.update(self._postings[gram])
+            return result
+
+        postings = []
+        for gram in _trigrams(query):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return result
+
+    def search(self, text):
+        """
+        IDs de las pistas que contienen `text`, en el orden de la lista.
+        Devuelve None si la consulta es demasiado corta (sin filtro).
+        """
+        query = normalize(text.strip())
+        if len(query) < self.MIN_QUERY:
+            return None
+
+        with self._lock:
+            keys = self._keys
+            if self._last_query and query.startswith(self._last_query):
+                # Estrechamiento incremental sobre el resultado anterior
+                positions = [p for p in self._last_result if query in keys[p]]
+            else:
+                positions = sorted(p for p in self._candidates(query) if query in keys[p])
+
+            self._last_query = query
+            self._last_result = positions
+            ids = self._ids
+            return array('I', [ids[p] for p in positions])
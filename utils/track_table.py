@@ -0,0 +1,109 @@
+import os
+import threading
+from array import array
+
+
+class TrackTable:
+    """
+    Tabla compacta de pistas para bibliotecas muy grandes.
+
+    Cada pista es un ID entero. Las carpetas se guardan una sola vez
+    (internadas) y por pista solo se guarda su nombre de archivo y el ID
+    de su carpeta en un array. Las pantallas y el reproductor se pasan IDs;
+    la ruta completa solo se construye al reproducir o leer metadatos.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self._dirs = []                 # dir_id -> ruta de la carpeta
+        self._dir_ids = {}              # ruta de la carpeta -> dir_id
+        self._by_dir = []               # dir_id -> {nombre: track_id}
+        self._names = []                # track_id -> nombre
+        self._track_dirs = array('I')   # track_id -> dir_id
+
+    @classmethod
+    def get_default(cls):
+        """Tabla compartida por toda la app."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __len__(self):
+        return len(self._names)
+
+    # --------------------------------------------------------------------------
+    ## ALTAS Y BAJAS
+    # --------------------------------------------------------------------------
+
+    def add(self, path):
+        """ID de una ruta, registrándola si es nueva."""
+        directory, name = os.path.split(path)
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(directory)
+            self._dir_ids[directory] = dir_id
+            self._by_dir.append({})
+
+        names = self._by_dir[dir_id]
+        track_id = names.get(name)
+        if track_id is None:
+            track_id = len(self._names)
+            self._names.append(name)
+            self._track_dirs.append(dir_id)
+            names[name] = track_id
+        return track_id
+
+    def add_many(self, paths):
+        """array('I') con los IDs de varias rutas, en el mismo orden."""
+        return array('I', [self.add(path) for path in paths])
+
+    def remove(self, track_id):
+        """
+        Dar de baja una pista: id_of deja de encontrarla y si vuelve a
+        aparecer recibe un ID nuevo. El ID no se reutiliza y sigue dando su
+        ruta, por si aún está en la cola del reproductor.
+        """
+        names = self._by_dir[self._track_dirs[track_id]]
+        name = self._names[track_id]
+        if names.get(name) == track_id:
+            del names[name]
+
+    # --------------------------------------------------------------------------
+    ## CONSULTAS
+    # --------------------------------------------------------------------------
+
+    def id_of(self, path):
+        """ID de una ruta registrada (y no dada de baja), o None."""
+        directory, name = os.path.split(path)
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            return None
+        return self._by_dir[dir_id].get(name)
+
+    def path(self, track_id):
+        return os.path.join(self._dirs[self._track_dirs[track_id]], self._names[track_id])
+
+    def name(self, track_id):
+        return self._names[track_id]
+
+    def dir_id(self, track_id):
+        return self._track_dirs[track_id]
+
+    def sort_key(self, track_id):
+        """
+        Orden de la lista, el mismo que el del índice (ORDER BY name_key,
+        path): nombre de archivo en minúsculas y, si coincide, la ruta.
+        """
+        return self._names[track_id].lower(), self.path(track_id)
+
+    def dir_ids_under(self, path):
+        """IDs de `path` y de todas las carpetas registradas dentro de él."""
+        prefix = path.rstrip(os.sep) + os.sep
+        return {
+            dir_id for directory, dir_id in self._dir_ids.items()
+            if directory == path or directory.startswith(prefix)
+        }